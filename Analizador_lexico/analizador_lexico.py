@@ -1,4 +1,7 @@
+import io
 import re
+from array import array
+from collections import deque
 from dataclasses import dataclass
 from rich.table   import Table
 from rich.console import Console
@@ -45,6 +48,35 @@ FLOAT_PAT = re.compile(r'\d*\.(?:\d+)?(?:[eE][-+]?\d+)?') # Regular expression f
 INT_PAT = re.compile(r'\d+') # Regular expression for the integer number
 CHAR_PAT = re.compile(r'\'([\x20-\x7E]|[a-zA-Z]|\\[a-z]|\\x[0-9A-Fa-f]{2}|\\\')\'') # Regular expression for the character
 
+OPERATORS = {**TWO_CHAR, **ONE_CHAR} # Every symbol with its token type
+
+WORD_TYPES = {kw: kw.upper() for kw in KEYWORDS} # Token type of every keyword and symbol (anything else is an ID)
+WORD_TYPES['true'] = WORD_TYPES['false'] = 'BOOL'
+WORD_TYPES.update(OPERATORS)
+
+# Master regular expression: leading whitespaces followed by one named alternative per
+# rule of Tokenize.tokenize, in the same priority order. Names and symbols share the WORD
+# alternative because both are resolved with WORD_TYPES. ERROR matches any other character
+# and END takes the whitespaces at the end of the text.
+MASTER_PAT = re.compile(r'(\s*)(?:' + '|'.join([
+    r'(?P<COMMENT>/\*(?s:.*?)\*/)',
+    r'(?P<OPEN_COMMENT>/\*)',
+    r'(?P<LINE_COMMENT>//[^\n]*\n?)',
+    f'(?P<WORD>{NAME_PAT.pattern}|' + '|'.join(re.escape(op) for op in [*TWO_CHAR, *ONE_CHAR]) + ')',
+    f'(?P<FLOAT>{FLOAT_PAT.pattern})',
+    f'(?P<INT>{INT_PAT.pattern})',
+    f'(?P<CHAR>{CHAR_PAT.pattern})',
+    r'(?P<ERROR>(?s:.))',
+    r'(?P<END>\Z)',
+]) + ')')
+
+# Token types numbered for the columnar TokenTable (the type of a token is TOKEN_TYPES[kind])
+TOKEN_TYPES = list(dict.fromkeys(['ID', 'INT', 'FLOAT', 'CHAR', 'BOOL', *sorted(WORD_TYPES.values())]))
+TOKEN_KINDS = {type: kind for kind, type in enumerate(TOKEN_TYPES)}
+WORD_KINDS = {word: TOKEN_KINDS[type] for word, type in WORD_TYPES.items()}
+
+CHUNK_SIZE = 64 * 1024 # Characters read from the file on each step of Tokenize.stream
+LOOKAHEAD = 8 # A match ending this close to the end of the buffer could change with more text (e.g. '1.5e' + '-3')
 
 
 @dataclass
@@ -55,6 +87,114 @@ class Token: # Data class for the tokens with the type, value and line number
 
 errors = [] # List to store the errors in the file
 
+class TokenTable: # Tokens of a piece of source in parallel arrays, the text is only sliced when it is asked for
+    __slots__ = ('source', 'kinds', 'starts', 'ends', 'linenos')
+
+    def __init__(self, source):
+        self.source = source # Text the offsets point into
+        self.kinds = array('B') # Index in TOKEN_TYPES
+        self.starts = array('q') # Offset of the first character
+        self.ends = array('q') # Offset after the last character
+        self.linenos = [] # Line number (a list, so the tokens of a line and the AST share one int object)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self): # Token objects, one at a time
+        source = self.source
+        for kind, start, end, lineno in zip(self.kinds, self.starts, self.ends, self.linenos):
+            yield Token(TOKEN_TYPES[kind], source[start:end], lineno)
+
+    def type(self, i):
+        return TOKEN_TYPES[self.kinds[i]]
+
+    def value(self, i):
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def lineno(self, i):
+        return self.linenos[i]
+
+    def token(self, i):
+        return Token(TOKEN_TYPES[self.kinds[i]], self.source[self.starts[i]:self.ends[i]], self.linenos[i])
+
+
+class TokenStream: # Cursor over the TokenTables of the lexer with lookahead, used by the parser without creating Token objects
+    def __init__(self, tables):
+        self.tables = iter(tables)
+        self.ahead = deque() # Tables already read from the lexer for the lookahead
+        self.last = None # (table, index) of the last consumed token of the previous tables
+        self.set_table(TokenTable(''))
+
+    def set_table(self, table):
+        self.table = table
+        self.kinds, self.starts, self.ends, self.linenos = table.kinds, table.starts, table.ends, table.linenos
+        self.size = len(table)
+        self.pos = 0 # Index of the current token in the table
+
+    def locate(self, k): # (table, index) of the k-th token after the current one (-1 is the last consumed token), None at the end
+        if k < 0:
+            return self.last
+        table, i = self.table, self.pos + k
+        n = 0
+        while i >= len(table):
+            i -= len(table)
+            if n == len(self.ahead):
+                table = next(self.tables, None)
+                if table is None:
+                    return None
+                self.ahead.append(table)
+            table = self.ahead[n]
+            n += 1
+        return table, i
+
+    # The accessors read the current table directly, locate() is only needed near the end of a table
+
+    def type(self, k=0): # Type of the k-th token (None at the end)
+        i = self.pos + k
+        if 0 <= i < self.size:
+            return TOKEN_TYPES[self.kinds[i]]
+        found = self.locate(k)
+        return found and found[0].type(found[1])
+
+    def value(self, k=0): # Text of the k-th token (None at the end)
+        i = self.pos + k
+        if 0 <= i < self.size:
+            return self.table.source[self.starts[i]:self.ends[i]]
+        found = self.locate(k)
+        return found and found[0].value(found[1])
+
+    def lineno(self, k=0): # Line of the k-th token (None at the end)
+        i = self.pos + k
+        if 0 <= i < self.size:
+            return self.linenos[i]
+        found = self.locate(k)
+        return found and found[0].lineno(found[1])
+
+    def token(self, k=0): # Token object of the k-th token (None at the end)
+        i = self.pos + k
+        if 0 <= i < self.size:
+            return self.table.token(i)
+        found = self.locate(k)
+        return found and found[0].token(found[1])
+
+    def advance(self): # Consume the current token
+        if self.pos >= self.size:
+            while True: # Move to the next table that has tokens
+                table = self.ahead.popleft() if self.ahead else next(self.tables, None)
+                if table is None:
+                    return
+                if len(table):
+                    self.last = (self.table, self.size - 1) if self.size else self.last
+                    self.set_table(table)
+                    break
+        self.pos += 1
+
+    def drain(self): # Read the rest of the tables (the lexer still reports its errors)
+        self.ahead.clear()
+        for _ in self.tables:
+            pass
+
+
 class Tokenize:
 
     class LexerError(Exception):
@@ -68,8 +208,14 @@ class Tokenize:
                 f"  - Línea {line}: Token inválido '{char}'" for char, line in errors
             )
 
-    def __init__(self):
+    def __init__(self, mode='regex'):
         self.errors = []
+        self.mode = mode # 'regex' uses tokenize_regex, 'char' uses tokenize
+
+    def scan(self, text): # Tokenize the text with the selected mode
+        if self.mode == 'char':
+            return self.tokenize(text)
+        return self.tokenize_regex(text)
 
 
     def tokenize(self, text): # Function to tokenize the text
@@ -149,6 +295,70 @@ class Tokenize:
                 self.saveError(text[pos], lineno)
                 pos += 1
 
+    def tokenize_regex(self, text): # Tokenize the text with the master regular expression
+        return self.stream(io.StringIO(text), len(text) + 1)
+
+    def stream(self, file, chunk_size=CHUNK_SIZE): # Tokenize a file reading it in chunks, one Token object at a time
+        for table in self.tables(file, chunk_size):
+            yield from table
+
+    def tables(self, file, chunk_size=CHUNK_SIZE): # Tokenize a file reading it in chunks, only a few characters are kept between chunks
+        lineno = 1 # Line number
+        word_kinds = WORD_KINDS
+        ID, INT, FLOAT, CHAR = TOKEN_KINDS['ID'], TOKEN_KINDS['INT'], TOKEN_KINDS['FLOAT'], TOKEN_KINDS['CHAR']
+        buffer = ''
+        eof = False
+
+        while not eof:
+            chunk = file.read(max(chunk_size, len(buffer))) # A token longer than a chunk (e.g. a long comment) doubles the next read
+            eof = not chunk
+            buffer += chunk
+            limit = len(buffer) - LOOKAHEAD
+            pos = 0
+
+            table = TokenTable(buffer) # One table per chunk, its tokens point into the buffer
+            kinds, starts, ends, linenos = table.kinds, table.starts, table.ends, table.linenos
+
+            # Each match is the whitespaces before a token, comment or invalid character, plus that element
+            for m in MASTER_PAT.finditer(buffer):
+                kind = m.lastgroup
+                end = m.end()
+                if not eof and (end > limit or kind == 'OPEN_COMMENT'): # Wait for the next chunk
+                    break
+
+                start = m.start(m.lastindex)
+                if start != pos: # Count newlines (lineno only changes on a new line, the tokens of a line share it)
+                    newlines = buffer.count('\n', pos, start)
+                    if newlines:
+                        lineno += newlines
+                pos = end
+
+                if kind == 'WORD': # Identifiers, keywords and symbols
+                    kinds.append(word_kinds.get(m.group(m.lastindex), ID))
+                elif kind == 'INT':
+                    kinds.append(INT)
+                elif kind == 'FLOAT':
+                    kinds.append(FLOAT)
+                elif kind == 'CHAR':
+                    kinds.append(CHAR)
+                else:
+                    if kind == 'COMMENT': # Skip comments (/* ... */)
+                        lineno += buffer.count('\n', start, end)
+                    elif kind == 'LINE_COMMENT': # Skip comments (// ...)
+                        if buffer[end - 1] == '\n':
+                            lineno += 1
+                    elif kind == 'OPEN_COMMENT':
+                        raise SyntaxError(f'Invalid token: Comment not closed at line {lineno} \n') # Error if the comment is not closed
+                    elif kind == 'ERROR':
+                        self.saveError(buffer[start], lineno)
+                    continue
+                starts.append(start)
+                ends.append(end)
+                linenos.append(lineno)
+
+            yield table
+            buffer = buffer[pos:]
+
     # # Print the errors
     # def printError(self, pos, lineno):
     #     print(f'SyntaxError: Invalid token: {pos} at line {lineno}')
@@ -179,7 +389,8 @@ class Tokenize:
         # if len(argv) != 1: # Check the number of arguments passed to the program
         #     raise SystemExit(f'Usage: python {argv[0]} <file>')
         with open(argv) as file: # Open the file passed as an argument
-            for token in self.tokenize(file.read()): # Tokenize the file content
+            source = self.tokenize(file.read()) if self.mode == 'char' else self.stream(file)
+            for token in source: # Tokenize the file content
                 tokens.append(token)
         
         # self.printToken(tokens) # Print the tokens in a table format
@@ -0,0 +1,70 @@
+'''
+Benchmark del analizador léxico
+===============================
+Genera un código fuente grande repitiendo los programas de
+programas_de_pruebas y mide la velocidad (MB/s) de cada modo de
+Tokenize: 'char' (un carácter a la vez), 'regex' (expresión maestra,
+un objeto Token por token) y 'tables' (expresión maestra con tokens en
+columnas, como los lee el parser). También comprueba que los tres
+modos producen los mismos tokens.
+
+    python Analizador_lexico/benchmark.py [--size MB] [-n repeticiones]
+'''
+import argparse
+import glob
+import io
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Analizador_lexico.analizador_lexico import Tokenize
+
+PROGRAMS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "programas_de_pruebas"))
+
+
+def generate_source(size):
+    # Concatena los programas de prueba hasta llegar a 'size' bytes
+    programs = [open(path, encoding='utf-8').read() for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.gox')))]
+    chunk = '\n'.join(programs) + '\n'
+    return chunk * max(1, size // len(chunk))
+
+
+def bench(text, mode, repeat):
+    best = None
+    for _ in range(repeat):
+        tokenize = Tokenize(mode)
+        start = time.perf_counter()
+        if mode == 'tables':
+            tables = list(tokenize.tables(io.StringIO(text)))
+        else:
+            tokens = list(tokenize.scan(text))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    if mode == 'tables':
+        tokens = [token for table in tables for token in table]
+    return best, tokens
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmark del analizador léxico')
+    ap.add_argument('--size', type=float, default=5, help='Tamaño del código generado en MB')
+    ap.add_argument('-n', '--repeat', type=int, default=1, help='Repeticiones por modo (se reporta la mejor)')
+    args = ap.parse_args(argv)
+
+    text = generate_source(int(args.size * 1024 * 1024))
+    mb = len(text.encode('utf-8')) / (1024 * 1024)
+    print(f"Código generado: {mb:.1f} MB")
+
+    results = {}
+    for mode in ('char', 'regex', 'tables'):
+        elapsed, tokens = bench(text, mode, args.repeat)
+        results[mode] = tokens
+        print(f"{mode:<6} {len(tokens):>10} tokens {elapsed:>8.2f} s {mb / elapsed:>8.2f} MB/s")
+
+    if not results['char'] == results['regex'] == results['tables']:
+        raise SystemExit("Los modos produjeron tokens distintos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import unittest
+import glob
+import io
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Analizador_lexico.analizador_lexico import Tokenize, Token, TokenStream
+
+PROGRAMS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "programas_de_pruebas"))
+
+def scan(text, mode): # Returns the tokens, the lexical errors and the SyntaxError message of a mode
+	tokenize = Tokenize(mode)
+	try:
+		tokens = list(tokenize.scan(text))
+	except SyntaxError as e:
+		return None, tokenize.errors, str(e)
+	return tokens, tokenize.errors, None
+
+class TestScanner(unittest.TestCase):
+	def test_simple_tokens(self): # Test keywords, names, symbols and numbers with the master regex
+		tokens = list(Tokenize().scan("var x = 42;\nif x <= .5 && true { print 'a'; }"))
+
+		expected_tokens = [
+			Token(type='VAR', value='var', lineno=1),
+			Token(type='ID', value='x', lineno=1),
+			Token(type='ASSIGN', value='=', lineno=1),
+			Token(type='INT', value='42', lineno=1),
+			Token(type='SEMI', value=';', lineno=1),
+			Token(type='IF', value='if', lineno=2),
+			Token(type='ID', value='x', lineno=2),
+			Token(type='LE', value='<=', lineno=2),
+			Token(type='FLOAT', value='.5', lineno=2),
+			Token(type='AND', value='&&', lineno=2),
+			Token(type='BOOL', value='true', lineno=2),
+			Token(type='LBRACE', value='{', lineno=2),
+			Token(type='PRINT', value='print', lineno=2),
+			Token(type='CHAR', value="'a'", lineno=2),
+			Token(type='SEMI', value=';', lineno=2),
+			Token(type='RBRACE', value='}', lineno=2),
+		]
+
+		self.assertEqual(tokens, expected_tokens)
+
+	def test_edge_cases(self): # Both modes agree on comments, invalid characters and trailing whitespaces
+		texts = [
+			"",
+			"x /* a\nb */ y // c\nz",
+			"x // c",
+			"x /* not closed\n",
+			"x @ y $\n",
+			"1.5e-3 42. 0x1 'ab' '\\x41' '\\''",
+			"x \x1c",
+			"int\t\n\n",
+		]
+		for text in texts:
+			with self.subTest(text=text):
+				self.assertEqual(scan(text, 'regex'), scan(text, 'char'))
+
+	def test_programs(self): # Both modes agree on every sample program
+		for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.gox'))):
+			with self.subTest(program=os.path.basename(path)):
+				with open(path, encoding='utf-8') as file:
+					text = file.read()
+				self.assertEqual(scan(text, 'regex'), scan(text, 'char'))
+
+	def test_stream_chunks(self): # Reading the file in small chunks gives the same tokens as the whole text
+		for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, '*.gox'))):
+			with open(path, encoding='utf-8') as file:
+				text = file.read()
+			for chunk_size in (1, 7, 64):
+				with self.subTest(program=os.path.basename(path), chunk_size=chunk_size):
+					tokenize = Tokenize()
+					try:
+						tokens = list(tokenize.stream(io.StringIO(text), chunk_size))
+						error = None
+					except SyntaxError as e:
+						tokens, error = None, str(e)
+					self.assertEqual((tokens, tokenize.errors, error), scan(text, 'char'))
+
+	def test_token_stream(self): # The columnar cursor gives the same tokens, lookahead and previous token across tables
+		text = "var x int = 42;\n/* comentario */ print x + 'a';"
+		expected_tokens = list(Tokenize().scan(text))
+		for chunk_size in (1, 4, 64):
+			with self.subTest(chunk_size=chunk_size):
+				tokens = TokenStream(Tokenize().tables(io.StringIO(text), chunk_size))
+				for i, token in enumerate(expected_tokens):
+					self.assertEqual((tokens.type(), tokens.value(), tokens.lineno()), (token.type, token.value, token.lineno))
+					self.assertEqual(tokens.token(1), expected_tokens[i + 1] if i + 1 < len(expected_tokens) else None)
+					tokens.advance()
+					self.assertEqual(tokens.token(-1), token)
+				self.assertIsNone(tokens.type())
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,207 @@
+'''
+Caché de compilación
+====================
+Guarda en disco el resultado de cada etapa del compilador para no
+repetirlas cuando el programa no ha cambiado:
+
+    ast     : el Program que produce el Parser
+    checked : el Program después del Checker (con los tipos anotados)
+    ir      : el IRModule que produce IRCode.gencode
+
+Cada entrada se identifica con un hash (sha256) del código fuente y de
+la huella del compilador (COMPILER_VERSION más el contenido de los
+archivos del compilador), así un cambio en el programa o en el
+compilador invalida las entradas anteriores sin borrarlas a mano.
+
+Las entradas se guardan con pickle, una por archivo:
+
+    <directorio>/<clave>.<etapa>.pickle
+
+El tamaño total del directorio está acotado (max_bytes). Cada acierto
+actualiza la fecha de modificación del archivo y, al superar el límite,
+se eliminan primero las entradas usadas hace más tiempo (LRU). Los
+aciertos y fallos de cada etapa se acumulan en stats.json.
+'''
+import hashlib
+import json
+import pickle
+import sys
+import os
+
+COMPILER_VERSION = '1'
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Archivos cuyo contenido forma parte de la huella del compilador
+COMPILER_SOURCES = [
+	'Analizador_lexico/analizador_lexico.py',
+	'Parser/model.py',
+	'Parser/parser.py',
+	'Checker/check.py',
+	'Checker/symtab.py',
+	'Checker/typesys.py',
+	'Codigo_Intermedio/IR.py',
+	'Codigo_Intermedio/opcodes.py',
+]
+
+STAGES = ('ast', 'checked', 'ir')
+
+DEFAULT_DIR = '.gox_cache'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_fingerprint = None
+
+def compiler_fingerprint():
+	'''
+	Huella del compilador: hash de COMPILER_VERSION y de los archivos
+	de COMPILER_SOURCES. Se calcula una sola vez por proceso.
+	'''
+	global _fingerprint
+	if _fingerprint is None:
+		digest = hashlib.sha256(COMPILER_VERSION.encode())
+		for name in COMPILER_SOURCES:
+			with open(os.path.join(ROOT, name), 'rb') as file:
+				digest.update(file.read())
+		_fingerprint = digest.hexdigest()
+	return _fingerprint
+
+
+class BuildCache:
+	def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, fingerprint=None):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.fingerprint = compiler_fingerprint() if fingerprint is None else fingerprint
+		os.makedirs(directory, exist_ok=True)
+
+	def key(self, source: bytes):
+		'''
+		Clave de un programa: hash de la huella del compilador y del código fuente.
+		'''
+		digest = hashlib.sha256(self.fingerprint.encode())
+		digest.update(source)
+		return digest.hexdigest()
+
+	def path(self, key, stage):
+		return os.path.join(self.directory, f'{key}.{stage}.pickle')
+
+	def get(self, key, stage):
+		'''
+		Devuelve el objeto guardado para (key, stage) o None si no existe.
+		'''
+		path = self.path(key, stage)
+		try:
+			with open(path, 'rb') as file:
+				value = pickle.load(file)
+		except FileNotFoundError:
+			self.count(stage, 'misses')
+			return None
+		except Exception:
+			# Entrada dañada (escritura interrumpida, versión de Python distinta...)
+			self.remove(path)
+			self.count(stage, 'misses')
+			return None
+
+		os.utime(path) # Uso más reciente para la política LRU
+		self.count(stage, 'hits')
+		return value
+
+	def put(self, key, stage, value):
+		'''
+		Guarda el objeto de una etapa. Si no se puede serializar (por
+		ejemplo, un árbol demasiado profundo para pickle) no se guarda.
+		'''
+		try:
+			data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+		except (RecursionError, pickle.PicklingError, TypeError, AttributeError):
+			return False
+
+		path = self.path(key, stage)
+		tmp = f'{path}.{os.getpid()}.tmp'
+		with open(tmp, 'wb') as file:
+			file.write(data)
+		os.replace(tmp, path) # Otro proceso nunca ve un archivo a medio escribir
+		self.evict()
+		return True
+
+	def entries(self):
+		'''
+		Lista (mtime, tamaño, ruta) de las entradas del directorio.
+		'''
+		entries = []
+		for name in os.listdir(self.directory):
+			if name.endswith('.pickle'):
+				path = os.path.join(self.directory, name)
+				try:
+					st = os.stat(path)
+				except FileNotFoundError:
+					continue
+				entries.append((st.st_mtime, st.st_size, path))
+		return entries
+
+	def evict(self):
+		'''
+		Elimina las entradas usadas hace más tiempo hasta que el
+		directorio quede dentro de max_bytes.
+		'''
+		entries = self.entries()
+		total = sum(size for _, size, _ in entries)
+		if total <= self.max_bytes:
+			return
+		for _, size, path in sorted(entries):
+			self.remove(path)
+			total -= size
+			if total <= self.max_bytes:
+				break
+
+	def remove(self, path):
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+	def clear(self):
+		for _, _, path in self.entries():
+			self.remove(path)
+		self.remove(os.path.join(self.directory, 'stats.json'))
+
+	# -------------------------------
+	# Estadísticas
+	# -------------------------------
+
+	def load_stats(self):
+		try:
+			with open(os.path.join(self.directory, 'stats.json')) as file:
+				return json.load(file)
+		except (FileNotFoundError, ValueError):
+			return {'hits': {}, 'misses': {}}
+
+	def count(self, stage, kind):
+		stats = self.load_stats()
+		stats[kind][stage] = stats[kind].get(stage, 0) + 1
+		path = os.path.join(self.directory, 'stats.json')
+		tmp = f'{path}.{os.getpid()}.tmp'
+		with open(tmp, 'w') as file:
+			json.dump(stats, file)
+		os.replace(tmp, path) # Como en put: nunca se lee un stats.json a medio escribir
+
+	def stats(self):
+		'''
+		Aciertos y fallos por etapa, número de entradas y bytes usados.
+		'''
+		stats = self.load_stats()
+		entries = self.entries()
+		return {
+			'hits': {stage: stats['hits'].get(stage, 0) for stage in STAGES},
+			'misses': {stage: stats['misses'].get(stage, 0) for stage in STAGES},
+			'entries': len(entries),
+			'bytes': sum(size for _, size, _ in entries),
+			'max_bytes': self.max_bytes,
+		}
+
+	def print_stats(self, out=sys.stdout):
+		stats = self.stats()
+		out.write(f"Caché: {self.directory}\n")
+		out.write(f"{'etapa':<10} {'aciertos':>10} {'fallos':>10}\n")
+		for stage in STAGES:
+			out.write(f"{stage:<10} {stats['hits'][stage]:>10} {stats['misses'][stage]:>10}\n")
+		out.write(f"{stats['entries']} entradas, {stats['bytes']} de {stats['max_bytes']} bytes\n")
@@ -0,0 +1,67 @@
+import unittest
+import contextlib
+import tempfile
+import io
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Cache_de_compilacion.cache import BuildCache
+from main.main import compile_program
+
+PROGRAM = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "programas_de_pruebas", "fib.gox"))
+
+def compile_quiet(path, cache): # Compiles without the progress messages
+	with contextlib.redirect_stdout(io.StringIO()):
+		return compile_program(path, cache)
+
+class TestBuildCache(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.directory = self.tmp.name
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_hit(self): # The second compile of an unchanged program takes the IR from the cache
+		cache = BuildCache(self.directory)
+		first = compile_quiet(PROGRAM, cache)
+		second = compile_quiet(PROGRAM, cache)
+
+		self.assertEqual({name: func.code for name, func in first.functions.items()},
+		                 {name: func.code for name, func in second.functions.items()})
+		stats = cache.stats()
+		self.assertEqual(stats['hits'], {'ast': 0, 'checked': 0, 'ir': 1})
+		self.assertEqual(stats['misses'], {'ast': 1, 'checked': 1, 'ir': 1})
+		self.assertEqual(stats['entries'], 3)
+
+	def test_key(self): # The key changes with the source and with the compiler
+		cache = BuildCache(self.directory, fingerprint='a')
+		self.assertEqual(cache.key(b'print 1;'), cache.key(b'print 1;'))
+		self.assertNotEqual(cache.key(b'print 1;'), cache.key(b'print 2;'))
+		self.assertNotEqual(cache.key(b'print 1;'), BuildCache(self.directory, fingerprint='b').key(b'print 1;'))
+
+	def test_lru_eviction(self): # Over max_bytes the least recently used entries are removed
+		cache = BuildCache(self.directory, max_bytes=2500)
+		cache.put('a', 'ir', b'x' * 1000)
+		cache.put('b', 'ir', b'x' * 1000)
+		os.utime(cache.path('a', 'ir'), (1, 1))
+		os.utime(cache.path('b', 'ir'), (2, 2))
+		self.assertIsNotNone(cache.get('a', 'ir')) # 'a' becomes the most recently used
+		cache.put('c', 'ir', b'x' * 1000)
+
+		self.assertIsNotNone(cache.get('a', 'ir'))
+		self.assertIsNone(cache.get('b', 'ir'))
+		self.assertIsNotNone(cache.get('c', 'ir'))
+
+	def test_corrupt_entry(self): # A damaged entry counts as a miss and is removed
+		cache = BuildCache(self.directory)
+		with open(cache.path('a', 'ast'), 'wb') as file:
+			file.write(b'not a pickle')
+
+		self.assertIsNone(cache.get('a', 'ast'))
+		self.assertFalse(os.path.exists(cache.path('a', 'ast')))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -14,6 +14,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Checker.check  import Checker
 from Parser.model import *
 from Parser.parser import Parser
+from Codigo_Intermedio.opcodes import Pool, encode, decode
 
 # Todo el código IR se empaquetará en un módulo. Un 
 # módulo es un conjunto de funciones.
@@ -22,23 +23,53 @@ class IRModule:
 	def __init__(self):
 		self.functions = { }       # Dict de funciones IR 
 		self.globals = { }         # Dict de variables global
+		self.pool = Pool()         # Constantes y nombres del código codificado
+
+	def global_slots(self):
+		'''
+		Asigna a cada variable global un número de slot, en el
+		orden en que fue declarada.
+		'''
+		return {name: n for n, name in enumerate(self.globals)}
+
+	def encode(self, release=False):
+		'''
+		Codifica el código de cada función (func.words) con el pool del
+		módulo y devuelve el pool. Con release=True se sueltan las
+		tuplas; func.code las vuelve a construir si se piden.
+		'''
+		for func in self.functions.values():
+			func.encode(release)
+		return self.pool
 		
-	def dump(self):
-		print("MODULE:::")
+	def lines(self):
+		yield "MODULE:::"
 		for glob in self.globals.values():
-			glob.dump()
-			
+			yield from glob.lines()
 		for func in self.functions.values():
-			func.dump()
+			yield from func.lines()
+
+	def dump(self, file=None):
+		'''
+		Escribe el módulo en formato de texto, el mismo que lee
+		Codigo_Intermedio/ir_text.py. file puede ser una ruta o un archivo
+		de texto abierto (por defecto sys.stdout).
+		'''
+		_write_lines(self.lines(), file)
 			
 # Variables Globales
 class IRGlobal:
-	def __init__(self, name, type):
+	def __init__(self, name, type, const=False):
 		self.name = name
 		self.type = type
+		self.const = const   # Declarada con 'const': solo se asigna al declararla
 		
-	def dump(self):
-		print(f"GLOBAL::: {self.name}: {self.type}")
+	def lines(self):
+		line = f"GLOBAL::: {self.name}: {self.type}"
+		yield line + " const" if self.const else line
+
+	def dump(self, file=None):
+		_write_lines(self.lines(), file)
 
 # Las funciones sirven como contenedor de las 
 # instrucciones IR de bajo nivel específicas de cada
@@ -57,22 +88,97 @@ class IRFunction:
 		self.return_type = return_type
 		self.imported = imported
 		self.locals = { }    # Variables Locales
-		self.code = [ ]      # Lista de Instrucciones IR 
+		self._code = [ ]     # Lista de Instrucciones IR 
+		self.words = None    # Código codificado (opcodes.encode), usa module.pool
+		self.notes = [ ]     # Comentarios del optimizador, salen en el volcado
+
+	@property
+	def code(self):
+		if self._code is None:
+			self._code = decode(self.words, self.module.pool)
+		return self._code
+
+	@code.setter
+	def code(self, code):
+		self._code = code
+		self.words = None
+
+	def encode(self, release=False):
+		'''
+		La lista de tuplas, si existe, es la fuente: se vuelve a
+		codificar para no usar un array viejo después de modificarla.
+		'''
+		if self._code is not None:
+			self.words = encode(self._code, self.module.pool)
+			if release:
+				self._code = None
+		return self.words
+
+	def set_words(self, words):
+		'''
+		Usa código ya codificado con module.pool (por ejemplo, leído de
+		un archivo .goxc) en lugar de la lista de tuplas.
+		'''
+		self._code = None
+		self.words = words
 		
 	def new_local(self, name, type):
 		self.locals[name] = type
 		
+	def slots(self):
+		'''
+		Asigna a cada parámetro y variable local un número de slot
+		dentro del marco de la función: primero los parámetros, en
+		orden, y luego las variables locales.
+		'''
+		slots = {name: n for n, name in enumerate(self.parmnames)}
+		for name in self.locals:
+			slots.setdefault(name, len(slots))
+		return slots
+
 	def append(self, instr):
 		self.code.append(instr)
 		
 	def extend(self, instructions):
 		self.code.extend(instructions)
 		
-	def dump(self):
-		print(f"FUNCTION::: {self.name}, {self.parmnames}, {self.parmtypes} {self.return_type}")
-		print(f"locals: {self.locals}")
-		for instr in self.code:
-			print(instr)
+	def lines(self):
+		header = f"FUNCTION::: {self.name}, {self.parmnames}, {self.parmtypes} {self.return_type}"
+		yield header + " import" if self.imported else header
+		yield f"locals: {self.locals}"
+		for note in self.notes:
+			yield f"# {note}"
+		yield from map(repr, self.code)
+
+	def dump(self, file=None):
+		_write_lines(self.lines(), file)
+
+# Líneas acumuladas antes de cada escritura al volcar el IR
+DUMP_BLOCK = 4096
+
+def _write_lines(lines, file=None):
+	'''
+	Escribe las líneas en bloques de DUMP_BLOCK con un solo write() por
+	bloque. Se escribe texto plano: rich.print partía las líneas largas
+	(por ejemplo, los locals de una función grande) y el resultado ya no
+	se podía volver a leer.
+	'''
+	if isinstance(file, (str, os.PathLike)):
+		with open(file, 'w', encoding='utf-8') as out:
+			_write_lines(lines, out)
+		return
+
+	out = sys.stdout if file is None else file
+	block = []
+	for line in lines:
+		block.append(line)
+		if len(block) >= DUMP_BLOCK:
+			block.append('')
+			out.write('\n'.join(block))
+			block = []
+	if block:
+		block.append('')
+		out.write('\n'.join(block))
 			
 # Mapeo de tipos de GoxLang a tipos de IR
 _typemap = {
@@ -146,8 +252,7 @@ class IRCode(Visitor):
 		
 		module = IRModule()
 		func = IRFunction(module, 'main', [], [], 'I')
-		for item in node.stmts:
-			item.accept(ircode, func)
+		ircode.statements(node.stmts, func)
 		if '_actual_main' in module.functions:
 			func.append(('CALL', '_actual_main'))
 		else:
@@ -155,6 +260,17 @@ class IRCode(Visitor):
 		func.append(('RET',))
 		return module
 	
+	def statements(self, stmts, func:IRFunction):
+		'''
+		Genera una lista de sentencias. Una expresión usada como
+		sentencia (p. ej. una llamada 'f(x);') deja su valor en la
+		pila, así que se descarta con POP.
+		'''
+		for item in stmts:
+			item.accept(self, func)
+			if isinstance(item, Expression):
+				func.append(('POP',))
+
 	# --- Statements
 
 	def visit(self, n:PrintStmt, func:IRFunction):
@@ -184,14 +300,12 @@ class IRCode(Visitor):
 
 		func.append(('IF',))
 
-		for item in n.consequence:
-			item.accept(self, func)
+		self.statements(n.consequence, func)
 
 		func.append(('ELSE',))
 
 		if n.alternative != None:
-			for item in n.alternative:
-				item.accept(self, func)
+			self.statements(n.alternative, func)
 		
 		func.append(('ENDIF',))
 
@@ -202,8 +316,7 @@ class IRCode(Visitor):
 
 		func.extend([('SUBI',), ('CBREAK',)])
 
-		for item in n.body:
-			item.accept(self, func)
+		self.statements(n.body, func)
 
 		func.append(('ENDLOOP',))
 
@@ -233,7 +346,7 @@ class IRCode(Visitor):
 
 		if func.name == 'main':
 			# print(f'Esto es n {n}')
-			var_global = IRGlobal(n.name, _typemap[n.type])
+			var_global = IRGlobal(n.name, _typemap[n.type], n.kind == 'const')
 			func.module.globals[n.name] = var_global
 
 			if n.value != None:
@@ -258,8 +371,7 @@ class IRCode(Visitor):
 		new_func = IRFunction(func.module, name, parmnames, parmtypes, rettype, n.is_import)
 		
 		if not n.is_import:
-			for item in n.statements:
-				item.accept(self, new_func)
+			self.statements(n.statements, new_func)
 
 	# --- Expressions
 
@@ -289,7 +401,7 @@ class IRCode(Visitor):
 		if n.op == '&&':
 			# Validar el circuito corto: A && B, si A es falso => no necesita evaluar B
 			n.left.accept(self, func)
-			func.append(('IF,',))
+			func.append(('IF',))
 			n.right.accept(self, func)
 			func.append(('ELSE',))
 			func.append(('CONSTI', 0))
@@ -297,7 +409,7 @@ class IRCode(Visitor):
 
 		elif n.op == '||':
 			n.left.accept(self, func)
-			func.append(('IF,',))
+			func.append(('IF',))
 			func.append(('CONSTI', 1))
 			func.append(('ELSE',))
 			n.right.accept(self, func)
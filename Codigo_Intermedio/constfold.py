@@ -0,0 +1,197 @@
+'''
+Plegado de constantes
+=====================
+Pase de optimización sobre el código IR (lista de tuplas) de cada
+función:
+
+1. Plegado: una operación cuyos operandos son constantes se calcula al
+   compilar. Por ejemplo, 'CONSTF 2.0; CONSTF -1.0; MULF' (el -2.0 de
+   mandel.gox) queda como 'CONSTF -2.0'. Como el IR es postfijo, una
+   sola pasada pliega expresiones anidadas completas.
+
+2. Simplificación: se eliminan las operaciones neutras que quedan con
+   una constante a la derecha: x + 0, x - 0, x * 1, x / 1 (y x * 1.0,
+   x / 1.0 para flotantes).
+
+3. Propagación de globales 'const': si main asigna una constante a una
+   global declarada con 'const' fuera de todo IF o LOOP, cada
+   GLOBAL_GET posterior se cambia por esa constante y se vuelve a
+   plegar. Así una constante definida a partir de otras también se
+   propaga. Si la global ya no se lee en ningún lugar, su asignación
+   también se quita.
+
+Una operación que fallaría al ejecutarse (división por cero, FTOI de
+un infinito) no se pliega: el error sigue ocurriendo en la máquina.
+'''
+import operator
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import IF_NAMES
+
+# Operaciones binarias: opname -> (función, instrucción del resultado).
+# Usan la misma aritmética que StackMachine (DIVI es división entera
+# hacia abajo, las comparaciones dejan 0 o 1).
+_binary = {
+	'ADDI': (operator.add, 'CONSTI'),
+	'SUBI': (operator.sub, 'CONSTI'),
+	'MULI': (operator.mul, 'CONSTI'),
+	'DIVI': (operator.floordiv, 'CONSTI'),
+	'LTI':  (lambda a, b: int(a < b), 'CONSTI'),
+	'LEI':  (lambda a, b: int(a <= b), 'CONSTI'),
+	'GTI':  (lambda a, b: int(a > b), 'CONSTI'),
+	'GEI':  (lambda a, b: int(a >= b), 'CONSTI'),
+	'EQI':  (lambda a, b: int(a == b), 'CONSTI'),
+	'NEI':  (lambda a, b: int(a != b), 'CONSTI'),
+
+	'ADDF': (operator.add, 'CONSTF'),
+	'SUBF': (operator.sub, 'CONSTF'),
+	'MULF': (operator.mul, 'CONSTF'),
+	'DIVF': (operator.truediv, 'CONSTF'),
+	'LTF':  (lambda a, b: int(a < b), 'CONSTI'),
+	'LEF':  (lambda a, b: int(a <= b), 'CONSTI'),
+	'GTF':  (lambda a, b: int(a > b), 'CONSTI'),
+	'GEF':  (lambda a, b: int(a >= b), 'CONSTI'),
+	'EQF':  (lambda a, b: int(a == b), 'CONSTI'),
+	'NEF':  (lambda a, b: int(a != b), 'CONSTI'),
+}
+
+_unary = {
+	'ITOF': (float, 'CONSTF'),
+	'FTOI': (lambda a: int(round(a)), 'CONSTI'),
+}
+
+# Constante a la derecha que deja igual al otro operando
+_identities = {
+	('ADDI', ('CONSTI', 0)),
+	('SUBI', ('CONSTI', 0)),
+	('MULI', ('CONSTI', 1)),
+	('DIVI', ('CONSTI', 1)),
+	('MULF', ('CONSTF', 1.0)),
+	('DIVF', ('CONSTF', 1.0)),
+}
+
+
+def is_constant(instr):
+	return instr[0] == 'CONSTI' or instr[0] == 'CONSTF'
+
+def fold_code(code):
+	'''
+	Devuelve una nueva lista de instrucciones con las constantes plegadas.
+	'''
+	out = []
+	for instr in code:
+		opname = instr[0]
+		if opname in _binary and len(out) >= 2 and is_constant(out[-2]) and is_constant(out[-1]):
+			function, result = _binary[opname]
+			try:
+				out[-2:] = [(result, function(out[-2][1], out[-1][1]))]
+				continue
+			except (ArithmeticError, ValueError):
+				pass
+		elif opname in _unary and out and is_constant(out[-1]):
+			function, result = _unary[opname]
+			try:
+				out[-1] = (result, function(out[-1][1]))
+				continue
+			except (ArithmeticError, ValueError):
+				pass
+		elif out and (opname, out[-1]) in _identities:
+			out.pop()
+			continue
+		out.append(instr)
+	return out
+
+def constant_globals(module):
+	'''
+	Devuelve {nombre: instrucción constante} de las globales 'const'
+	que main inicializa con una constante fuera de todo bloque, junto
+	con la posición del GLOBAL_SET en main.
+	'''
+	main = module.functions['main']
+	depth = 0
+	found = {}
+	for pc, instr in enumerate(main.code):
+		opname = instr[0]
+		if opname == 'LOOP' or opname in IF_NAMES:
+			depth += 1
+		elif opname == 'ENDLOOP' or opname == 'ENDIF':
+			depth -= 1
+		elif opname == 'GLOBAL_SET' and depth == 0 and pc > 0 and is_constant(main.code[pc - 1]):
+			glob = module.globals.get(instr[1])
+			if glob is not None and glob.const and instr[1] not in found:
+				found[instr[1]] = (main.code[pc - 1], pc)
+
+	# Una global que se asigna en otro lugar no es constante
+	for func in module.functions.values():
+		for pc, instr in enumerate(func.code):
+			if instr[0] == 'GLOBAL_SET' and instr[1] in found and (func.name != 'main' or found[instr[1]][1] != pc):
+				del found[instr[1]]
+	return found
+
+def propagate(module, constants):
+	'''
+	Cambia los GLOBAL_GET de las globales de constants por su valor. En
+	main solo se cambian los que están después de la asignación.
+	'''
+	for func in module.functions.values():
+		code = func.code
+		if not any(instr[0] == 'GLOBAL_GET' and instr[1] in constants for instr in code):
+			continue
+		func.code = [
+			constants[instr[1]][0]
+			if instr[0] == 'GLOBAL_GET' and instr[1] in constants and (func.name != 'main' or pc > constants[instr[1]][1])
+			else instr
+			for pc, instr in enumerate(code)
+		]
+
+def drop_stores(module, names):
+	'''
+	Quita de main la asignación 'constante; GLOBAL_SET' de las globales
+	de names que ya no se leen en ninguna función.
+	'''
+	read = {instr[1] for func in module.functions.values() for instr in func.code if instr[0] == 'GLOBAL_GET'}
+	unused = set(names) - read
+	if not unused:
+		return
+	main = module.functions['main']
+	out = []
+	for instr in main.code:
+		if instr[0] == 'GLOBAL_SET' and instr[1] in unused and out and is_constant(out[-1]):
+			out.pop()
+			continue
+		out.append(instr)
+	main.code = out
+
+def constfold(module):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte: instrucciones
+	antes y después por función y las globales propagadas.
+	'''
+	before = {name: len(func.code) for name, func in module.functions.items()}
+	for func in module.functions.values():
+		func.code = fold_code(func.code)
+
+	propagated = {}
+	while True:
+		constants = {name: value for name, value in constant_globals(module).items() if name not in propagated}
+		if not constants:
+			break
+		propagate(module, constants)
+		for func in module.functions.values():
+			func.code = fold_code(func.code)
+		propagated.update(constants)
+	drop_stores(module, propagated)
+
+	return {
+		'functions': {name: (before[name], len(func.code)) for name, func in module.functions.items()},
+		'globals': {name: value[0][1] for name, value in propagated.items()},
+	}
+
+def describe(report):
+	for name, (before, after) in report['functions'].items():
+		if before != after:
+			yield f"{name}: {before} -> {after} instrucciones"
+	for name, value in report['globals'].items():
+		yield f"const {name} = {value}"
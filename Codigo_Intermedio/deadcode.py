@@ -0,0 +1,182 @@
+'''
+Eliminación de código muerto
+============================
+Pase de optimización sobre el código IR (lista de tuplas) de cada
+función. Quita, en este orden:
+
+1. Ramas con condición constante: 'CONSTI c; IF ... ELSE ... ENDIF'
+   deja solo la rama que se ejecuta ('if false { ... }' desaparece
+   completo). Un ciclo que empieza con BREAK (un 'while false' después
+   de peephole) también se quita completo.
+
+2. Código inalcanzable: se recorre el flujo de control desde el inicio
+   de la función siguiendo los destinos de link(). Las instrucciones a
+   las que no se llega se quitan (p. ej., lo que sigue a un RET). Los
+   marcadores LOOP, ENDLOOP, ELSE y ENDIF delimitan los bloques y son
+   destino de saltos, por eso se conservan mientras su bloque se
+   alcance; un bloque cuyo LOOP o IF no se alcanza se quita entero.
+
+3. Asignaciones muertas: un LOCAL_SET de una variable local que nunca
+   se lee. Si el valor asignado viene de una expresión que no tiene
+   efectos ni puede fallar (constantes, variables, +, -, *,
+   comparaciones...), se quita con la expresión; si no, el LOCAL_SET
+   se cambia por POP. Una variable local que ya no se usa se quita de
+   la función.
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import link, IF_NAMES, EXIT_NAMES
+
+# Instrucciones que abren y cierran un bloque
+_MARKERS = {'LOOP', 'ENDLOOP', 'ELSE', 'ENDIF'} | IF_NAMES
+
+# Instrucciones sin efectos que no pueden fallar: opname -> (saca, deja).
+# DIVI/DIVF (división por cero), FTOI (infinito), PEEK* (dirección
+# inválida) y GROW quedan fuera.
+_pure = {'CONSTI': (0, 1), 'CONSTF': (0, 1), 'GLOBAL_GET': (0, 1), 'LOCAL_GET': (0, 1),
+	'NEGI': (1, 1), 'NEGF': (1, 1), 'ITOF': (1, 1)}
+for _name in ('ADD', 'SUB', 'MUL', 'LT', 'LE', 'GT', 'GE', 'EQ', 'NE'):
+	_pure[_name + 'I'] = _pure[_name + 'F'] = (2, 1)
+
+
+def fold_branches(code):
+	'''
+	Quita los IF con condición constante y los ciclos que empiezan con BREAK.
+	'''
+	targets = link(code)
+	drop = [False] * len(code)
+	for pc in range(len(code) - 1):
+		if drop[pc]:
+			continue
+		instr = code[pc]
+		if instr[0] == 'CONSTI' and code[pc + 1] == ('IF',):
+			else_pc, endif_pc = targets[pc + 1]
+			if instr[1] != 0:
+				# Se ejecuta la consecuencia: se quita desde el ELSE
+				removed = [pc, pc + 1] + list(range(else_pc if else_pc is not None else endif_pc, endif_pc + 1))
+			else:
+				# Se ejecuta la alternativa: se quita hasta el ELSE
+				removed = list(range(pc, (else_pc if else_pc is not None else endif_pc) + 1)) + [endif_pc]
+			for n in removed:
+				drop[n] = True
+		elif instr == ('LOOP',) and code[pc + 1] == ('BREAK',):
+			for n in range(pc, targets[pc] + 1):
+				drop[n] = True
+	return [instr for pc, instr in enumerate(code) if not drop[pc]]
+
+def reachable(code):
+	'''
+	Devuelve una lista de booleanos: si se llega o no a cada instrucción.
+	'''
+	targets = link(code)
+	seen = [False] * len(code)
+	work = [0]
+	while work:
+		pc = work.pop()
+		if pc >= len(code) or seen[pc]:
+			continue
+		seen[pc] = True
+		opname = code[pc][0]
+		target = targets.get(pc)
+		if type(target) is tuple:             # IF, IF_*: (ELSE o None, ENDIF)
+			target = target[1] if target[0] is None else target[0]
+
+		if opname == 'RET' or opname == 'TAILCALL':
+			continue
+		elif opname in IF_NAMES or (opname in EXIT_NAMES and opname != 'BREAK'):
+			work.extend((pc + 1, target + 1))
+		elif opname in ('BREAK', 'CONTINUE', 'ENDLOOP', 'ELSE'):
+			work.append(target + 1)
+		else:
+			work.append(pc + 1)
+	return seen
+
+def drop_unreachable(code):
+	'''
+	Quita las instrucciones a las que no se llega (ver el punto 2).
+	'''
+	if not code:
+		return code
+	seen = reachable(code)
+	targets = link(code)
+	out = []
+	pc = 0
+	while pc < len(code):
+		opname = code[pc][0]
+		if not seen[pc] and (opname == 'LOOP' or opname in IF_NAMES):
+			end = targets[pc]
+			pc = (end[1] if type(end) is tuple else end) + 1
+			continue
+		if seen[pc] or opname in _MARKERS:
+			out.append(code[pc])
+		pc += 1
+	return out
+
+def _expression_start(out):
+	'''
+	Devuelve la posición en out donde empieza la expresión que deja el
+	valor del tope, o None si no es una expresión pura.
+	'''
+	need = 1
+	for n in range(len(out) - 1, -1, -1):
+		effect = _pure.get(out[n][0])
+		if effect is None:
+			return None
+		need += effect[0] - effect[1]
+		if need == 0:
+			return n
+	return None
+
+def drop_stores(func):
+	'''
+	Quita las asignaciones a variables locales que no se leen (ver el
+	punto 3). Devuelve el código nuevo.
+	'''
+	code = func.code
+	while True:
+		read = {instr[1] for instr in code if instr[0] == 'LOCAL_GET'}
+		dead = {instr[1] for instr in code if instr[0] == 'LOCAL_SET'} - read
+		if not dead:
+			return code
+
+		# Quitar una expresión puede dejar sin lecturas a otra variable
+		out = []
+		for instr in code:
+			if instr[0] == 'LOCAL_SET' and instr[1] in dead:
+				start = _expression_start(out)
+				if start is not None:
+					del out[start:]
+				else:
+					out.append(('POP',))
+				continue
+			out.append(instr)
+		code = out
+
+		for name in dead:
+			if name not in func.parmnames:
+				func.locals.pop(name, None)
+
+def deadcode(module):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte con las
+	instrucciones quitadas por función: {nombre: (ramas, inalcanzables,
+	asignaciones)}.
+	'''
+	report = {}
+	for name, func in module.functions.items():
+		code = func.code
+		folded = fold_branches(code)
+		func.code = drop_unreachable(folded)
+		live = len(func.code)
+		func.code = drop_stores(func)
+		report[name] = (len(code) - len(folded), len(folded) - live, live - len(func.code))
+	return report
+
+def describe(report):
+	for name, (branches, unreachable, stores) in report.items():
+		total = branches + unreachable + stores
+		if total:
+			yield (f"{name}: {total} instrucciones eliminadas "
+				f"({branches} en ramas constantes, {unreachable} inalcanzables, {stores} en asignaciones muertas)")
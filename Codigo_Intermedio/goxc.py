@@ -0,0 +1,245 @@
+'''
+Formato binario de módulos compilados (.goxc)
+=============================================
+Un archivo .goxc guarda un IRModule ya generado, de modo que se puede
+ejecutar sin volver a pasar por el analizador léxico, el parser, el
+checker ni la generación de código. Todos los números son little-endian.
+
+    Encabezado   'GOXC', versión (u16), reservado (u16),
+                 número de entradas del pool, globales y funciones (u32)
+    Pool         por cada entrada: 's' + longitud (u16) + bytes UTF-8,
+                 'i' + int64 o 'f' + double. Guarda las constantes, los
+                 nombres de variables y funciones y los tipos ('I', 'F')
+    Globales     por cada una: nombre, tipo (índices del pool, u32),
+                 const (u8)
+    Funciones    por cada una:
+                   nombre, tipo de retorno (u32), importada (u8),
+                   número de parámetros y de locales (u32),
+                   (nombre, tipo) de cada parámetro y cada local (u32),
+                   número de instrucciones (u32),
+                   relleno hasta múltiplo de 4,
+                   código: dos int32 por instrucción (opcode, operando)
+
+El código es exactamente la forma codificada de opcodes.encode(): el
+opcode es el número de Op y el operando un índice del pool o el destino
+de salto ya resuelto.
+
+load() abre el archivo con mmap y copia el código de cada función a un
+array('i') sin construir tuplas; el IRModule que devuelve se entrega tal
+cual a StackMachine.load_ir.
+'''
+from array import array
+import mmap
+import struct
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.IR import IRModule, IRGlobal, IRFunction
+from Codigo_Intermedio.opcodes import Op, Pool, NAMES, NAME_OPS, JUMP_OPS, IF_OPS, EXIT_OPS
+
+MAGIC = b'GOXC'
+VERSION = 3
+
+_header = struct.Struct('<4sHHIII')
+_tag = struct.Struct('<c')
+_string = struct.Struct('<H')
+_int = struct.Struct('<q')
+_float = struct.Struct('<d')
+_pair = struct.Struct('<II')
+_global = struct.Struct('<IIB')
+_function = struct.Struct('<IIBII')
+_count = struct.Struct('<I')
+
+# Instrucción a la que debe apuntar cada salto
+_jump_kinds = {
+	Op.LOOP: {Op.ENDLOOP},
+	Op.ENDLOOP: {Op.LOOP},
+	Op.CONTINUE: {Op.LOOP},
+	Op.ELSE: {Op.ENDIF},
+}
+_jump_kinds.update({op: {Op.ENDLOOP} for op in EXIT_OPS})
+_jump_kinds.update({op: {Op.ELSE, Op.ENDIF} for op in IF_OPS})
+
+# Tipo que debe tener en el pool el operando de cada instrucción
+_operand_types = {Op.CONSTI: int, Op.CONSTF: float}
+_operand_types.update({op: str for op in NAME_OPS})
+
+
+class GoxcError(Exception):
+	'''
+	Se genera cuando un archivo .goxc no es válido.
+	'''
+	def __init__(self, message):
+		super().__init__(f"Error en goxc: {message}")
+
+
+# -------------------------------
+# Escritura
+# -------------------------------
+
+def dumps(module: IRModule) -> bytes:
+	'''
+	Serializa un IRModule en el formato .goxc.
+	'''
+	module.encode()
+	# El código ya apunta al pool del módulo; los nombres y tipos de
+	# globales, parámetros y locales se agregan al final en una copia.
+	pool = Pool(module.pool.values)
+
+	globals_ = [_global.pack(pool.add(g.name), pool.add(g.type), g.const) for g in module.globals.values()]
+
+	functions = []
+	for func in module.functions.values():
+		functions.append((
+			_function.pack(pool.add(func.name), pool.add(func.return_type), func.imported, len(func.parmnames), len(func.locals)),
+			[_pair.pack(pool.add(name), pool.add(type)) for name, type in zip(func.parmnames, func.parmtypes)],
+			[_pair.pack(pool.add(name), pool.add(type)) for name, type in func.locals.items()],
+			len(func.words) // 2,
+			_little(func.words).tobytes(),
+		))
+
+	out = bytearray(_header.pack(MAGIC, VERSION, 0, len(pool), len(globals_), len(functions)))
+	for value in pool.values:
+		if isinstance(value, str):
+			data = value.encode('utf-8')
+			out += b's' + _string.pack(len(data)) + data
+		elif isinstance(value, float):
+			out += b'f' + _float.pack(value)
+		elif -2**63 <= value < 2**63:
+			out += b'i' + _int.pack(value)
+		else:
+			raise GoxcError(f"la constante {value} no cabe en 64 bits")
+	out += b''.join(globals_)
+	for header, params, locals_, ncode, code in functions:
+		out += header
+		out += b''.join(params)
+		out += b''.join(locals_)
+		out += _count.pack(ncode)
+		out += bytes(-len(out) % 4)     # El código empieza alineado a 4 bytes
+		out += code
+	return bytes(out)
+
+def dump(module: IRModule, path):
+	with open(path, 'wb') as file:
+		file.write(dumps(module))
+
+def _little(words):
+	# El archivo siempre es little-endian
+	if sys.byteorder != 'little':
+		words = array('i', words)
+		words.byteswap()
+	return words
+
+
+# -------------------------------
+# Lectura
+# -------------------------------
+
+def loads(buffer) -> IRModule:
+	'''
+	Reconstruye un IRModule desde un objeto con interfaz de buffer
+	(bytes, mmap...).
+	'''
+	with memoryview(buffer) as view:
+		try:
+			return _read(view)
+		except struct.error:
+			raise GoxcError("archivo truncado") from None
+
+def load(path) -> IRModule:
+	with open(path, 'rb') as file:
+		if os.fstat(file.fileno()).st_size == 0:
+			raise GoxcError(f"'{path}' está vacío")
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			return loads(mm)
+
+def _read(view):
+	magic, version, _, npool, nglobals, nfuncs = _header.unpack_from(view, 0)
+	if magic != MAGIC:
+		raise GoxcError("no es un archivo .goxc")
+	if version != VERSION:
+		raise GoxcError(f"versión {version} no soportada (se esperaba {VERSION})")
+	offset = _header.size
+
+	values = []
+	for _ in range(npool):
+		(tag,) = _tag.unpack_from(view, offset)
+		offset += _tag.size
+		if tag == b's':
+			(size,) = _string.unpack_from(view, offset)
+			offset += _string.size
+			values.append(str(view[offset:offset + size], 'utf-8'))
+			offset += size
+		elif tag == b'i':
+			values.append(_int.unpack_from(view, offset)[0])
+			offset += _int.size
+		elif tag == b'f':
+			values.append(_float.unpack_from(view, offset)[0])
+			offset += _float.size
+		else:
+			raise GoxcError(f"entrada del pool con tipo desconocido {tag!r}")
+
+	module = IRModule()
+	module.pool = Pool(values)
+
+	def name(index):
+		if index >= npool or not isinstance(values[index], str):
+			raise GoxcError(f"el índice {index} no es un nombre del pool")
+		return values[index]
+
+	for _ in range(nglobals):
+		gname, gtype, const = _global.unpack_from(view, offset)
+		offset += _global.size
+		module.globals[name(gname)] = IRGlobal(name(gname), name(gtype), bool(const))
+
+	for _ in range(nfuncs):
+		fname, rettype, imported, nparams, nlocals = _function.unpack_from(view, offset)
+		offset += _function.size
+		params = []
+		for _ in range(nparams):
+			pname, ptype = _pair.unpack_from(view, offset)
+			offset += _pair.size
+			params.append((name(pname), name(ptype)))
+		func = IRFunction(module, name(fname), [p for p, _ in params], [t for _, t in params], name(rettype), bool(imported))
+		for _ in range(nlocals):
+			lname, ltype = _pair.unpack_from(view, offset)
+			offset += _pair.size
+			func.new_local(name(lname), name(ltype))
+
+		(ncode,) = _count.unpack_from(view, offset)
+		offset += _count.size
+		offset += -offset % 4
+		end = offset + 8 * ncode
+		if end > len(view):
+			raise GoxcError(f"código de la función '{func.name}' truncado")
+		words = array('i')
+		words.frombytes(view[offset:end])
+		words = _little(words)
+		_check(words, values, func.name)
+		func.set_words(words)           # Las tuplas se construyen solo si se piden
+		offset = end
+
+	if 'main' not in module.functions:
+		raise GoxcError("el módulo no tiene función main")
+	return module
+
+def _check(words, values, fname):
+	'''
+	Comprueba que cada opcode exista, que cada operando apunte a una
+	entrada del pool del tipo correcto y que cada salto llegue a la
+	instrucción que le corresponde.
+	'''
+	ops = words[0::2]
+	ncode = len(ops)
+	for pc in range(ncode):
+		op = ops[pc]
+		operand = words[2 * pc + 1]
+		if not 0 <= op < len(NAMES):
+			raise GoxcError(f"opcode {op} desconocido en la función '{fname}'")
+		if op in _operand_types:
+			if not 0 <= operand < len(values) or type(values[operand]) is not _operand_types[op]:
+				raise GoxcError(f"operando inválido en la instrucción {pc} de la función '{fname}'")
+		elif op in JUMP_OPS:
+			if not 0 <= operand < ncode or ops[operand] not in _jump_kinds[op]:
+				raise GoxcError(f"destino de salto inválido en la instrucción {pc} de la función '{fname}'")
@@ -0,0 +1,201 @@
+'''
+Expansión de funciones pequeñas (inlining)
+==========================================
+Pase de optimización sobre el IRModule: cada CALL a una función
+pequeña se cambia por el código de la función. Por ejemplo, en
+easter.gox cada 'mod(x, y)' deja de pasar por CALL y RET:
+
+	<x>; <y>; CALL mod
+
+queda como
+
+	<x>; <y>; LOCAL_SET mod.0.y; LOCAL_SET mod.0.x
+	LOCAL_GET mod.0.x; LOCAL_GET mod.0.x; LOCAL_GET mod.0.y; DIVI; ...
+
+Los parámetros y variables locales de la función expandida pasan al
+marco de la función que llama con el nombre 'función.n.variable', donde
+n numera las expansiones de esa función dentro de la que llama; así
+cada expansión tiene sus propias variables. A diferencia de una llamada,
+una expansión dentro de un ciclo usa las mismas variables en cada
+vuelta: una variable local declarada sin valor inicial conserva el de
+la vuelta anterior en lugar de empezar sin valor.
+
+Una función se expande si no es main, no es importada, no es recursiva
+(directa o indirectamente), su código tiene a lo más THRESHOLD
+instrucciones y sus RET están fuera de todo ciclo. Si su único RET es la
+última instrucción, simplemente se quita; si no, el código va dentro de
+'LOOP ... ENDLOOP' y cada RET se cambia por BREAK, que sale del ciclo
+con el valor de retorno en la pila. Un 'TAILCALL f' (de un -O anterior)
+se expande como 'CALL f; RET': en la función que llama, TAILCALL
+reemplazaría su marco y volvería de ella.
+
+Las funciones se procesan empezando por las que no llaman a otras, de
+modo que una función que ya recibió expansiones se mide con su tamaño
+nuevo. Una función expandida en todas sus llamadas se quita del módulo.
+Las decisiones quedan como notas ('# ...') en el volcado del IR de la
+función que llama (o de la que no se expandió).
+'''
+# Tamaño máximo (instrucciones) de una función que se expande
+THRESHOLD = 16
+
+
+def calls(func):
+	return {instr[1] for instr in func.code if instr[0] == 'CALL' or instr[0] == 'TAILCALL'}
+
+def recursive(module):
+	'''
+	Devuelve los nombres de las funciones que pueden llamarse a sí mismas.
+	'''
+	graph = {name: calls(func) for name, func in module.functions.items()}
+	found = set()
+	for name in graph:
+		seen = set()
+		work = list(graph[name])
+		while work:
+			callee = work.pop()
+			if callee == name:
+				found.add(name)
+				break
+			if callee not in seen and callee in graph:
+				seen.add(callee)
+				work.extend(graph[callee])
+	return found
+
+def _order(module):
+	'''
+	Nombres de las funciones, cada una después de las que llama (salvo
+	en los ciclos de llamadas, que no se expanden).
+	'''
+	order = []
+	seen = set()
+	def visit(name):
+		seen.add(name)
+		for callee in sorted(calls(module.functions[name])):
+			if callee in module.functions and callee not in seen:
+				visit(callee)
+		order.append(name)
+	for name in module.functions:
+		if name not in seen:
+			visit(name)
+	return order
+
+def _returns_in_loop(code):
+	depth = 0
+	for instr in code:
+		if instr[0] == 'LOOP':
+			depth += 1
+		elif instr[0] == 'ENDLOOP':
+			depth -= 1
+		elif instr[0] == 'RET' and depth > 0:
+			return True
+	return False
+
+def reason(func, threshold, recursives):
+	'''
+	Devuelve por qué func no se puede expandir, o None si se puede.
+	'''
+	if func.name == 'main':
+		return 'main'
+	if func.imported:
+		return 'importada'
+	if func.name in recursives:
+		return 'recursiva'
+	if len(func.code) > threshold:
+		return f'{len(func.code)} instrucciones > {threshold}'
+	if _returns_in_loop(func.code):
+		return 'RET dentro de un ciclo'
+	return None
+
+def _prefix(func, callee):
+	'''
+	Primer prefijo 'callee.n.' que no usa ninguna variable de func.
+	'''
+	n = 0
+	while any(name.startswith(f"{callee}.{n}.") for name in func.locals):
+		n += 1
+	return f"{callee}.{n}."
+
+def expand(callee, prefix):
+	'''
+	Devuelve el código que reemplaza a 'CALL callee', con las variables
+	renombradas con prefix.
+	'''
+	code = [('LOCAL_SET', prefix + name) for name in reversed(callee.parmnames)]
+	body = []
+	for instr in callee.code:
+		if instr[0] == 'LOCAL_GET' or instr[0] == 'LOCAL_SET':
+			body.append((instr[0], prefix + instr[1]))
+		elif instr[0] == 'TAILCALL':
+			# Dentro de otra función, TAILCALL reemplazaría su marco
+			body.extend((('CALL', instr[1]), ('RET',)))
+		else:
+			body.append(instr)
+
+	returns = sum(1 for instr in body if instr[0] == 'RET')
+	if returns == 1 and body[-1] == ('RET',):
+		code.extend(body[:-1])
+	else:
+		code.append(('LOOP',))
+		code.extend(('BREAK',) if instr[0] == 'RET' else instr for instr in body)
+		code.append(('ENDLOOP',))
+	return code
+
+def inline(module, threshold=THRESHOLD):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte:
+	{'inlined': {función: {llamada: veces}}, 'kept': {función: razón},
+	'removed': [funciones que ya no se llaman]}.
+	'''
+	recursives = recursive(module)
+	inlined = {}
+	kept = {}
+	for name in _order(module):
+		func = module.functions[name]
+		if not any(instr[0] == 'CALL' for instr in func.code):
+			continue
+		out = []
+		sites = {}
+		for instr in func.code:
+			callee = module.functions.get(instr[1]) if instr[0] == 'CALL' else None
+			if callee is None:
+				out.append(instr)
+				continue
+			why = reason(callee, threshold, recursives)
+			if why is not None:
+				kept[callee.name] = why
+				out.append(instr)
+				continue
+
+			prefix = _prefix(func, callee.name)
+			for var, type in zip(callee.parmnames, callee.parmtypes):
+				func.new_local(prefix + var, type)
+			for var, type in callee.locals.items():
+				func.new_local(prefix + var, type)
+			out.extend(expand(callee, prefix))
+			sites[callee.name] = sites.get(callee.name, 0) + 1
+
+		if sites:
+			func.code = out
+			inlined[name] = sites
+			for callee, count in sites.items():
+				func.notes.append(f"inline: {callee} expandida en {count} llamada(s)")
+
+	for name, why in kept.items():
+		module.functions[name].notes.append(f"inline: no se expande ({why})")
+
+	# Las funciones expandidas en todas sus llamadas ya no se necesitan
+	expanded = {callee for sites in inlined.values() for callee in sites}
+	called = set().union(*(calls(func) for func in module.functions.values()))
+	removed = sorted(expanded - called)
+	for name in removed:
+		del module.functions[name]
+	return {'inlined': inlined, 'kept': kept, 'removed': removed}
+
+def describe(report):
+	for name, sites in report['inlined'].items():
+		for callee, count in sites.items():
+			yield f"{name}: {callee} expandida en {count} llamada(s)"
+	for name, why in report['kept'].items():
+		yield f"{name}: no se expande ({why})"
+	for name in report['removed']:
+		yield f"{name}: eliminada, ya no tiene llamadas"
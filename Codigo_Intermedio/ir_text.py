@@ -0,0 +1,134 @@
+'''
+Lectura del IR en formato de texto
+==================================
+Reconstruye un IRModule a partir del texto que escribe IRModule.dump()
+(ver para_ir/criba.ir y para_ir/shor.ic):
+
+    MODULE:::
+    GLOBAL::: n: I
+    FUNCTION::: mod, ['a', 'b'], ['I', 'I'] I
+    locals: {'t': 'I'}
+    ('LOCAL_GET', 'a')
+    ('CONSTI', 1)
+    ('ADDI',)
+    ...
+
+Una función importada lleva ' import' al final de la línea FUNCTION y
+una global declarada con 'const', ' const' al final de la línea GLOBAL.
+Las líneas que empiezan con '#' son comentarios (p. ej., las notas del
+optimizador sobre las llamadas expandidas) y se ignoran.
+Las líneas se analizan con operaciones de cadena y expresiones
+regulares, nunca con eval, así que un archivo modificado a mano no
+puede ejecutar código al cargarse.
+'''
+import re
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.IR import IRModule, IRGlobal, IRFunction
+from Codigo_Intermedio.opcodes import Op, CONSTANT_OPS, NAME_OPS
+
+_STRING = r"'[^'\\]*'"
+_STRINGS = rf"(?:{_STRING}(?:, {_STRING})*)?"
+
+_global = re.compile(r"GLOBAL::: (\S+): (\w+)( const)?")
+_function = re.compile(rf"FUNCTION::: (\S+), \[({_STRINGS})\], \[({_STRINGS})\] (\w+)( import)?")
+_locals = re.compile(rf"locals: \{{((?:{_STRING}: {_STRING}(?:, {_STRING}: {_STRING})*)?)\}}")
+_string = re.compile(r"'([^'\\]*)'")
+
+# Instrucciones sin operando, ya construidas: ('ADDI',) -> ('ADDI',)
+_bare = {f"('{op.name}',)": (op.name,) for op in Op if op not in CONSTANT_OPS and op not in NAME_OPS}
+_with_operand = {op.name: op for op in Op if op in CONSTANT_OPS or op in NAME_OPS}
+
+
+class IRSyntaxError(Exception):
+	'''
+	Se genera cuando una línea del IR no tiene el formato esperado.
+	'''
+	def __init__(self, lineno, message):
+		self.lineno = lineno
+		super().__init__(f"Error en IR: línea {lineno}: {message}")
+
+
+def parse(lines) -> IRModule:
+	'''
+	Construye un IRModule a partir de un iterable de líneas (una lista,
+	un archivo abierto...).
+	'''
+	module = None
+	func = None
+	code = None
+	lineno = 0
+	for lineno, line in enumerate(lines, 1):
+		line = line.strip()
+		if not line or line.startswith('#'):
+			continue
+
+		instr = _bare.get(line)
+		if instr is not None or line.startswith('('):
+			if code is None:
+				raise IRSyntaxError(lineno, "instrucción fuera de una función")
+			code.append(instr or _instruction(line, lineno))
+		elif line.startswith('locals:'):
+			m = _locals.fullmatch(line)
+			if m is None or func is None:
+				raise IRSyntaxError(lineno, f"locals inválidos: {line}")
+			names = _string.findall(m.group(1))
+			for name, type in zip(names[0::2], names[1::2]):
+				func.new_local(name, type)
+		elif line.startswith('FUNCTION:::'):
+			m = _function.fullmatch(line)
+			if m is None or module is None:
+				raise IRSyntaxError(lineno, f"declaración de función inválida: {line}")
+			name, parmnames, parmtypes, rettype, imported = m.groups()
+			parmnames = _string.findall(parmnames)
+			parmtypes = _string.findall(parmtypes)
+			if len(parmnames) != len(parmtypes):
+				raise IRSyntaxError(lineno, f"la función '{name}' no tiene un tipo por parámetro")
+			if name in module.functions:
+				raise IRSyntaxError(lineno, f"la función '{name}' está repetida")
+			func = IRFunction(module, name, parmnames, parmtypes, rettype, imported is not None)
+			code = func.code
+		elif line.startswith('GLOBAL:::'):
+			m = _global.fullmatch(line)
+			if m is None or module is None:
+				raise IRSyntaxError(lineno, f"variable global inválida: {line}")
+			module.globals[m.group(1)] = IRGlobal(m.group(1), m.group(2), m.group(3) is not None)
+		elif line == 'MODULE:::':
+			if module is not None:
+				raise IRSyntaxError(lineno, "MODULE::: repetido")
+			module = IRModule()
+		else:
+			raise IRSyntaxError(lineno, f"línea no reconocida: {line}")
+
+	if module is None:
+		raise IRSyntaxError(lineno, "falta MODULE:::")
+	return module
+
+def _instruction(line, lineno):
+	'''
+	Analiza una instrucción con operando: ('CONSTI', 1), ('CONSTF', 2.5),
+	('GLOBAL_GET', 'x'), ('CALL', 'f')...
+	'''
+	opname, sep, operand = line[2:-1].partition("', ")
+	op = _with_operand.get(opname)
+	if not line.endswith(')') or not sep or op is None:
+		raise IRSyntaxError(lineno, f"instrucción inválida: {line}")
+
+	if op in NAME_OPS:
+		m = _string.fullmatch(operand)
+		if m is None:
+			raise IRSyntaxError(lineno, f"{opname} espera un nombre: {line}")
+		return (opname, m.group(1))
+	try:
+		return (opname, int(operand) if op == Op.CONSTI else float(operand))
+	except ValueError:
+		raise IRSyntaxError(lineno, f"{opname} espera un número: {line}") from None
+
+def loads(text) -> IRModule:
+	return parse(text.splitlines())
+
+def load(path) -> IRModule:
+	with open(path, encoding='utf-8') as file:
+		return parse(file)
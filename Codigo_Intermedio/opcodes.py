@@ -0,0 +1,276 @@
+'''
+Códigos de operación del IR
+===========================
+Numeración fija de las instrucciones IR. Los números forman parte del
+formato .goxc, por eso una instrucción nueva se agrega al final y los
+números existentes no cambian.
+
+Además de la lista de tuplas que produce IRCode, el código de una
+función tiene una forma codificada: un array('i') con dos enteros por
+instrucción (opcode, operando) y un Pool con las constantes y nombres
+del módulo. El operando es:
+
+    CONSTI, CONSTF          índice de la constante en el pool
+    GLOBAL_*, LOCAL_*, CALL índice del nombre en el pool (también TAILCALL)
+    LOOP, ENDLOOP           pc del ENDLOOP / del LOOP que le corresponde
+    CBREAK, CONTINUE        pc del ENDLOOP / del LOOP del ciclo que lo contiene
+    BREAK, WHILE, WHILE_*   pc del ENDLOOP del ciclo que lo contiene
+    IF, IF_*                pc del ELSE o, si no hay, del ENDIF
+    ELSE                    pc del ENDIF
+    el resto                0
+
+La máquina de pila, el verificador y el formato .goxc trabajan sobre
+esta forma, con enteros en lugar de cadenas.
+'''
+from array import array
+from enum import IntEnum
+
+
+class Op(IntEnum):
+	CONSTI = 0
+	ADDI = 1
+	SUBI = 2
+	MULI = 3
+	DIVI = 4
+	LTI = 5
+	LEI = 6
+	GTI = 7
+	GEI = 8
+	EQI = 9
+	NEI = 10
+	PEEKI = 11
+	POKEI = 12
+	ITOF = 13
+
+	CONSTF = 14
+	ADDF = 15
+	SUBF = 16
+	MULF = 17
+	DIVF = 18
+	LTF = 19
+	LEF = 20
+	GTF = 21
+	GEF = 22
+	EQF = 23
+	NEF = 24
+	PEEKF = 25
+	POKEF = 26
+	FTOI = 27
+
+	PRINTI = 28
+	PRINTF = 29
+	PRINTB = 30
+	PEEKB = 31
+	POKEB = 32
+	GROW = 33
+	POP = 34
+
+	GLOBAL_GET = 35
+	GLOBAL_SET = 36
+	LOCAL_GET = 37
+	LOCAL_SET = 38
+	CALL = 39
+	RET = 40
+
+	LOOP = 41
+	CBREAK = 42
+	CONTINUE = 43
+	ENDLOOP = 44
+	IF = 45
+	ELSE = 46
+	ENDIF = 47
+
+	# Instrucciones que genera el optimizador (peephole.py)
+	NEGI = 48
+	NEGF = 49
+	BREAK = 50
+	WHILE = 51
+
+	IF_LTI = 52
+	IF_LEI = 53
+	IF_GTI = 54
+	IF_GEI = 55
+	IF_EQI = 56
+	IF_NEI = 57
+	IF_LTF = 58
+	IF_LEF = 59
+	IF_GTF = 60
+	IF_GEF = 61
+	IF_EQF = 62
+	IF_NEF = 63
+
+	WHILE_LTI = 64
+	WHILE_LEI = 65
+	WHILE_GTI = 66
+	WHILE_GEI = 67
+	WHILE_EQI = 68
+	WHILE_NEI = 69
+	WHILE_LTF = 70
+	WHILE_LEF = 71
+	WHILE_GTF = 72
+	WHILE_GEF = 73
+	WHILE_EQF = 74
+	WHILE_NEF = 75
+
+	TAILCALL = 76
+
+
+# Instrucciones cuyo operando es una constante
+CONSTANT_OPS = {Op.CONSTI, Op.CONSTF}
+
+# Instrucciones cuyo operando es un nombre (variable o función)
+NAME_OPS = {Op.GLOBAL_GET, Op.GLOBAL_SET, Op.LOCAL_GET, Op.LOCAL_SET, Op.CALL, Op.TAILCALL}
+
+# Comparaciones que el optimizador puede unir con el salto siguiente:
+# IF_LTI salta al ELSE si no se cumple a < b, WHILE_LTI sale del ciclo
+# si no se cumple a < b.
+COMPARE_OPS = {
+	Op.LTI, Op.LEI, Op.GTI, Op.GEI, Op.EQI, Op.NEI,
+	Op.LTF, Op.LEF, Op.GTF, Op.GEF, Op.EQF, Op.NEF,
+}
+
+# Saltos condicionales que apuntan al ELSE/ENDIF de su bloque
+IF_OPS = {Op.IF} | {Op[f'IF_{op.name}'] for op in COMPARE_OPS}
+
+# Salidas de ciclo: apuntan al ENDLOOP del ciclo que las contiene
+EXIT_OPS = {Op.CBREAK, Op.BREAK, Op.WHILE} | {Op[f'WHILE_{op.name}'] for op in COMPARE_OPS}
+
+# Instrucciones de control, su destino lo resuelve link()
+JUMP_OPS = {Op.LOOP, Op.CONTINUE, Op.ENDLOOP, Op.ELSE} | IF_OPS | EXIT_OPS
+
+# Nombre de cada opcode, indexado por número, y número de cada nombre
+NAMES = [op.name for op in sorted(Op)]
+NUMBERS = {op.name: int(op) for op in Op}
+IF_NAMES = {op.name for op in IF_OPS}
+EXIT_NAMES = {op.name for op in EXIT_OPS}
+
+# Clase de operando de cada opcode, indexada por número. Las comparaciones
+# en los ciclos que recorren el código se hacen con enteros simples: con
+# los miembros de Op cada acceso pasa por la clase Enum y es más lento.
+NO_OPERAND, CONSTANT, NAME, JUMP = range(4)
+KINDS = [
+	CONSTANT if op in CONSTANT_OPS else NAME if op in NAME_OPS else JUMP if op in JUMP_OPS else NO_OPERAND
+	for op in sorted(Op)
+]
+
+
+class Pool:
+	'''
+	Constantes y nombres de un módulo. Cada valor distinto se guarda una
+	sola vez; 1 y 1.0 (o 0.0 y -0.0) son valores distintos.
+	'''
+	def __init__(self, values=()):
+		self.values = list(values)
+		self.index = {}
+		for n, value in enumerate(self.values):
+			self.index.setdefault(self._key(value), n)
+
+	@staticmethod
+	def _key(value):
+		return (type(value), value.hex() if type(value) is float else value)
+
+	def add(self, value):
+		key = self._key(value)
+		n = self.index.get(key)
+		if n is None:
+			n = self.index[key] = len(self.values)
+			self.values.append(value)
+		return n
+
+	def __getitem__(self, n):
+		return self.values[n]
+
+	def __len__(self):
+		return len(self.values)
+
+
+def link(code):
+	'''
+	Recorre el código una sola vez y devuelve una tabla pc -> destino
+	para las instrucciones de control:
+
+		LOOP     -> pc del ENDLOOP
+		ENDLOOP  -> pc del LOOP
+		CBREAK   -> pc del ENDLOOP del ciclo que lo contiene (también
+		            BREAK, WHILE y WHILE_*)
+		CONTINUE -> pc del LOOP del ciclo que lo contiene
+		IF       -> (pc del ELSE o None, pc del ENDIF) (también IF_*)
+		ELSE     -> pc del ENDIF
+	'''
+	targets = {}
+	loops = []                            # [(pc del LOOP, [pcs de salidas/CONTINUE])]
+	ifs = []                              # [[pc del IF, pc del ELSE]]
+
+	for pc, instr in enumerate(code):
+		opname = instr[0]
+		if opname == 'LOOP':
+			loops.append((pc, []))
+		elif opname in EXIT_NAMES or opname == 'CONTINUE':
+			if not loops:
+				raise RuntimeError(f"Error en IR: {opname} fuera de un ciclo en la instrucción {pc}")
+			loops[-1][1].append(pc)
+		elif opname == 'ENDLOOP':
+			if not loops:
+				raise RuntimeError(f"Error en IR: ENDLOOP sin LOOP en la instrucción {pc}")
+			start, jumps = loops.pop()
+			targets[start] = pc
+			targets[pc] = start
+			for jump in jumps:
+				targets[jump] = start if code[jump][0] == 'CONTINUE' else pc
+		elif opname in IF_NAMES:
+			ifs.append([pc, None])
+		elif opname == 'ELSE':
+			if not ifs:
+				raise RuntimeError(f"Error en IR: ELSE sin IF en la instrucción {pc}")
+			ifs[-1][1] = pc
+		elif opname == 'ENDIF':
+			if not ifs:
+				raise RuntimeError(f"Error en IR: ENDIF sin IF en la instrucción {pc}")
+			start, else_pc = ifs.pop()
+			targets[start] = (else_pc, pc)
+			if else_pc is not None:
+				targets[else_pc] = pc
+
+	if loops or ifs:
+		raise RuntimeError("Error en IR: LOOP o IF sin cerrar")
+
+	return targets
+
+def encode(code, pool):
+	'''
+	Codifica una lista de instrucciones IR. Las constantes y nombres se
+	agregan a pool. Devuelve un array('i') con (opcode, operando) por
+	instrucción.
+	'''
+	targets = link(code)
+	words = []
+	for pc, instr in enumerate(code):
+		op = NUMBERS.get(instr[0])
+		if op is None:
+			raise RuntimeError(f"Error en IR: Instrucción desconocida: {instr[0]} en la instrucción {pc}")
+		kind = KINDS[op]
+		if kind == CONSTANT or kind == NAME:
+			operand = pool.add(instr[1])
+		elif kind == JUMP:
+			operand = targets[pc]
+			if type(operand) is tuple:    # IF, IF_*: (ELSE o None, ENDIF)
+				operand = operand[1] if operand[0] is None else operand[0]
+		else:
+			operand = 0
+		words.append(op)
+		words.append(operand)
+	return array('i', words)
+
+def decode(words, pool):
+	'''
+	Reconstruye la lista de instrucciones IR (tuplas) de un código codificado.
+	'''
+	code = []
+	for pc in range(0, len(words), 2):
+		op = words[pc]
+		kind = KINDS[op]
+		if kind == CONSTANT or kind == NAME:
+			code.append((NAMES[op], pool.values[words[pc + 1]]))
+		else:
+			code.append((NAMES[op],))
+	return code
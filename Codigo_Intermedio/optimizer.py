@@ -0,0 +1,52 @@
+'''
+Optimizador del código intermedio
+=================================
+Aplica en orden los pases de PASSES sobre un IRModule (opción -O del
+compilador). Cada pase es una función que recibe el módulo, cambia el
+código IR (lista de tuplas) de sus funciones y devuelve un reporte;
+describe(reporte) lo convierte en líneas de texto. Los parámetros de
+un pase (p. ej., el umbral de inline) se pasan en options.
+
+	optimize(module)                 -> {nombre del pase: reporte}
+	optimize(module, options={'inline': {'threshold': 30}})
+	print_report(reports, out)       escribe los reportes en texto
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio import constfold, partialeval, specialize, inline, peephole, deadcode, tailcall
+
+# (nombre, pase, describe). partialeval va antes de inline: una llamada
+# con argumentos constantes se evalúa completa en lugar de expandirse.
+# specialize va antes de inline: un clon plegado puede quedar bajo el
+# umbral de inline.
+PASSES = [
+	('constfold', constfold.constfold, constfold.describe),
+	('partialeval', partialeval.partialeval, partialeval.describe),
+	('specialize', specialize.specialize, specialize.describe),
+	('inline', inline.inline, inline.describe),
+	('peephole', peephole.peephole, peephole.describe),
+	('deadcode', deadcode.deadcode, deadcode.describe),
+	('tailcall', tailcall.tailcall, tailcall.describe),
+]
+
+
+def optimize(module, passes=None, options=None):
+	'''
+	Optimiza el módulo. passes es una lista de nombres de PASSES (por
+	defecto, todos en orden); options, {nombre del pase: {parámetro: valor}}.
+	'''
+	options = options or {}
+	reports = {}
+	for name, run, _ in PASSES:
+		if passes is None or name in passes:
+			reports[name] = run(module, **options.get(name, {}))
+	return reports
+
+def print_report(reports, out=sys.stdout):
+	describers = {name: describe for name, _, describe in PASSES}
+	for name, report in reports.items():
+		out.write(f"{name}:\n")
+		for line in describers[name](report):
+			out.write(f"  {line}\n")
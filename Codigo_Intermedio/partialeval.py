@@ -0,0 +1,198 @@
+'''
+Evaluación de llamadas al compilar
+==================================
+Pase de optimización: una llamada a una función pura (purity.py) cuyos
+argumentos son todos constantes se ejecuta al compilar y se cambia por
+su resultado. Por ejemplo, en easter.gox
+
+	CONSTI 2025; CALL easter       queda como    CONSTI 420
+
+La función se ejecuta en una StackMachine con el mismo código que se
+usará al correr el programa, con un límite de BUDGET instrucciones y
+sin enteros fuera de 64 bits (ver StackMachine.run). Si no termina
+dentro del límite o falla (división por cero, demasiadas llamadas
+anidadas...), la llamada se deja como está y el error, si lo hay,
+ocurre al ejecutar. Solo se evalúan las llamadas de las funciones a las
+que se llega desde main: una función que nunca se llama no hace
+trabajar al compilador.
+
+Los argumentos constantes salen de los literales y de las globales
+'const' (que constfold ya cambió por su valor) y, en main, de las
+globales que main asigna con una constante fuera de todo IF o LOOP y
+que ninguna otra función asigna: 'var year int = 2025;' hace que
+'easter(year)' se evalúe. Como el resultado de una llamada evaluada
+también es una constante, el pase se repite hasta que no cambia nada
+('var resul int = easter(year);' ... 'mod(resul, 100)').
+
+Una función cuyas llamadas se evaluaron todas se quita del módulo.
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import IF_NAMES
+from Codigo_Intermedio.constfold import fold_code, is_constant
+from Codigo_Intermedio.purity import pure_functions
+from Codigo_Intermedio.inline import calls
+from Maquina_de_pila.StackMachine import StackMachine
+from Maquina_de_pila.verifier import VerifyError
+
+# Máximo de instrucciones por llamada evaluada
+BUDGET = 100000
+
+# Máximo de llamadas anidadas durante la evaluación
+MAX_DEPTH = 1000
+
+_constant_for = {'I': 'CONSTI', 'F': 'CONSTF'}
+
+
+def main_constants(module):
+	'''
+	Cambia en main los GLOBAL_GET fuera de todo bloque de las globales
+	cuyo valor se conoce en ese punto (ver arriba). Devuelve True si
+	cambió algo.
+	'''
+	written = {
+		instr[1] for name, func in module.functions.items() if name != 'main'
+		for instr in func.code if instr[0] == 'GLOBAL_SET'
+	}
+	main = module.functions['main']
+	known = {}
+	depth = 0
+	out = []
+	changed = False
+	for instr in main.code:
+		opname = instr[0]
+		if opname == 'LOOP' or opname in IF_NAMES:
+			depth += 1
+		elif opname == 'ENDLOOP' or opname == 'ENDIF':
+			depth -= 1
+		elif opname == 'GLOBAL_SET':
+			if depth == 0 and out and is_constant(out[-1]) and instr[1] not in written:
+				known[instr[1]] = out[-1]
+			else:
+				known.pop(instr[1], None)
+		elif opname == 'GLOBAL_GET' and depth == 0 and instr[1] in known:
+			out.append(known[instr[1]])
+			changed = True
+			continue
+		out.append(instr)
+	if changed:
+		main.code = fold_code(out)
+	return changed
+
+def reachable(module):
+	'''
+	Devuelve los nombres de las funciones a las que se llega desde main,
+	en orden de descubrimiento.
+	'''
+	found = ['main']
+	for name in found:
+		for callee in sorted(calls(module.functions[name])):
+			if callee in module.functions and callee not in found:
+				found.append(callee)
+	return found
+
+class Evaluator:
+	'''
+	Ejecuta llamadas a funciones puras y recuerda los resultados.
+	'''
+	def __init__(self, module, budget):
+		self.module = module
+		self.budget = budget
+		self.pure = pure_functions(module)
+		self.results = {}                     # (función, argumentos) -> instrucción constante o None
+		self.failed = {}                      # texto de la llamada -> error
+		self.vm = None
+		if self.pure:
+			self.vm = StackMachine(max_depth=MAX_DEPTH, output='capture')
+			self.vm.load_ir(module)
+
+	def evaluate(self, name, args):
+		'''
+		Devuelve la instrucción constante con el resultado de name(args),
+		o None si no se pudo evaluar.
+		'''
+		key = (name, tuple(repr(arg[1]) for arg in args))
+		if key not in self.results:
+			func = self.module.functions[name]
+			text = f"{name}({', '.join(repr(arg[1]) for arg in args)})"
+			try:
+				value = self.vm.call(name, [arg[1] for arg in args], self.budget)
+				self.results[key] = (_constant_for[func.return_type], value)
+			except (RuntimeError, ArithmeticError, ValueError, TypeError) as e:
+				self.results[key] = None
+				self.failed[text] = str(e)
+		return self.results[key]
+
+	def fold_calls(self, code, done):
+		'''
+		Devuelve el código con las llamadas evaluables cambiadas por su
+		resultado; agrega a done (texto de la llamada, valor).
+		'''
+		out = []
+		for instr in code:
+			func = self.module.functions.get(instr[1]) if instr[0] == 'CALL' and instr[1] in self.pure else None
+			if func is not None:
+				n = len(func.parmnames)
+				args = out[len(out) - n:] if n else []
+				if len(args) == n and all(arg[0] == _constant_for[type] for arg, type in zip(args, func.parmtypes)):
+					result = self.evaluate(func.name, args)
+					if result is not None:
+						del out[len(out) - n:]
+						out.append(result)
+						done.append((f"{func.name}({', '.join(repr(arg[1]) for arg in args)})", result[1]))
+						continue
+			out.append(instr)
+		return out
+
+def partialeval(module, budget=BUDGET):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte:
+	{'calls': {función: [(llamada, valor)]}, 'failed': {llamada: error},
+	'removed': [funciones que ya no se llaman]}.
+	'''
+	report = {'calls': {}, 'failed': {}, 'removed': []}
+	if 'main' not in module.functions:
+		return report
+	try:
+		evaluator = Evaluator(module, budget)
+	except (RuntimeError, VerifyError):
+		return report                         # El error aparece al cargar el programa
+	if evaluator.vm is None:
+		return report
+
+	called = set().union(*(calls(func) for func in module.functions.values()))
+	changed = True
+	while changed:
+		changed = main_constants(module)
+		for name in reachable(module):
+			func = module.functions[name]
+			done = []
+			code = evaluator.fold_calls(func.code, done)
+			if done:
+				func.code = fold_code(code)
+				report['calls'].setdefault(name, []).extend(done)
+				changed = True
+
+	report['failed'] = evaluator.failed
+
+	# Quitar una función puede dejar sin llamadas a las que ella llamaba
+	while True:
+		remaining = set().union(*(calls(func) for func in module.functions.values()))
+		unused = sorted(name for name in called - remaining if name in module.functions and name in evaluator.pure)
+		if not unused:
+			break
+		for name in unused:
+			del module.functions[name]
+		report['removed'].extend(unused)
+	return report
+
+def describe(report):
+	for name, done in report['calls'].items():
+		for call, value in done:
+			yield f"{name}: {call} = {value}"
+	for call, error in report['failed'].items():
+		yield f"{call}: no se evalúa ({error})"
+	for name in report['removed']:
+		yield f"{name}: eliminada, ya no tiene llamadas"
@@ -0,0 +1,160 @@
+'''
+Optimización de mirilla (peephole)
+==================================
+Pase de optimización que reemplaza secuencias cortas de instrucciones
+del código IR por otras equivalentes más cortas. Las reglas están en
+RULES: (secuencia, reemplazo). Como el código se recorre acumulando la
+salida en una pila, el resultado de un reemplazo puede formar una nueva
+secuencia con las instrucciones anteriores (NEGI; NEGI; NEGI -> NEGI).
+
+Además, antes de aplicar las reglas se reescribe la cabecera de los
+ciclos. IRCode genera 'while cond' como
+
+	LOOP; CONSTI 1; <cond>; SUBI; CBREAK
+
+(sale del ciclo si 1 - cond == 1), que queda como
+
+	LOOP; <cond>; WHILE
+
+y, si la condición termina en una comparación, las reglas la unen con
+el salto: 'LOCAL_GET n; CONSTI 0; GTI; WHILE' -> '...; WHILE_GTI'. Lo
+mismo pasa con 'GTF; IF' -> 'IF_GTF'.
+
+Ninguna regla cruza un LOOP, ELSE o ENDIF (puntos a los que llega un
+salto) salvo 'ELSE; ENDIF', cuyo ELSE no hace nada: el IF salta
+directamente al ENDIF.
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import COMPARE_OPS
+
+RULES = [
+	# Negación: IRCode genera -x como x * -1
+	([('CONSTI', -1), ('MULI',)], [('NEGI',)]),
+	([('CONSTF', -1.0), ('MULF',)], [('NEGF',)]),
+	([('NEGI',), ('NEGI',)], []),
+	([('NEGF',), ('NEGF',)], []),
+
+	# 'ITOF; FTOI' no se quita: ITOF redondea los enteros de más de 53
+	# bits. Con un operando constante ya lo pliega constfold.
+
+	# Saltos con condición constante: 'break' es CONSTI 1; CBREAK
+	([('CONSTI', 1), ('CBREAK',)], [('BREAK',)]),
+	([('CONSTI', 0), ('CBREAK',)], []),
+	([('CONSTI', 0), ('WHILE',)], [('BREAK',)]),
+	([('CONSTI', 1), ('WHILE',)], []),
+
+	# IF sin alternativa
+	([('ELSE',), ('ENDIF',)], [('ENDIF',)]),
+]
+
+# Comparación seguida de un salto
+for _op in sorted(COMPARE_OPS):
+	RULES.append(([(_op.name,), ('IF',)], [(f'IF_{_op.name}',)]))
+	RULES.append(([(_op.name,), ('WHILE',)], [(f'WHILE_{_op.name}',)]))
+
+# Reglas indexadas por su última instrucción
+_by_last = {}
+for _pattern, _replacement in RULES:
+	_by_last.setdefault(_pattern[-1], []).append((_pattern, _replacement))
+
+# (valores que saca, valores que deja) de las instrucciones que pueden
+# aparecer en una expresión. CALL, IF y ELSE se tratan aparte.
+_stack = {'CONSTI': (0, 1), 'CONSTF': (0, 1), 'GLOBAL_GET': (0, 1), 'LOCAL_GET': (0, 1)}
+for _name in ('ADD', 'SUB', 'MUL', 'DIV', 'LT', 'LE', 'GT', 'GE', 'EQ', 'NE'):
+	_stack[_name + 'I'] = _stack[_name + 'F'] = (2, 1)
+for _name in ('ITOF', 'FTOI', 'NEGI', 'NEGF', 'PEEKI', 'PEEKF', 'PEEKB', 'GROW'):
+	_stack[_name] = (1, 1)
+for _name in ('POKEI', 'POKEF', 'POKEB'):
+	_stack[_name] = (2, 0)
+for _name in ('PRINTI', 'PRINTF', 'PRINTB', 'POP', 'GLOBAL_SET', 'LOCAL_SET'):
+	_stack[_name] = (1, 0)
+_stack['ENDIF'] = (0, 0)
+
+
+def _consumer(code, start, module):
+	'''
+	Busca, desde start, la instrucción que saca de la pila el valor que
+	estaba en el tope antes de start. Devuelve su pc, o None si antes
+	aparece una instrucción que no es parte de una expresión.
+	'''
+	depth = 0                              # Valores sobre el de interés
+	ifs = []                               # Profundidad al entrar a cada IF
+	for pc in range(start, len(code)):
+		instr = code[pc]
+		opname = instr[0]
+		if opname in _stack:
+			pops, pushes = _stack[opname]
+		elif opname == 'CALL':
+			if instr[1] not in module.functions:
+				return None
+			pops, pushes = len(module.functions[instr[1]].parmnames), 1
+		elif opname == 'IF':
+			pops, pushes = 1, 0
+		elif opname == 'ELSE' and ifs:
+			depth = ifs[-1]
+			continue
+		else:
+			return None
+
+		if pops > depth:
+			return pc
+		depth += pushes - pops
+		if opname == 'IF':
+			ifs.append(depth)
+		elif opname == 'ENDIF':
+			if not ifs:
+				return None
+			ifs.pop()
+	return None
+
+def fuse_loops(code, module):
+	'''
+	Cambia 'LOOP; CONSTI 1; <cond>; SUBI; CBREAK' por 'LOOP; <cond>; WHILE'.
+	'''
+	drop = set()
+	whiles = set()
+	for pc in range(len(code) - 1):
+		if code[pc] == ('LOOP',) and code[pc + 1] == ('CONSTI', 1):
+			end = _consumer(code, pc + 2, module)
+			if end is not None and code[end] == ('SUBI',) and end + 1 < len(code) and code[end + 1] == ('CBREAK',):
+				drop.update((pc + 1, end))
+				whiles.add(end + 1)
+	if not drop:
+		return code
+	return [('WHILE',) if pc in whiles else instr for pc, instr in enumerate(code) if pc not in drop]
+
+def apply_rules(code):
+	'''
+	Aplica RULES hasta que no quede ninguna secuencia por reemplazar.
+	'''
+	out = []
+	for instr in code:
+		out.append(instr)
+		while out and out[-1] in _by_last:
+			for pattern, replacement in _by_last[out[-1]]:
+				if len(out) >= len(pattern) and out[-len(pattern):] == pattern:
+					out[-len(pattern):] = replacement
+					break
+			else:
+				break
+	return out
+
+def peephole(module):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte con las
+	instrucciones antes y después por función.
+	'''
+	report = {}
+	for name, func in module.functions.items():
+		before = len(func.code)
+		func.code = apply_rules(fuse_loops(func.code, module))
+		report[name] = (before, len(func.code))
+	return report
+
+def describe(report):
+	for name, (before, after) in report.items():
+		if before != after:
+			yield f"{name}: {before} -> {after} instrucciones"
@@ -0,0 +1,53 @@
+'''
+Análisis de funciones puras
+===========================
+Una función es pura si su resultado depende solo de sus argumentos y
+no tiene efectos: no imprime, no lee ni escribe la memoria (` y ^), no
+lee ni asigna variables globales y solo llama a funciones puras. Dos
+llamadas con los mismos argumentos devuelven lo mismo, por eso la
+máquina de pila puede guardar su resultado (ver StackMachine, memoize).
+
+Las globales 'const' también cuentan como estado: una declaración
+dentro de un ciclo de main las asigna más de una vez. Con -O, las que
+se pueden propagar ya llegan como constantes (constfold).
+
+Las funciones importadas y main no son puras. Las llamadas recursivas
+no impiden que una función sea pura: se parte de suponer puras a todas
+las candidatas y se descartan las que llaman a una que no lo es, hasta
+que no cambia nada.
+'''
+
+# Instrucciones con efectos o que dependen del estado de la máquina
+_effects = {
+	'PRINTI', 'PRINTF', 'PRINTB',
+	'PEEKI', 'PEEKF', 'PEEKB', 'POKEI', 'POKEF', 'POKEB', 'GROW',
+	'GLOBAL_GET', 'GLOBAL_SET',
+}
+
+
+def _local_effects(func):
+	'''
+	True si el código de func (sin mirar sus llamadas) tiene efectos.
+	'''
+	return any(instr[0] in _effects for instr in func.code)
+
+def pure_functions(module):
+	'''
+	Devuelve el conjunto de nombres de las funciones puras del módulo.
+	'''
+	pure = {
+		name for name, func in module.functions.items()
+		if name != 'main' and not func.imported and not _local_effects(func)
+	}
+	calls = {
+		name: {instr[1] for instr in module.functions[name].code if instr[0] == 'CALL' or instr[0] == 'TAILCALL'}
+		for name in pure
+	}
+	changed = True
+	while changed:
+		changed = False
+		for name in list(pure):
+			if not calls[name] <= pure:
+				pure.discard(name)
+				changed = True
+	return pure
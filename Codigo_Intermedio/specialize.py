@@ -0,0 +1,203 @@
+'''
+Especialización de funciones (clonación)
+========================================
+Pase de optimización sobre el IRModule: si una función se llama con
+una constante en el mismo parámetro, se crea una copia (clon) de la
+función con ese parámetro cambiado por la constante y se pliega con
+constfold y deadcode. Por ejemplo
+
+	func scale(x int, k int) int {
+		if k == 0 { return x; }
+		return x * k + k * 2;
+	}
+
+llamada como 'scale(i, 3)' da el clon 'scale.0' con un solo parámetro
+(x), sin el IF y con 'x * 3 + 6'. Cada llamada con ese patrón de
+constantes se cambia por 'CALL scale.0' y deja de apilar el argumento.
+
+Solo se especializan los parámetros que la función no asigna: en
+mandel.gox, in_mandelbrot(x, y, threshhold) decrementa n, así que su
+clon no tendría nada que plegar. Un clon se crea solo si su código
+queda más corto que el original, empezando por los patrones que más
+instrucciones ahorran (ahorro por número de llamadas), y mientras el
+total de instrucciones de los clones no pase de GROWTH por el tamaño
+del módulo. Una función cuyas llamadas pasaron todas a clones se quita.
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.IR import IRFunction
+from Codigo_Intermedio.constfold import fold_code, is_constant
+from Codigo_Intermedio.deadcode import fold_branches, drop_unreachable
+from Codigo_Intermedio.peephole import _stack
+from Codigo_Intermedio.inline import calls
+
+# Máximo de instrucciones nuevas (en clones), como fracción del módulo
+GROWTH = 0.5
+
+
+def constant_args(code, pc, module):
+	'''
+	Devuelve {índice del parámetro: posición en code} de los argumentos
+	de la llamada en code[pc] que son una sola constante. Se recorren los
+	argumentos desde el último; si uno no es una expresión simple, los
+	anteriores se dejan sin revisar.
+	'''
+	found = {}
+	pos = pc - 1
+	for index in range(len(module.functions[code[pc][1]].parmnames) - 1, -1, -1):
+		if pos < 0:
+			break
+		if is_constant(code[pos]):
+			found[index] = pos
+			pos -= 1
+			continue
+		need = 1
+		while need > 0 and pos >= 0:
+			instr = code[pos]
+			if instr[0] in _stack:
+				pops, pushes = _stack[instr[0]]
+			elif instr[0] == 'CALL' and instr[1] in module.functions:
+				pops, pushes = len(module.functions[instr[1]].parmnames), 1
+			else:
+				return found
+			need += pops - pushes
+			pos -= 1
+		if need != 0:
+			break
+	return found
+
+def _key(constant):
+	'''
+	Clave de una instrucción constante para agrupar patrones. Como en
+	opcodes.Pool, los flotantes se comparan con float.hex(): 0.0 y -0.0
+	son iguales para == pero no dan el mismo clon.
+	'''
+	opname, value = constant
+	return (opname, float(value).hex() if opname == 'CONSTF' else value)
+
+def _constant(key):
+	opname, value = key
+	return (opname, float.fromhex(value) if opname == 'CONSTF' else value)
+
+def _assigned(func):
+	return {instr[1] for instr in func.code if instr[0] == 'LOCAL_SET'}
+
+def _patterns(module):
+	'''
+	Devuelve {(función, ((índice, clave de la constante), ...)): número
+	de llamadas}.
+	'''
+	found = {}
+	assigned = {}
+	for func in module.functions.values():
+		for pc, instr in enumerate(func.code):
+			callee = module.functions.get(instr[1]) if instr[0] == 'CALL' else None
+			if callee is None or callee.name == 'main' or callee.imported:
+				continue
+			if callee.name not in assigned:
+				assigned[callee.name] = _assigned(callee)
+			args = constant_args(func.code, pc, module)
+			pattern = tuple(
+				(index, _key(func.code[pos])) for index, pos in sorted(args.items())
+				if callee.parmnames[index] not in assigned[callee.name]
+			)
+			if pattern:
+				key = (callee.name, pattern)
+				found[key] = found.get(key, 0) + 1
+	return found
+
+def specialized(func, pattern):
+	'''
+	Devuelve el código de func con los parámetros de pattern cambiados
+	por sus constantes, plegado.
+	'''
+	values = {func.parmnames[index]: _constant(key) for index, key in pattern}
+	code = [values.get(instr[1], instr) if instr[0] == 'LOCAL_GET' else instr for instr in func.code]
+	return fold_code(drop_unreachable(fold_branches(fold_code(code))))
+
+def _redirect(func, clones, module):
+	'''
+	Cambia en func las llamadas que tienen el patrón de un clon por
+	'CALL clon', sin los argumentos constantes. Devuelve cuántas cambió.
+	'''
+	code = func.code
+	drop = set()
+	out = list(code)
+	count = 0
+	for pc, instr in enumerate(code):
+		if instr[0] != 'CALL' or instr[1] not in module.functions:
+			continue
+		args = constant_args(code, pc, module)
+		for (name, pattern), clone in clones.items():
+			if name == instr[1] and all(index in args and _key(code[args[index]]) == key for index, key in pattern):
+				drop.update(args[index] for index, _ in pattern)
+				out[pc] = ('CALL', clone)
+				count += 1
+				break
+	if count:
+		func.code = [instr for pc, instr in enumerate(out) if pc not in drop]
+	return count
+
+def specialize(module, growth=GROWTH):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte:
+	{'clones': {clon: (función, {parámetro: valor}, llamadas, antes, después)},
+	'removed': [funciones que ya no se llaman]}.
+	'''
+	report = {'clones': {}, 'removed': []}
+	budget = int(growth * sum(len(func.code) for func in module.functions.values()))
+
+	candidates = []
+	for (name, pattern), sites in _patterns(module).items():
+		func = module.functions[name]
+		code = specialized(func, pattern)
+		saved = len(func.code) - len(code)
+		if saved > 0:
+			candidates.append((saved * sites, name, pattern, sites, code))
+	candidates.sort(key=lambda candidate: -candidate[0])
+
+	called = set().union(*(calls(func) for func in module.functions.values()))
+	clones = {}
+	for _, name, pattern, sites, code in candidates:
+		if len(code) > budget:
+			continue
+		budget -= len(code)
+		func = module.functions[name]
+		n = 0
+		while f"{name}.{n}" in module.functions:
+			n += 1
+		indexes = {index for index, _ in pattern}
+		clone = IRFunction(module, f"{name}.{n}",
+			[parm for index, parm in enumerate(func.parmnames) if index not in indexes],
+			[type for index, type in enumerate(func.parmtypes) if index not in indexes],
+			func.return_type)
+		clone.locals = dict(func.locals)
+		clone.code = code
+		values = {func.parmnames[index]: _constant(key)[1] for index, key in pattern}
+		clone.notes.append("specialize: clon de " + name + " con " + ', '.join(f"{parm} = {value}" for parm, value in values.items()))
+		clones[(name, pattern)] = clone.name
+		report['clones'][clone.name] = (name, values, sites, len(func.code), len(code))
+
+	if clones:
+		for func in list(module.functions.values()):
+			_redirect(func, clones, module)
+
+	# Las funciones con todas sus llamadas en clones ya no se necesitan
+	while True:
+		remaining = set().union(*(calls(func) for func in module.functions.values()))
+		unused = sorted(name for name in called - remaining if name in module.functions and name != 'main')
+		if not unused:
+			break
+		for name in unused:
+			del module.functions[name]
+		report['removed'].extend(unused)
+	return report
+
+def describe(report):
+	for name, (func, values, sites, before, after) in report['clones'].items():
+		args = ', '.join(f"{parm} = {value}" for parm, value in values.items())
+		yield f"{name}: clon de {func} con {args}, {sites} llamada(s), {before} -> {after} instrucciones ({before - after} menos)"
+	for name in report['removed']:
+		yield f"{name}: eliminada, ya no tiene llamadas"
@@ -0,0 +1,81 @@
+'''
+Llamadas en posición de cola
+============================
+Pase de optimización sobre el código IR de cada función. Una llamada
+en posición de cola ('return f(...)') queda en el IR como
+
+	<argumentos>; CALL f; RET
+
+1. Si f es la misma función y la llamada no está dentro de un ciclo, los
+   argumentos se guardan en los parámetros y se vuelve al inicio de la
+   función. Para eso el código de la función se encierra en
+   'LOOP ... ENDLOOP' y la llamada se cambia por
+
+	<argumentos>; LOCAL_SET pn; ...; LOCAL_SET p1; CONTINUE
+
+   Una recursión con acumulador (fact(n - 1, acc * n)) queda como un
+   ciclo: no usa self.call_stack ni crea marcos nuevos. Las variables
+   locales que no son parámetros conservan su valor de la vuelta
+   anterior en lugar de empezar sin valor.
+
+2. En cualquier otro caso 'CALL f; RET' se cambia por 'TAILCALL f': la
+   máquina no guarda un punto de retorno y f vuelve directamente al
+   llamador de la función, así que las llamadas en cola entre
+   funciones distintas tampoco hacen crecer la pila de llamadas.
+'''
+
+
+def tailcalls(func):
+	'''
+	Devuelve el código nuevo de func y (llamadas a sí misma cambiadas,
+	TAILCALL generados).
+	'''
+	code = func.code
+	out = []
+	selfcalls = tails = 0
+	depth = 0
+	pc = 0
+	while pc < len(code):
+		instr = code[pc]
+		if instr[0] == 'LOOP':
+			depth += 1
+		elif instr[0] == 'ENDLOOP':
+			depth -= 1
+		elif instr[0] == 'CALL' and pc + 1 < len(code) and code[pc + 1] == ('RET',):
+			if instr[1] == func.name and depth == 0:
+				out.extend(('LOCAL_SET', name) for name in reversed(func.parmnames))
+				out.append(('CONTINUE',))
+				selfcalls += 1
+			else:
+				out.append(('TAILCALL', instr[1]))
+				tails += 1
+			pc += 2
+			continue
+		out.append(instr)
+		pc += 1
+
+	if selfcalls:
+		out = [('LOOP',)] + out + [('ENDLOOP',)]
+	return out, (selfcalls, tails)
+
+def tailcall(module):
+	'''
+	Aplica el pase a todo el módulo. Devuelve un reporte:
+	{función: (llamadas a sí misma cambiadas, TAILCALL generados)}.
+	'''
+	report = {}
+	for name, func in module.functions.items():
+		if func.imported:
+			continue
+		code, counts = tailcalls(func)
+		if counts != (0, 0):
+			func.code = code
+			report[name] = counts
+	return report
+
+def describe(report):
+	for name, (selfcalls, tails) in report.items():
+		if selfcalls:
+			yield f"{name}: {selfcalls} llamada(s) a sí misma en cola cambiadas por un ciclo"
+		if tails:
+			yield f"{name}: {tails} llamada(s) en cola cambiadas por TAILCALL"
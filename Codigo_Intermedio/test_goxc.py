@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+import struct
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio import goxc
+from Codigo_Intermedio.IR import IRModule, IRGlobal, IRFunction
+from Maquina_de_pila.StackMachine import StackMachine
+
+def sample_module(): # Counts to 5 with a global, skipping 3, then prints half(7.0)
+	module = IRModule()
+	module.globals['n'] = IRGlobal('n', 'I')
+	module.globals['k'] = IRGlobal('k', 'I', True)
+	main = IRFunction(module, 'main', [], [], 'I')
+	main.extend([
+		('CONSTI', 0),
+		('GLOBAL_SET', 'n'),
+		('LOOP',),
+		('GLOBAL_GET', 'n'),
+		('CONSTI', 1),
+		('ADDI',),
+		('GLOBAL_SET', 'n'),
+		('GLOBAL_GET', 'n'),
+		('CONSTI', 5),
+		('GTI',),
+		('CBREAK',),
+		('GLOBAL_GET', 'n'),
+		('CONSTI', 3),
+		('EQI',),
+		('IF',),
+		('ELSE',),
+		('GLOBAL_GET', 'n'),
+		('PRINTI',),
+		('ENDIF',),
+		('ENDLOOP',),
+		('CONSTF', 7.0),
+		('CALL', 'half'),
+		('PRINTF',),
+		('CONSTI', 0),
+		('RET',),
+	])
+	half = IRFunction(module, 'half', ['x'], ['F'], 'F')
+	half.new_local('r', 'F')
+	half.extend([('LOCAL_GET', 'x'), ('CONSTF', 2.0), ('DIVF',), ('LOCAL_SET', 'r'), ('LOCAL_GET', 'r'), ('RET',)])
+	return module
+
+def run(module): # Runs a module and returns what it printed
+	vm = StackMachine(output='capture')
+	vm.load_ir(module)
+	vm.run()
+	return vm.getvalue().decode()
+
+class TestGoxc(unittest.TestCase):
+	def test_round_trip(self): # Test that a module written to a .goxc file loads back the same and runs
+		module = sample_module()
+		with tempfile.NamedTemporaryFile(suffix='.goxc', delete=False) as file:
+			file.write(goxc.dumps(module))
+		try:
+			loaded = goxc.load(file.name)
+		finally:
+			os.remove(file.name)
+
+		self.assertEqual([(g.name, g.type, g.const) for g in loaded.globals.values()], [('n', 'I', False), ('k', 'I', True)])
+		for name, func in module.functions.items():
+			copy = loaded.functions[name]
+			self.assertEqual(copy.code, func.code)
+			self.assertEqual(copy.locals, func.locals)
+			self.assertEqual((copy.parmnames, copy.parmtypes, copy.return_type), (func.parmnames, func.parmtypes, func.return_type))
+			self.assertEqual(copy.words, func.encode())
+		self.assertEqual(run(loaded), run(sample_module()))
+
+	def test_invalid(self): # Test that damaged files are rejected before reaching the VM
+		data = goxc.dumps(sample_module())
+		with self.assertRaises(goxc.GoxcError):
+			goxc.loads(b'XXXX' + data[4:])
+		with self.assertRaises(goxc.GoxcError):
+			goxc.loads(data[:len(data) // 2])
+
+		# The CBREAK of main now points at the IF (pc 14) instead of the ENDLOOP (pc 19)
+		cbreak = struct.pack('<ii', goxc.Op.CBREAK, 19)
+		self.assertIn(cbreak, data)
+		with self.assertRaises(goxc.GoxcError):
+			goxc.loads(data.replace(cbreak, struct.pack('<ii', goxc.Op.CBREAK, 14)))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import io
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio import ir_text
+from Codigo_Intermedio.IR import IRModule, IRFunction
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def dumps(module): # Returns the text written by module.dump()
+	out = io.StringIO()
+	module.dump(out)
+	return out.getvalue()
+
+class TestIRText(unittest.TestCase):
+	def test_round_trip(self): # Test that the files in para_ir are read back and dumped unchanged
+		for name in ('criba.ir', 'shor.ic'):
+			with self.subTest(name=name):
+				path = os.path.join(ROOT, 'para_ir', name)
+				with open(path) as file:
+					text = file.read()
+				self.assertEqual(dumps(ir_text.load(path)).rstrip('\n'), text.rstrip('\n'))
+
+	def test_long_lines(self): # Test a function with many locals, floats, names and an import
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		for n in range(30):
+			main.new_local(f'$temp{n}', 'F')
+		main.extend([('CONSTF', -1.5e-300), ('LOCAL_SET', '$temp0'), ('CONSTI', -7), ('CALL', 'ext'), ('RET',)])
+		IRFunction(module, 'ext', ['x'], ['I'], 'I', imported=True)
+
+		text = dumps(module)
+		loaded = ir_text.loads(text)
+		self.assertEqual(loaded.functions['main'].code, main.code)
+		self.assertEqual(loaded.functions['main'].locals, main.locals)
+		self.assertTrue(loaded.functions['ext'].imported)
+		self.assertEqual(dumps(loaded), text)
+
+	def test_invalid(self): # Test that malformed lines are rejected with their line number
+		cases = [
+			"MODULE:::\n('ADDI',)\n",
+			"MODULE:::\nFUNCTION::: main, [], [] I\n('NOPE',)\n",
+			"MODULE:::\nFUNCTION::: main, [], [] I\n('CONSTI', __import__('os'))\n",
+			"MODULE:::\nFUNCTION::: main, [], [] I\n('GLOBAL_GET', x)\n",
+			"GLOBAL::: x: I\n",
+		]
+		for text in cases:
+			with self.subTest(text=text):
+				with self.assertRaises(ir_text.IRSyntaxError):
+					ir_text.loads(text)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import Op, Pool, encode, decode
+from Codigo_Intermedio.IR import IRModule, IRFunction
+
+class TestOpcodes(unittest.TestCase):
+	def test_encode(self): # Test the operands of the encoded form and the way back to tuples
+		code = [
+			('CONSTI', 1),
+			('CONSTF', 1.0),
+			('CONSTF', -0.0),
+			('CONSTF', 0.0),
+			('LOOP',),
+			('GLOBAL_GET', 'x'),
+			('CBREAK',),
+			('GLOBAL_GET', 'x'),
+			('IF',),
+			('ELSE',),
+			('ENDIF',),
+			('ENDLOOP',),
+			('CONSTI', 1),
+			('RET',),
+		]
+		pool = Pool()
+		words = encode(code, pool)
+
+		self.assertEqual(pool.values, [1, 1.0, -0.0, 0.0, 'x'])
+		self.assertEqual(list(words[0::2]), [Op[instr[0]] for instr in code])
+		self.assertEqual(list(words[1::2]), [0, 1, 2, 3, 11, 4, 11, 4, 9, 10, 0, 4, 0, 0])
+		self.assertEqual(decode(words, pool), code)
+
+	def test_release(self): # Test that a module keeps only the encoded form and rebuilds the tuples on demand
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([('CONSTI', 7), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		module.encode(release=True)
+
+		self.assertIsNone(main._code)
+		self.assertEqual(main.code, [('CONSTI', 7), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+
+		main.code = [('CONSTI', 0), ('RET',)]
+		self.assertIsNone(main.words)
+		self.assertEqual(len(main.encode()), 4)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,287 @@
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.IR import IRModule, IRGlobal, IRFunction
+from Codigo_Intermedio.constfold import fold_code, constfold
+from Codigo_Intermedio.peephole import apply_rules, peephole
+from Codigo_Intermedio.deadcode import deadcode
+from Codigo_Intermedio.inline import inline
+from Codigo_Intermedio.tailcall import tailcall
+from Codigo_Intermedio.partialeval import partialeval
+from Codigo_Intermedio.specialize import specialize
+from Maquina_de_pila.StackMachine import StackMachine
+
+def run(module): # Runs a module and returns what it printed
+	vm = StackMachine(output='capture')
+	vm.load_ir(module)
+	vm.run()
+	return vm.getvalue().decode()
+
+class TestConstFold(unittest.TestCase):
+	def test_fold(self): # Test folding, neutral operations and operations left for run time
+		cases = [
+			([('CONSTF', 2.0), ('CONSTF', -1.0), ('MULF',)], [('CONSTF', -2.0)]),
+			([('CONSTI', 7), ('CONSTI', -2), ('DIVI',), ('CONSTI', 3), ('LTI',)], [('CONSTI', 1)]),
+			([('CONSTI', 3), ('ITOF',), ('CONSTF', 0.5), ('ADDF',), ('FTOI',)], [('CONSTI', 4)]),
+			([('LOCAL_GET', 'x'), ('CONSTI', 0), ('ADDI',), ('CONSTI', 1), ('MULI',)], [('LOCAL_GET', 'x')]),
+			([('LOCAL_GET', 'x'), ('CONSTF', 0.0), ('ADDF',)], [('LOCAL_GET', 'x'), ('CONSTF', 0.0), ('ADDF',)]),
+			([('CONSTI', 1), ('CONSTI', 0), ('DIVI',)], [('CONSTI', 1), ('CONSTI', 0), ('DIVI',)]),
+		]
+		for code, expected in cases:
+			with self.subTest(code=code):
+				self.assertEqual(fold_code(code), expected)
+
+	def test_const_globals(self): # Test that const globals are propagated, also through other consts
+		module = IRModule()
+		module.globals['a'] = IRGlobal('a', 'I', const=True)
+		module.globals['b'] = IRGlobal('b', 'I', const=True)
+		module.globals['v'] = IRGlobal('v', 'I')
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 6), ('GLOBAL_SET', 'a'),
+			('GLOBAL_GET', 'a'), ('CONSTI', 7), ('MULI',), ('GLOBAL_SET', 'b'),
+			('CONSTI', 1), ('GLOBAL_SET', 'v'),
+			('CALL', 'f'), ('PRINTI',), ('CONSTI', 0), ('RET',),
+		])
+		f = IRFunction(module, 'f', [], [], 'I')
+		f.extend([('GLOBAL_GET', 'b'), ('GLOBAL_GET', 'v'), ('ADDI',), ('RET',)])
+		expected = run(module)
+
+		report = constfold(module)
+		self.assertEqual(report['globals'], {'a': 6, 'b': 42})
+		self.assertEqual(f.code, [('CONSTI', 42), ('GLOBAL_GET', 'v'), ('ADDI',), ('RET',)])
+		self.assertNotIn(('GLOBAL_SET', 'a'), main.code)
+		self.assertEqual(run(module), expected)
+
+class TestPeephole(unittest.TestCase):
+	def test_rules(self): # Test negation, conversions, constant breaks and compare-and-branch fusion
+		cases = [
+			([('LOCAL_GET', 'x'), ('CONSTI', -1), ('MULI',)], [('LOCAL_GET', 'x'), ('NEGI',)]),
+			([('LOCAL_GET', 'x'), ('CONSTF', -1.0), ('MULF',), ('CONSTF', -1.0), ('MULF',)], [('LOCAL_GET', 'x')]),
+			([('LOCAL_GET', 'x'), ('ITOF',), ('FTOI',)], [('LOCAL_GET', 'x'), ('ITOF',), ('FTOI',)]),
+			([('LOCAL_GET', 'x'), ('FTOI',), ('ITOF',)], [('LOCAL_GET', 'x'), ('FTOI',), ('ITOF',)]),
+			([('LOOP',), ('CONSTI', 1), ('CBREAK',), ('ENDLOOP',)], [('LOOP',), ('BREAK',), ('ENDLOOP',)]),
+			([('GTF',), ('IF',), ('ELSE',), ('ENDIF',)], [('IF_GTF',), ('ENDIF',)]),
+		]
+		for code, expected in cases:
+			with self.subTest(code=code):
+				self.assertEqual(apply_rules(code), expected)
+
+	def test_loops(self): # Test that a while header becomes a fused exit and the program prints the same
+		module = IRModule()
+		module.globals['n'] = IRGlobal('n', 'I')
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 5), ('GLOBAL_SET', 'n'),
+			('LOOP',), ('CONSTI', 1), ('GLOBAL_GET', 'n'), ('CONSTI', 0), ('GTI',), ('SUBI',), ('CBREAK',),
+			('GLOBAL_GET', 'n'), ('CONSTI', 2), ('EQI',), ('IF',), ('CONSTI', 1), ('CBREAK',), ('ELSE',), ('ENDIF',),
+			('GLOBAL_GET', 'n'), ('CONSTI', -1), ('MULI',), ('PRINTI',),
+			('GLOBAL_GET', 'n'), ('CONSTI', 1), ('SUBI',), ('GLOBAL_SET', 'n'),
+			('ENDLOOP',), ('CONSTI', 0), ('RET',),
+		])
+		expected = run(module)
+
+		peephole(module)
+		self.assertEqual(main.code[2:6], [('LOOP',), ('GLOBAL_GET', 'n'), ('CONSTI', 0), ('WHILE_GTI',)])
+		self.assertIn(('IF_EQI',), main.code)
+		self.assertIn(('BREAK',), main.code)
+		self.assertEqual(run(module), expected)
+
+class TestDeadCode(unittest.TestCase):
+	def test_deadcode(self): # Test constant branches, code after RET and dead stores
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([('CONSTI', 4), ('CALL', 'f'), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		f = IRFunction(module, 'f', ['n'], ['I'], 'I')
+		f.new_local('t', 'I')
+		f.new_local('u', 'I')
+		f.extend([
+			('LOCAL_GET', 'n'), ('CONSTI', 2), ('MULI',), ('LOCAL_SET', 't'),
+			('CONSTI', 1), ('LOCAL_GET', 'n'), ('DIVI',), ('LOCAL_SET', 'u'),
+			('CONSTI', 0), ('IF',), ('CONSTI', 7), ('PRINTI',), ('ELSE',), ('CONSTI', 8), ('PRINTI',), ('ENDIF',),
+			('LOCAL_GET', 'n'), ('RET',),
+			('CONSTI', 9), ('PRINTI',),
+		])
+		expected = run(module)
+
+		report = deadcode(module)
+		self.assertEqual(report['f'], (6, 2, 4))
+		self.assertEqual(f.code, [
+			('CONSTI', 1), ('LOCAL_GET', 'n'), ('DIVI',), ('POP',),
+			('CONSTI', 8), ('PRINTI',),
+			('LOCAL_GET', 'n'), ('RET',),
+		])
+		self.assertEqual(f.locals, {})
+		self.assertEqual(run(module), expected)
+
+class TestInline(unittest.TestCase):
+	def test_inline(self): # Test expansion of small functions, early returns, recursion and the notes in the dump
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 17), ('CONSTI', 5), ('CALL', 'mod'), ('PRINTI',),
+			('CONSTI', -3), ('CALL', 'sign'), ('CONSTI', 4), ('CALL', 'fact'), ('ADDI',), ('PRINTI',),
+			('CONSTI', 0), ('RET',),
+		])
+		mod = IRFunction(module, 'mod', ['x', 'y'], ['I', 'I'], 'I')
+		mod.extend([('LOCAL_GET', 'x'), ('LOCAL_GET', 'x'), ('LOCAL_GET', 'y'), ('DIVI',), ('LOCAL_GET', 'y'), ('MULI',), ('SUBI',), ('RET',)])
+		sign = IRFunction(module, 'sign', ['x'], ['I'], 'I')
+		sign.extend([('LOCAL_GET', 'x'), ('CONSTI', 0), ('LTI',), ('IF',), ('CONSTI', -1), ('RET',), ('ELSE',), ('ENDIF',), ('CONSTI', 1), ('RET',)])
+		fact = IRFunction(module, 'fact', ['n'], ['I'], 'I')
+		fact.extend([
+			('LOCAL_GET', 'n'), ('CONSTI', 1), ('LEI',), ('IF',), ('CONSTI', 1), ('RET',), ('ELSE',), ('ENDIF',),
+			('LOCAL_GET', 'n'), ('LOCAL_GET', 'n'), ('CONSTI', 1), ('SUBI',), ('CALL', 'fact'), ('MULI',), ('RET',),
+		])
+		expected = run(module)
+
+		report = inline(module)
+		self.assertEqual(report['inlined'], {'main': {'mod': 1, 'sign': 1}})
+		self.assertEqual(report['kept'], {'fact': 'recursiva'})
+		self.assertEqual(report['removed'], ['mod', 'sign'])
+		self.assertEqual([instr for instr in main.code if instr[0] == 'CALL'], [('CALL', 'fact')])
+		self.assertIn('mod.0.x', main.locals)
+		self.assertIn('# inline: mod expandida en 1 llamada(s)', list(main.lines()))
+		self.assertEqual(run(module), expected)
+
+	def test_inline_tailcall(self): # Test that an expanded TAILCALL becomes a call instead of leaving the caller
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([('CONSTI', 1), ('CALL', 'g'), ('PRINTI',), ('CONSTI', 29), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		g = IRFunction(module, 'g', ['n'], ['I'], 'I')
+		g.extend([('LOCAL_GET', 'n'), ('TAILCALL', 'k')])
+		k = IRFunction(module, 'k', ['n'], ['I'], 'I')
+		k.extend([('LOCAL_GET', 'n'), ('CONSTI', 0), ('EQI',), ('IF',), ('CONSTI', 0), ('RET',), ('ELSE',), ('ENDIF',), ('LOCAL_GET', 'n'), ('RET',)])
+
+		report = inline(module, threshold=2)
+		self.assertEqual(report['inlined'], {'main': {'g': 1}})
+		self.assertNotIn('TAILCALL', [instr[0] for instr in main.code])
+		self.assertEqual(run(module), '129')
+
+class TestTailCall(unittest.TestCase):
+	def test_tailcall(self): # Test that tail recursion runs in constant call depth
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([('CONSTI', 1000), ('CALL', 'total'), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		total = IRFunction(module, 'total', ['n'], ['I'], 'I')
+		total.extend([('LOCAL_GET', 'n'), ('CONSTI', 0), ('CALL', 'sum'), ('RET',)])
+		sum = IRFunction(module, 'sum', ['n', 'acc'], ['I', 'I'], 'I')
+		sum.extend([
+			('LOCAL_GET', 'n'), ('CONSTI', 0), ('EQI',), ('IF',), ('LOCAL_GET', 'acc'), ('RET',), ('ELSE',), ('ENDIF',),
+			('LOCAL_GET', 'n'), ('CONSTI', 1), ('SUBI',), ('LOCAL_GET', 'acc'), ('LOCAL_GET', 'n'), ('ADDI',), ('CALL', 'sum'), ('RET',),
+		])
+
+		self.assertEqual(tailcall(module), {'total': (0, 1), 'sum': (1, 0)})
+		self.assertEqual(total.code[-1], ('TAILCALL', 'sum'))
+		self.assertEqual(sum.code[-4:], [('LOCAL_SET', 'acc'), ('LOCAL_SET', 'n'), ('CONTINUE',), ('ENDLOOP',)])
+
+		vm = StackMachine(max_depth=2, output='capture')
+		vm.load_ir(module)
+		vm.run()
+		self.assertEqual(vm.getvalue(), b'500500')
+
+class TestPartialEval(unittest.TestCase):
+	def test_partialeval(self): # Test that pure calls with constant arguments are evaluated and the budget is respected
+		module = IRModule()
+		module.globals['year'] = IRGlobal('year', 'I')
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 2025), ('GLOBAL_SET', 'year'),
+			('GLOBAL_GET', 'year'), ('CALL', 'sq'), ('CONSTI', 1), ('ADDI',), ('PRINTI',),
+			('CONSTI', 3), ('CALL', 'show'), ('PRINTI',),
+			('CONSTI', 0), ('CALL', 'spin'), ('PRINTI',),
+			('CONSTI', 0), ('RET',),
+		])
+		sq = IRFunction(module, 'sq', ['x'], ['I'], 'I')
+		sq.extend([('LOCAL_GET', 'x'), ('LOCAL_GET', 'x'), ('MULI',), ('RET',)])
+		show = IRFunction(module, 'show', ['x'], ['I'], 'I')
+		show.extend([('LOCAL_GET', 'x'), ('PRINTI',), ('LOCAL_GET', 'x'), ('RET',)])
+		spin = IRFunction(module, 'spin', ['x'], ['I'], 'I')
+		spin.extend([('LOOP',), ('LOCAL_GET', 'x'), ('CONSTI', 1), ('ADDI',), ('LOCAL_SET', 'x'), ('ENDLOOP',), ('LOCAL_GET', 'x'), ('RET',)])
+
+		report = partialeval(module, budget=1000)
+		self.assertEqual(report['calls'], {'main': [('sq(2025)', 4100625)]})
+		self.assertEqual(list(report['failed']), ['spin(0)'])
+		self.assertEqual(report['removed'], ['sq'])
+		self.assertEqual(main.code[2:4], [('CONSTI', 4100626), ('PRINTI',)])
+		self.assertIn(('CALL', 'show'), main.code)
+		self.assertIn(('CALL', 'spin'), main.code)
+
+	def test_partialeval_bounds(self): # Test that int64 overflow fails the evaluation and unreachable functions are skipped
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([('CONSTI', 5), ('CALL', 'p'), ('PRINTI',), ('CONSTI', 6), ('CALL', 'p'), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		p = IRFunction(module, 'p', ['n'], ['I'], 'I')
+		p.new_local('x', 'I')
+		p.extend([
+			('CONSTI', 3), ('LOCAL_SET', 'x'),
+			('LOOP',), ('LOCAL_GET', 'n'), ('CONSTI', 0), ('GTI',), ('WHILE',),
+			('LOCAL_GET', 'x'), ('LOCAL_GET', 'x'), ('MULI',), ('LOCAL_SET', 'x'),
+			('LOCAL_GET', 'n'), ('CONSTI', 1), ('SUBI',), ('LOCAL_SET', 'n'), ('ENDLOOP',),
+			('LOCAL_GET', 'x'), ('RET',),
+		])
+		never = IRFunction(module, 'never', [], [], 'I')
+		never.extend([('CONSTI', 34), ('CALL', 'p'), ('RET',)])
+
+		report = partialeval(module)
+		self.assertEqual(report['calls'], {'main': [('p(5)', 3 ** 32)]})
+		self.assertEqual(list(report['failed']), ['p(6)'])
+		self.assertEqual(never.code, [('CONSTI', 34), ('CALL', 'p'), ('RET',)])
+
+class TestSpecialize(unittest.TestCase):
+	def test_specialize(self): # Test that calls with a constant argument go to a folded clone
+		module = IRModule()
+		module.globals['a'] = IRGlobal('a', 'I')
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 5), ('GLOBAL_SET', 'a'),
+			('GLOBAL_GET', 'a'), ('CONSTI', 3), ('CALL', 'scale'), ('PRINTI',),
+			('GLOBAL_GET', 'a'), ('CONSTI', 2), ('ADDI',), ('CONSTI', 3), ('CALL', 'scale'), ('PRINTI',),
+			('CONSTI', 0), ('RET',),
+		])
+		scale = IRFunction(module, 'scale', ['x', 'k'], ['I', 'I'], 'I')
+		scale.extend([
+			('LOCAL_GET', 'k'), ('CONSTI', 0), ('EQI',), ('IF',), ('LOCAL_GET', 'x'), ('RET',), ('ENDIF',),
+			('LOCAL_GET', 'x'), ('LOCAL_GET', 'k'), ('MULI',), ('LOCAL_GET', 'k'), ('CONSTI', 2), ('MULI',), ('ADDI',), ('RET',),
+		])
+
+		report = specialize(module)
+		self.assertEqual(report['clones'], {'scale.0': ('scale', {'k': 3}, 2, 15, 6)})
+		self.assertEqual(report['removed'], ['scale'])
+		clone = module.functions['scale.0']
+		self.assertEqual(clone.parmnames, ['x'])
+		self.assertEqual(clone.code, [('LOCAL_GET', 'x'), ('CONSTI', 3), ('MULI',), ('CONSTI', 6), ('ADDI',), ('RET',)])
+		self.assertEqual(main.code[2:5], [('GLOBAL_GET', 'a'), ('CALL', 'scale.0'), ('PRINTI',)])
+
+		vm = StackMachine(output='capture')
+		vm.load_ir(module)
+		vm.run()
+		self.assertEqual(vm.getvalue(), b'2127')
+
+	def test_signed_zero(self): # Test that 0.0 and -0.0 arguments get different clones
+		module = IRModule()
+		module.globals['a'] = IRGlobal('a', 'F')
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTF', 1.0), ('GLOBAL_SET', 'a'),
+			('GLOBAL_GET', 'a'), ('CONSTF', 0.0), ('CALL', 'f'), ('PRINTF',),
+			('GLOBAL_GET', 'a'), ('CONSTF', -0.0), ('CALL', 'f'), ('PRINTF',),
+			('CONSTI', 0), ('RET',),
+		])
+		f = IRFunction(module, 'f', ['x', 'k'], ['F', 'F'], 'F')
+		f.extend([
+			('LOCAL_GET', 'k'), ('CONSTF', 1.0), ('EQF',), ('IF',), ('LOCAL_GET', 'x'), ('RET',), ('ENDIF',),
+			('LOCAL_GET', 'x'), ('LOCAL_GET', 'k'), ('MULF',), ('LOCAL_GET', 'k'), ('ADDF',), ('RET',),
+		])
+
+		report = specialize(module)
+		self.assertEqual(sorted(str(clone[1]['k']) for clone in report['clones'].values()), ['-0.0', '0.0'])
+		vm = StackMachine(output='capture')
+		vm.load_ir(module)
+		vm.run()
+		self.assertEqual(vm.getvalue(), b'0.0-0.0')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,565 +1,736 @@
 
+import sys
+import os
+import io
+from collections import OrderedDict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Maquina_de_pila.verifier import verify
+from Codigo_Intermedio.opcodes import Op, Pool, NAMES, KINDS, JUMP, encode
+from Codigo_Intermedio.purity import pure_functions
+
+CELL_SIZE = 8                                 # Bytes por celda de memoria (int64 / double)
+INITIAL_CELLS = 1024                          # Celdas disponibles al iniciar
+FLUSH_THRESHOLD = 64 * 1024                   # Caracteres de salida acumulados antes de escribir
+MEMO_SIZE = 10000                             # Resultados guardados por función memoizada
+INT_MIN, INT_MAX = -2**63, 2**63 - 1          # Rango de una celda int64
+
+
+class Memo:
+    '''
+    Resultados guardados de una función pura: argumentos -> resultado,
+    en orden de uso (LRU) y con a lo más size entradas.
+    '''
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def store(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
 class StackMachine:
-    def __init__(self):
+    '''
+    Máquina de pila que ejecuta el código IR.
+
+    max_depth : máximo de llamadas anidadas del programa.
+    output    : destino de lo que imprime el programa (PRINTI, PRINTF,
+                PRINTB). Puede ser None (sys.stdout), un objeto archivo
+                de texto o binario, un descriptor de archivo (int) o
+                'capture' para guardarlo en memoria y leerlo con
+                getvalue().
+    flush_threshold : la salida se acumula en un buffer y se escribe
+                cuando alcanza este tamaño o cuando termina el programa.
+    memoize   : guarda el resultado de las llamadas a funciones puras
+                (Codigo_Intermedio/purity.py) con parámetros enteros; una
+                llamada repetida con los mismos argumentos no se ejecuta
+                de nuevo. memo_size es el máximo de resultados por
+                función; se descartan los usados hace más tiempo.
+    '''
+    def __init__(self, max_depth=100000, output=None, flush_threshold=FLUSH_THRESHOLD, memoize=True, memo_size=MEMO_SIZE):
         self.stack = []                       # Pila principal
-        self.memory = [0] * 1024              # Memoria lineal
-        self.globals = {}                     # Variables globales
-
-        self.locals_stack = {}                # Stack de variables locales por función
-        self.call_stack = []                  # Stack de retorno
+        self.memory = bytearray(INITIAL_CELLS * CELL_SIZE)   # Memoria lineal
+        self.memsize = INITIAL_CELLS          # Celdas en uso (lo que devuelve ^)
+        self._map_memory()
+        self.globals = []                     # Variables globales, indexadas por slot
+        self.global_slots = {}                # Nombre de variable global -> slot
+
+        self.frame = []                       # Marco (slots) de la función en ejecución
+        self.call_stack = []                  # Stack de retorno: (programa, pc, marco) del llamador
+        self.max_depth = max_depth            # Máximo de llamadas anidadas
+
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.memos = {}                       # Nombre de función -> Memo
+        self.memo_returns = set()             # Funciones cuyo RET usa RET_MEMO
+        self.memo_pending = []                # (profundidad, Memo, argumentos) de las llamadas en curso
+
+        self.output = output                  # Destino de la salida del programa
+        self.flush_threshold = flush_threshold
+        self._out = []                        # Salida pendiente de escribir
+        self._out_size = 0
+        self._captured = []                   # Salida guardada en modo 'capture'
         self.functions = {}                   # Diccionario de funciones
         self.pc = 0                           # Contador de programa
         self.program = []                     # Programa IR cargado
         self.running = False
 
-        self.else_pc = 0
-        self.endif_pc = 0
-        self.start_loop_pc = 0
-        self.end_loop_pc = 0
-        self.pc_if = 0
-        self.pc_loop = 0
+        self.codes = {}                       # Código decodificado por función
+        self.global_types = {}                # Tipos de las variables globales
+        self.signatures = {}                  # Firma (parámetros, retorno) de cada función
+        self.frame_sizes = {}                 # (número de parámetros, número de slots) por función
+
+        # Tabla de despacho: opcode (número de Op) -> método op_*
+        self.handlers = [getattr(self, f'op_{op.name}') for op in sorted(Op)]
 
     def load_ir(self, module):
-        self.program = module.functions['main'].code
-        self.functions = module.functions 
-        self.functions.pop('main')
+        main = module.functions['main']
+        # El módulo no se modifica: se puede optimizar o cargar de nuevo
+        self.functions = {name: func for name, func in module.functions.items() if name != 'main'}
         
         for name, value in module.globals.items():
-            type = value.type
-            self.globals[name] = (type, None)
+            self.global_types[name] = value.type
+        self.global_slots = module.global_slots()
+        self.globals = [None] * len(self.global_slots)
+
+        # Solo se memoizan funciones con parámetros enteros: con flotantes,
+        # 0.0 y -0.0 serían la misma clave
+        # Una llamada memoizada puede terminar en el RET de otra función
+        # pura a la que llegó con TAILCALL, por eso todas las puras usan
+        # RET_MEMO (ver op_CALL_MEMO)
+        if self.memoize:
+            pure = pure_functions(module)
+            self.memos = {
+                name: Memo(name, self.memo_size) for name in sorted(pure)
+                if all(type == 'I' for type in module.functions[name].parmtypes)
+            }
+            self.memo_returns = pure if self.memos else set()
+
+        for name, func in self.functions.items():
+            self.signatures[name] = (func.parmtypes, func.return_type)
+            self.frame_sizes[name] = (len(func.parmnames), len(func.slots()))
+            self.codes[name] = []
+
+        # Cada función se codifica, verifica y decodifica una sola vez. El
+        # código decodificado se copia dentro de la lista ya creada en
+        # self.codes, a la que apuntan las instrucciones CALL.
+        main.encode()
+        pool = module.encode()
+        self.program = self.decode(main.words, pool, main)
+        for name, func in self.functions.items():
+            self.codes[name][:] = self.decode(func.words, pool, func)
+
+        # Las variables de main son globales; su marco solo tiene las
+        # locales que agrega el optimizador al expandir llamadas.
+        self.frame = [None] * len(main.slots())
 
     def load_program(self, program):
-        self.program = program
-
-    def run(self):
+        self.global_slots = {name: n for n, name in enumerate(self.global_types)}
+        self.globals = [None] * len(self.global_slots)
+        pool = Pool()
+        self.program = self.decode(encode(program, pool), pool)
+
+    def decode(self, words, pool, func=None):
+        '''
+        Traduce el código codificado de una función (opcodes.encode) a
+        pares (método, operandos) listos para ejecutar. Los destinos de
+        salto ya vienen como operando; las constantes se toman del pool
+        y los nombres de variables y funciones se cambian por su slot o
+        su código.
+
+        Después, el código pasa por el verificador con los tipos de func
+        (un programa suelto se verifica como 'main').
+        '''
+        slots = func.slots() if func is not None else {}
+        memo = func is not None and func.name in self.memo_returns
+        handlers = self.handlers
+        values = pool.values
+        decoded = []
+
+        for pc in range(len(words) // 2):
+            op = words[2 * pc]
+            operand = words[2 * pc + 1]
+            if not 0 <= op < len(handlers):
+                raise RuntimeError(f"Error en StackMachine: Instrucción desconocida: {op} en la instrucción {pc}")
+
+            opname = NAMES[op]
+            if opname == 'CONSTI' or opname == 'CONSTF':
+                args = (values[operand],)
+            elif KINDS[op] == JUMP and opname != 'LOOP':
+                args = (operand,)
+            elif opname == 'LOCAL_GET' or opname == 'LOCAL_SET':
+                args = (slots[values[operand]],)
+            elif opname == 'GLOBAL_GET' or opname == 'GLOBAL_SET':
+                args = (self.global_slots[values[operand]],)
+            elif opname == 'CALL' or opname == 'TAILCALL':
+                name = values[operand]
+                if name not in self.codes:
+                    raise RuntimeError(f"Error en StackMachine: Función desconocida: {name} en la instrucción {pc}")
+                args = (self.codes[name],) + self.frame_sizes[name]
+                if opname == 'CALL' and name in self.memos:
+                    decoded.append((self.op_CALL_MEMO, args + (self.memos[name],)))
+                    continue
+            elif opname == 'RET' and memo:
+                decoded.append((self.op_RET_MEMO, ()))
+                continue
+            else:
+                args = ()
+
+            decoded.append((handlers[op], args))
+
+        # RET implícito: un programa que termina sin RET se detiene aquí
+        decoded.append((self.op_RET, ()))
+
+        if func is None:
+            verify(words, pool, 'main', 'I', {}, self.global_types, self.signatures)
+        elif not func.imported:
+            variables = dict(zip(func.parmnames, func.parmtypes))
+            variables.update(func.locals)
+            verify(words, pool, func.name, func.return_type, variables, self.global_types, self.signatures)
+
+        return decoded
+
+    def run(self, limit=None):
+        '''
+        Único ciclo de ejecución sobre el código decodificado. Los bloques
+        anidados no crean sub-intérpretes: las instrucciones de control
+        solo cambian self.pc al destino que reciben como operando. Un salto
+        deja self.pc en la instrucción anterior al destino, porque
+        el ciclo siempre avanza una posición después de ejecutar.
+
+        Las llamadas tampoco vuelven a entrar a run(): CALL guarda el
+        punto de retorno en self.call_stack y cambia self.program, y RET
+        lo recupera. La profundidad de recursión del programa solo está
+        limitada por self.max_depth.
+
+        Con limit, se ejecutan a lo más limit instrucciones; si el programa
+        no termina antes se genera un error. También es un error un entero
+        fuera del rango de 64 bits (el mismo límite de POKEI): sin él, unas
+        pocas instrucciones con enteros enormes pueden tardar sin límite.
+        El ciclo sin límite no cuenta ni revisa nada.
+        '''
         self.pc = 0
         self.running = True
-        while self.running and self.pc < len(self.program):
-            instr = self.program[self.pc]
-            opname = instr[0]
-            args = instr[1:] if len(instr) > 1 else []
-            method = getattr(self, f"op_{opname}", None)
-
-            if opname == 'LOOP' or opname == 'IF':
-                args.append(self.pc)
-            
-            if method:
-                method(*args)
+        try:
+            if limit is None:
+                while self.running:
+                    method, args = self.program[self.pc]
+                    method(*args)
+                    self.pc += 1
             else:
-                raise RuntimeError(f"Error en StackMachine: Instrucción desconocida: {opname}")
-            
-            self.pc += 1
+                while self.running:
+                    if limit == 0:
+                        raise RuntimeError("Error en StackMachine: Se superó el límite de instrucciones")
+                    limit -= 1
+                    method, args = self.program[self.pc]
+                    method(*args)
+                    self.pc += 1
+                    stack = self.stack
+                    if stack and type(stack[-1]) is int and not INT_MIN <= stack[-1] <= INT_MAX:
+                        raise RuntimeError("Error en StackMachine: Entero fuera del rango de 64 bits")
+        finally:
+            self.flush()
+
+    def call(self, name, args, limit=None):
+        '''
+        Ejecuta la función name (ya cargada con load_ir) con los
+        argumentos args y devuelve su resultado. La usa el optimizador
+        para evaluar llamadas al compilar (Codigo_Intermedio/partialeval.py).
+        '''
+        nparams, nslots = self.frame_sizes[name]
+        self.stack = list(args)
+        self.call_stack = []
+        self.memo_pending = []
+        self.program = [(self.op_CALL, (self.codes[name], nparams, nslots)), (self.op_RET, ())]
+        self.run(limit)
+        return self.stack[-1]
+
+    # --- Salida
+
+    def write(self, text):
+        self._out.append(text)
+        self._out_size += len(text)
+        if self._out_size >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        '''
+        Escribe en self.output la salida acumulada.
+        '''
+        if not self._out:
+            return
+        text = ''.join(self._out)
+        self._out = []
+        self._out_size = 0
+
+        output = self.output
+        if output is None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        elif output == 'capture':
+            self._captured.append(text.encode('utf-8'))
+        elif isinstance(output, int):
+            data = memoryview(text.encode('utf-8'))
+            while data:
+                data = data[os.write(output, data):]
+        elif isinstance(output, (io.RawIOBase, io.BufferedIOBase)):
+            output.write(text.encode('utf-8'))
+        else:
+            output.write(text)
+
+    def getvalue(self):
+        '''
+        Devuelve como bytes lo que imprimió el programa en modo 'capture'.
+        '''
+        self.flush()
+        return b''.join(self._captured)
+
+    # Los tipos de los operandos ya fueron comprobados por el verificador
+    # al cargar el programa, por eso la pila guarda valores sin etiqueta.
 
     def op_CONSTI(self, value):
-        self.stack.append(('I', value))
-    
+        self.stack.append(value)
 
     def op_ADDI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', a + b))
-        else:
-            raise TypeError("Error en StackMachine: ADDI requiere dos enteros")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a + b)
 
     def op_SUBI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', a - b))
-        else:
-            raise TypeError("Error en StackMachine: SUBI requiere dos enteros")
-    
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a - b)
+
     def op_MULI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', a * b))
-        else:
-            raise TypeError("Error en StackMachine: MULI requiere dos enteros")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a * b)
 
     def op_DIVI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', a // b))
-        else:
-            raise TypeError("Error en StackMachine: DIVI requiere dos enteros")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a // b)
+
     def op_LTI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a < b)))
-        else:
-            raise TypeError("Error en StackMachine: LTI requiere dos enteros")
-    
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a < b))
+
     def op_LEI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a <= b)))
-        else:
-            raise TypeError("Error en StackMachine: LEI requiere dos enteros")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a <= b))
 
     def op_GTI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a > b)))
-        else:
-            raise TypeError("Error en StackMachine: GTI requiere dos enteros")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a > b))
+
     def op_GEI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a >= b)))
-        else:
-            raise TypeError("Error en StackMachine: GEI requiere dos enteros")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a >= b))
 
     def op_EQI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a == b)))
-        else:
-            raise TypeError("Error en StackMachine: EQI requiere dos enteros")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a == b))
+
     def op_NEI(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'I':
-            self.stack.append(('I', int(a != b)))
-        else:
-            raise TypeError("Error en StackMachine: NEI requiere dos enteros")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a != b))
+
     def op_PEEKI(self):
-        address_type, address = self.stack.pop()
+        address = self.stack.pop()
 
-        if address_type == 'I':
-            if address < len(self.memory):
-                self.stack.append(('I', int(self.memory[address])))
-            else:
-                raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
+        if 0 <= address < self.memsize:
+            self.stack.append(self._ints[address])
         else:
-            raise TypeError("Error en StackMachine: PEEKI requiere una direccion de entero")
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
 
     def op_POKEI(self):
-        value_type, value = self.stack.pop()
-        address_type, address = self.stack.pop()
+        value = self.stack.pop()
+        address = self.stack.pop()
 
-        if value_type == address_type == 'I':
-            if address < len(self.memory):
-                self.memory[address] = int(value)
-            else:
-                raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
+        if 0 <= address < self.memsize:
+            try:
+                self._ints[address] = value
+            except (ValueError, OverflowError):
+                raise RuntimeError(f"Error en StackMachine: El valor {value} no cabe en una celda de 64 bits (dirección {address})") from None
         else:
-            raise TypeError("Error en StackMachine: POKEI requiere una direccion de entero")
-        
-    def op_ITOF(self):
-        value_type, value = self.stack.pop()
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
 
-        if value_type == 'I':
-            self.stack.append(('F', float(value)))
-        else:
-            raise TypeError("Error en StackMachine: ITOF requiere un numero entero")
+    def op_ITOF(self):
+        self.stack.append(float(self.stack.pop()))
 
     def op_CONSTF(self, value):
-        self.stack.append(('F', value))
-        
+        self.stack.append(value)
+
     def op_ADDF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('F', a + b))
-        else:
-            raise TypeError("Error en StackMachine: ADDF requiere dos flotantes")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a + b)
+
     def op_SUBF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('F', a - b))
-        else:
-            raise TypeError("Error en StackMachine: SUBF requiere dos flotantes")
-    
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a - b)
+
     def op_MULF(self):
-        
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('F', a * b))
-        else:
-            raise TypeError("Error en StackMachine: MULF requiere dos flotantes")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a * b)
 
     def op_DIVF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('F', a / b))
-        else:
-            raise TypeError("Error en StackMachine: DIVF requiere dos flotantes")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(a / b)
+
     def op_LTF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a < b)))
-        else:
-            raise TypeError("Error en StackMachine: LTF requiere dos flotantes")
-    
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a < b))
+
     def op_LEF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a <= b)))
-        else:
-            raise TypeError("Error en StackMachine: LEF requiere dos flotantes")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a <= b))
 
     def op_GTF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a > b)))
-        else:
-            raise TypeError("Error en StackMachine: GTF requiere dos flotantes")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a > b))
+
     def op_GEF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a >= b)))
-        else:
-            raise TypeError("Error en StackMachine: GEF requiere dos flotantes")
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a >= b))
 
     def op_EQF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a == b)))
-        else:
-            raise TypeError("Error en StackMachine: EQF requiere dos flotantes")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a == b))
+
     def op_NEF(self):
-        b_type, b = self.stack.pop()
-        a_type, a = self.stack.pop()
-        if a_type == b_type == 'F':
-            self.stack.append(('I', int(a != b)))
-        else:
-            raise TypeError("Error en StackMachine: NEF requiere dos flotantes")
-        
+        b = self.stack.pop()
+        a = self.stack.pop()
+        self.stack.append(int(a != b))
+
     def op_PEEKF(self):
-        address_type, address = self.stack.pop()
+        address = self.stack.pop()
 
-        if address_type == 'I':
-            if address < len(self.memory):
-                self.stack.append(('F', float(self.memory[address])))
-            else:
-                raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
+        if 0 <= address < self.memsize:
+            self.stack.append(self._floats[address])
         else:
-            raise TypeError("Error en StackMachine: PEEKF requiere una direccion de entero")
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
 
     def op_POKEF(self):
-        value_type, value = self.stack.pop()
-        address_type, address = self.stack.pop()
-
-        if address_type == 'I':
-            if value_type == 'F':
-                if address < len(self.memory):
-                    self.memory[address] = float(value)
-                else:
-                    raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
-            else:
-                raise TypeError("Error en StackMachine: POKEF requiere un flotante")
+        value = self.stack.pop()
+        address = self.stack.pop()
+
+        if 0 <= address < self.memsize:
+            self._floats[address] = value
         else:
-            raise TypeError("Error en StackMachine: POKEF requiere una direccion de entero")
-        
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
+
     def op_FTOI(self):
-        value_type, value = self.stack.pop()
+        self.stack.append(int(round(self.stack.pop())))
 
-        if value_type == 'F':
-            value = round(value)
-            self.stack.append(('I', int(value)))
-        else:
-            raise TypeError("Error en StackMachine: FTOI requiere un numero flotante")
+    def op_NEGI(self):
+        self.stack.append(-self.stack.pop())
+
+    op_NEGF = op_NEGI
 
     def op_PRINTI(self):
-        val_type, value = self.stack.pop()
-        if val_type == 'I':
-            print(value, end='')
-        else:
-            raise TypeError("Error en StackMachine: PRINTI requiere un entero")
-        
+        self.write(str(self.stack.pop()))
+
     def op_PRINTF(self):
-        val_type, value = self.stack.pop()
-        if val_type == 'F':
-            print(value, end='')
-        else:
-            raise TypeError("Error en StackMachine: PRINTF requiere un flotante")
-        
+        self.write(str(self.stack.pop()))
+
     def op_PRINTB(self):
-        val_type, value = self.stack.pop()
-        if val_type == 'I':
-            if value == 1 or value == 0:
-                print(str(bool(value)).lower(), end='')
-            else:
-                print(chr(value), end='')
+        value = self.stack.pop()
+        if value == 1 or value == 0:
+            self.write(str(bool(value)).lower())
         else:
-            raise TypeError("Error en StackMachine: PRINTF requiere un flotante")
-        
+            self.write(chr(value))
+
     def op_PEEKB(self):
-        address_type, address = self.stack.pop()
+        address = self.stack.pop()
 
-        if address_type == 'I':
-            if address < len(self.memory):
-                self.stack.append(('I', int(self.memory[address])))
-            else:
-                raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
+        if 0 <= address < self.memsize:
+            self.stack.append(self.memory[address * CELL_SIZE])
         else:
-            raise TypeError("Error en StackMachine: PEEKB requiere una direccion de entero")
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
 
     def op_POKEB(self):
-        value_type, value = self.stack.pop()
-        address_type, address = self.stack.pop()
+        value = self.stack.pop()
+        address = self.stack.pop()
 
-        if value_type == address_type == 'I':
-            if address < len(self.memory):
-                self.memory[address] = float(value)
-            else:
-                raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")    
+        if 0 <= address < self.memsize:
+            self.memory[address * CELL_SIZE] = value & 0xFF
         else:
-            raise TypeError("Error en StackMachine: POKEF requiere una direccion de entero")
+            raise TypeError(f"Error en StackMachine: Direccion {address} fuera de rango")
 
-    def op_RET(self):
+    def op_POP(self):
+        self.stack.pop()
 
-        self.running = False
+    def op_RET(self):
+        # El valor de retorno queda en la pila para el llamador
+        if self.call_stack:
+            self.program, self.pc, self.frame = self.call_stack.pop()
+        else:
+            self.running = False
 
-    def op_GLOBAL_SET(self, var):
-        _ , a = self.stack.pop()
-        type = self.globals[var][0]
-        value = (type, a)
-        self.globals[var] = value
+    def op_GLOBAL_SET(self, slot):
+        self.globals[slot] = self.stack.pop()
 
-    def op_GLOBAL_GET(self, var):
-        value = self.globals[var]
-        self.stack.append((value[0], value[1]))
-    
-    def findEndLoop(self, pc):
-        while True:
-            pc += 1
-            a = self.program[pc]
-            if a[0] == 'LOOP':
-                pc = self.findEndLoop(pc)
-            elif a[0] == 'ENDLOOP':
-                return pc
-    
+    def op_GLOBAL_GET(self, slot):
+        self.stack.append(self.globals[slot])
     
-    def op_CBREAK(self):
-        
-        _, condition = self.stack.pop()
-
-        if condition == 1:
-            
-            self.pc = self.pc_loop = self.end_loop_pc
-        
-        return self.end_loop_pc
-        
-    def op_CONTINUE(self):
-        self.pc_loop = self.start_loop_pc
-        return self.start_loop_pc
-
-    def op_ENDLOOP(self):
-        self.pc_loop = self.start_loop_pc
-
-    def op_LOOP(self, pc):
-        self.start_loop_pc = pc
-        self.end_loop_pc = self.findEndLoop(pc)
-        self.pc_loop = pc
-        
-        while self.pc_loop < self.end_loop_pc and self.running:
-            
-            self.pc_loop += 1
-            instr = self.program[self.pc_loop]
-            opname = instr[0]
-            args = instr[1:] if len(instr) > 1 else []
-            method = getattr(self, f"op_{opname}", None)
-
-            if opname == 'LOOP' or opname == 'IF':
-                args.append(self.pc_loop)
-                start_loop_pc = self.start_loop_pc
-                end_loop_pc = self.end_loop_pc
-
-                else_pc = self.else_pc
-                endif_pc = self.endif_pc
-
-                self.pc_loop = method(*args)
-
-                self.start_loop_pc = start_loop_pc
-                self.end_loop_pc = end_loop_pc
-
-                self.else_pc = else_pc
-                self.endif_pc = endif_pc
-                continue
-            
-            if method:
-                
-                method(*args)
-            else:
-                raise RuntimeError(f"Error en StackMachine: Instrucción desconocida: {opname}")
+    def op_LOOP(self):
+        pass
 
-            
-        return self.end_loop_pc
+    def op_CBREAK(self, endloop_pc):
+        condition = self.stack.pop()
 
-    def findElseAndEndIf(self, pc):
-        else_pc = None
-        
-        while True:
-            
-            pc += 1
-            a = self.program[pc]
+        if condition == 1:
+            self.pc = endloop_pc                 # Sale después del ENDLOOP
 
-            if a[0] == 'IF':
-                _, pc = self.findElseAndEndIf(pc)
-            elif a[0] == 'ELSE':
-                else_pc = pc
-            elif a[0] == 'ENDIF':
-                return (else_pc, pc)
+    def op_CONTINUE(self, loop_pc):
+        self.pc = loop_pc                        # Vuelve a la condición del ciclo
 
+    def op_ENDLOOP(self, loop_pc):
+        self.pc = loop_pc
 
-    def op_IF(self, pc):
-        _, condition = self.stack.pop()
-        self.else_pc, self.endif_pc = self.findElseAndEndIf(pc)
+    def op_IF(self, else_pc):
+        condition = self.stack.pop()
 
         if condition == 0:
-            self.pc_if = self.else_pc + 1
-        else:
-            self.pc_if = pc + 1
-        
-        while self.pc_if <= self.endif_pc and self.running:
-            instr = self.program[self.pc_if]
-            opname = instr[0]
-            args = instr[1:] if len(instr) > 1 else []
-            method = getattr(self, f"op_{opname}", None)
-
-            if opname == 'LOOP' or opname == 'IF':
-                args.append(self.pc_if)  
-                else_pc = self.else_pc
-                endif_pc = self.endif_pc
-
-                start_loop_pc = self.start_loop_pc
-                end_loop_pc = self.end_loop_pc
-
-                self.pc_if = method(*args)
+            self.pc = else_pc
+
+    # Instrucciones de control que genera el optimizador (peephole.py).
+    # IF_* y WHILE_* comparan los dos valores del tope y saltan si la
+    # comparación no se cumple; en Python la comparación es la misma
+    # para enteros y flotantes, por eso las versiones F reusan las I.
+
+    def op_BREAK(self, endloop_pc):
+        self.pc = endloop_pc
+
+    def op_WHILE(self, endloop_pc):
+        if self.stack.pop() == 0:
+            self.pc = endloop_pc
+
+    def op_WHILE_LTI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a < b:
+            self.pc = endloop_pc
+
+    def op_WHILE_LEI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a <= b:
+            self.pc = endloop_pc
+
+    def op_WHILE_GTI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a > b:
+            self.pc = endloop_pc
+
+    def op_WHILE_GEI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a >= b:
+            self.pc = endloop_pc
+
+    def op_WHILE_EQI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a == b:
+            self.pc = endloop_pc
+
+    def op_WHILE_NEI(self, endloop_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a != b:
+            self.pc = endloop_pc
+
+    def op_IF_LTI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a < b:
+            self.pc = else_pc
+
+    def op_IF_LEI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a <= b:
+            self.pc = else_pc
+
+    def op_IF_GTI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a > b:
+            self.pc = else_pc
+
+    def op_IF_GEI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a >= b:
+            self.pc = else_pc
+
+    def op_IF_EQI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a == b:
+            self.pc = else_pc
+
+    def op_IF_NEI(self, else_pc):
+        b = self.stack.pop()
+        a = self.stack.pop()
+        if not a != b:
+            self.pc = else_pc
+
+    op_WHILE_LTF = op_WHILE_LTI
+    op_WHILE_LEF = op_WHILE_LEI
+    op_WHILE_GTF = op_WHILE_GTI
+    op_WHILE_GEF = op_WHILE_GEI
+    op_WHILE_EQF = op_WHILE_EQI
+    op_WHILE_NEF = op_WHILE_NEI
+    op_IF_LTF = op_IF_LTI
+    op_IF_LEF = op_IF_LEI
+    op_IF_GTF = op_IF_GTI
+    op_IF_GEF = op_IF_GEI
+    op_IF_EQF = op_IF_EQI
+    op_IF_NEF = op_IF_NEI
+
+    def op_ELSE(self, endif_pc):
+        self.pc = endif_pc                       # Fin de la consecuencia, salta el else
+
+    def op_ENDIF(self):
+        pass
 
-                self.else_pc = else_pc
-                self.endif_pc = endif_pc
-
-                self.start_loop_pc = start_loop_pc
-                self.end_loop_pc = end_loop_pc
-
-                continue
-
-        
-            if opname == 'CBREAK' or opname == 'CONTINUE':
-                return method(*args)
-
-            
-            if opname == 'ELSE' or opname == 'ENDIF':
-                self.pc = self.endif_pc
-                break
-
-            if method:
-                method(*args)
-            else:
-                raise RuntimeError(f"Error en StackMachine: Instrucción desconocida: {opname}")
-            
-            self.pc_if += 1
-        return self.endif_pc
-            
     def op_GROW(self):
-        a_type, a = self.stack.pop()
-
-        if a_type == 'I':
-            new_list = [0] * a
-            self.stack.append(('I', len(self.memory)))
-            self.memory = self.memory + new_list
-            
-        else:
-            raise TypeError("Error en StackMachine: GROW requiere un valor entero")
-
-
-    def op_CALL(self, name_func):
-        old_locals_stack = self.locals_stack
-
-        else_pc = self.else_pc
-        endif_pc = self.endif_pc
-        pc_if = self.pc_if
-
-        start_loop_pc = self.start_loop_pc
-        end_loop_pc = self.end_loop_pc
-        pc_loop = self.pc_loop
-        
-
-        old_pc = self.pc
-        old_program = self.program
-        old_runing = self.running
-
-        self.locals_stack = {}
-
-        func = self.functions[name_func]
-        parmnames = func.parmnames
-        parmtypes = func.parmtypes
-        
-        i = len(parmnames)-1
-        while i >= 0:
-            value_type, value = self.stack.pop()
-            
-            if value_type == parmtypes[i]:
-                self.locals_stack[parmnames[i]] = (parmtypes[i], value)
-            else:
-                raise TypeError("Error en StackMachine: CALL requiere que el tipo de parametro y el tipo de argumento sean iguales")
-
-            i -= 1
-
-        for name, value in func.locals.items():
-            type = value
-            self.locals_stack[name] = (type, None)
-        
-
-        self.pc = 0
-
-        self.program = func.code
-
-        
-        self.run()
-        
-        self.else_pc = else_pc
-        self.endif_pc = endif_pc
-        self.pc_if = pc_if
-
-        self.start_loop_pc = start_loop_pc
-        self.end_loop_pc = end_loop_pc
-        self.pc_loop = pc_loop
-
-        self.locals_stack = old_locals_stack
-        
-        self.program = old_program
-        self.pc = old_pc
-        self.running = old_runing
-       
-
-    def op_LOCAL_SET(self, var):
-        
-        _ , a = self.stack.pop()
-        type = self.locals_stack[var][0]
-        value = (type, a)
-        self.locals_stack[var] = value
-
-    def op_LOCAL_GET(self, var):
-        
-        value = self.locals_stack[var]
-        self.stack.append((value[0], value[1]))
+        a = self.stack.pop()
+        self.stack.append(self.memsize)
+        self.memsize += a
+
+        # Crecimiento geométrico: la memoria se duplica cuando se llena, así
+        # que una serie de ^n cuesta tiempo lineal en total
+        capacity = len(self.memory) // CELL_SIZE
+        if self.memsize > capacity:
+            self._resize(max(2 * capacity, self.memsize))
+
+    # --- Memoria
+
+    def _map_memory(self):
+        # Vistas tipadas sobre self.memory: cada celda es un int64 o un double.
+        # POKEI de un entero que no cabe en 64 bits es un error de ejecución;
+        # POKEB guarda solo el byte bajo (value & 0xFF), así que PEEKB
+        # devuelve 0..255 (POKEB de -1 se lee como 255).
+        self._ints = memoryview(self.memory).cast('q')
+        self._floats = memoryview(self.memory).cast('d')
+
+    def _resize(self, cells):
+        # Se copia a un buffer nuevo para no invalidar vistas que tenga el
+        # programa anfitrión (un bytearray con vistas no puede crecer)
+        memory = bytearray(cells * CELL_SIZE)
+        used = min(len(self.memory), len(memory))
+        memory[:used] = self.memory[:used]
+        self._ints.release()
+        self._floats.release()
+        self.memory = memory
+        self._map_memory()
+
+    def heap(self, fmt='q'):
+        '''
+        Devuelve, sin copiar, una vista de las celdas de memoria en uso.
+        fmt indica cómo leer cada celda: 'q' enteros, 'd' flotantes o
+        'B' los bytes crudos (PEEKB/POKEB usan el primer byte de la
+        celda). La vista sigue apuntando al buffer anterior si el
+        programa vuelve a crecer la memoria con ^.
+        '''
+        return memoryview(self.memory)[:self.memsize * CELL_SIZE].cast(fmt)
+
+
+    def op_CALL(self, code, nparams, nslots):
+        if len(self.call_stack) >= self.max_depth:
+            raise RuntimeError(f"Error en StackMachine: Se superó el máximo de {self.max_depth} llamadas anidadas")
+
+        self.call_stack.append((self.program, self.pc, self.frame))
+
+        # Los argumentos pasan de la pila a los primeros slots del marco
+        self.frame = [None] * nslots
+        if nparams:
+            self.frame[:nparams] = self.stack[-nparams:]
+            del self.stack[-nparams:]
+
+        self.program = code
+        self.pc = -1                             # El ciclo avanza a la instrucción 0
+
+    # Llamadas memoizadas. Un CALL a una función pura busca primero los
+    # argumentos en su Memo. Si no están, llama como CALL y anota en
+    # memo_pending la profundidad de self.call_stack; el RET que vuelve
+    # de esa profundidad (el de la función o, si terminó con TAILCALL, el
+    # de la última función de la cadena) guarda el resultado. Una función
+    # pura solo llega con TAILCALL a otras puras, así que basta con que
+    # todas las puras (memoizadas o no, p. ej. con parámetros float) usen
+    # RET_MEMO en lugar de RET: ningún marco termina sin sacar su entrada.
+
+    def op_CALL_MEMO(self, code, nparams, nslots, memo):
+        key = tuple(self.stack[-nparams:]) if nparams else ()
+        entries = memo.entries
+        if key in entries:
+            memo.hits += 1
+            entries.move_to_end(key)
+            if nparams:
+                del self.stack[-nparams:]
+            self.stack.append(entries[key])
+            return
+        memo.misses += 1
+        self.op_CALL(code, nparams, nslots)
+        self.memo_pending.append((len(self.call_stack), memo, key))
+
+    def op_RET_MEMO(self):
+        pending = self.memo_pending
+        if pending and pending[-1][0] == len(self.call_stack):
+            _, memo, key = pending.pop()
+            memo.store(key, self.stack[-1])
+        self.op_RET()
+
+    def memo_stats(self):
+        '''
+        Devuelve {función: (aciertos, fallos, resultados guardados)} de
+        las funciones memoizadas.
+        '''
+        return {name: (memo.hits, memo.misses, len(memo.entries)) for name, memo in self.memos.items()}
+
+    def op_TAILCALL(self, code, nparams, nslots):
+        # 'return f(...)': no se guarda punto de retorno, el RET de la
+        # función llamada vuelve directamente al llamador de esta. Así
+        # una cadena de llamadas en posición de cola no hace crecer
+        # self.call_stack.
+        frame = [None] * nslots
+        if nparams:
+            frame[:nparams] = self.stack[-nparams:]
+            del self.stack[-nparams:]
+        self.frame = frame
+
+        self.program = code
+        self.pc = -1
+
+    def op_LOCAL_SET(self, slot):
+        self.frame[slot] = self.stack.pop()
+
+    def op_LOCAL_GET(self, slot):
+        self.stack.append(self.frame[slot])
 
 
 # program = [
@@ -0,0 +1,83 @@
+'''
+Benchmark de la máquina de pila
+===============================
+Compila cada programa una sola vez y mide por separado el tiempo de
+carga (load_ir) y de ejecución (run) de la máquina de pila. La salida
+del programa se captura en memoria (output='capture') para que no
+se mida la terminal.
+
+    python Maquina_de_pila/benchmark.py [-n repeticiones] [-O] [--memo] [programa.gox ...]
+
+Con -O el código pasa antes por el optimizador (Codigo_Intermedio/optimizer.py).
+La memoización de funciones puras está apagada salvo con --memo: con
+ella fib_rec.gox ya no mide el costo de las llamadas.
+'''
+import argparse
+import copy
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Parser.parser import Parser
+from Checker.check import Checker
+from Codigo_Intermedio.IR import IRCode
+from Codigo_Intermedio.optimizer import optimize
+from Maquina_de_pila.StackMachine import StackMachine
+
+PROGRAMS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "programas_de_pruebas"))
+
+# mandel.gox no pasa el Checker (usa 'return' a nivel global), por eso
+# se usa mandel_loop.gox, que tiene el mismo 'if' dentro del ciclo caliente.
+# fib_rec.gox mide el costo de las llamadas a función.
+DEFAULT_PROGRAMS = ['mandel_loop.gox', 'criba.gox', 'fib_rec.gox']
+
+
+def compile_program(path, optimized=False):
+    ast = Parser(path).parse()
+    Checker.check(ast)
+    module = IRCode.gencode(ast)
+    if optimized:
+        optimize(module)
+    return module
+
+
+def bench(path, repeat, optimized=False, memoize=False):
+    module = compile_program(path, optimized)
+    load_times = []
+    run_times = []
+
+    for _ in range(repeat):
+        # Cada repetición carga su propia copia del módulo
+        mod = copy.deepcopy(module)
+        vm = StackMachine(output='capture', memoize=memoize)
+
+        start = time.perf_counter()
+        vm.load_ir(mod)
+        load_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        vm.run()
+        run_times.append(time.perf_counter() - start)
+
+    return min(load_times), min(run_times)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmark de StackMachine')
+    ap.add_argument('programs', nargs='*', help='Programas .gox a medir')
+    ap.add_argument('-n', '--repeat', type=int, default=3, help='Repeticiones por programa (se reporta la mejor)')
+    ap.add_argument('-O', dest='optimize', action='store_true', help='Optimiza el código intermedio antes de medir')
+    ap.add_argument('--memo', action='store_true', help='Guarda los resultados de las funciones puras')
+    args = ap.parse_args(argv)
+
+    programs = args.programs or [os.path.join(PROGRAMS_DIR, name) for name in DEFAULT_PROGRAMS]
+
+    print(f"{'programa':<20} {'load_ir (ms)':>14} {'run (ms)':>12}")
+    for path in programs:
+        load, run = bench(path, args.repeat, args.optimize, args.memo)
+        print(f"{os.path.basename(path):<20} {load * 1000:>14.3f} {run * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
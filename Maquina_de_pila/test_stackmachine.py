@@ -0,0 +1,274 @@
+import unittest
+import contextlib
+import io
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Maquina_de_pila.StackMachine import StackMachine
+from Maquina_de_pila.verifier import VerifyError
+from Codigo_Intermedio.IR import IRModule, IRFunction
+
+def run_program(program): # Runs a loose program and returns what it printed
+	vm = StackMachine(output='capture')
+	vm.load_program(program)
+	vm.run()
+	return vm.getvalue().decode()
+
+def countdown_module(depth): # down(n) = n == 0 ? 0 : down(n - 1) + 1, called with depth
+	module = IRModule()
+	main = IRFunction(module, 'main', [], [], 'I')
+	main.extend([('CONSTI', depth), ('CALL', 'down'), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+	down = IRFunction(module, 'down', ['n'], ['I'], 'I')
+	down.extend([
+		('LOCAL_GET', 'n'),
+		('CONSTI', 0),
+		('EQI',),
+		('IF',),
+		('CONSTI', 0),
+		('RET',),
+		('ELSE',),
+		('ENDIF',),
+		('LOCAL_GET', 'n'),
+		('CONSTI', 1),
+		('SUBI',),
+		('CALL', 'down'),
+		('CONSTI', 1),
+		('ADDI',),
+		('RET',),
+	])
+	return module
+
+class TestStackMachine(unittest.TestCase):
+	def test_arithmetic(self): # Test integer and float arithmetic
+		program = [
+			('CONSTI', 10),
+			('CONSTI', 20),
+			('ADDI',),
+			('PRINTI',),
+			('CONSTF', 1.5),
+			('CONSTI', 2),
+			('ITOF',),
+			('MULF',),
+			('PRINTF',),
+			('CONSTI', 0),
+			('RET',),
+		]
+
+		self.assertEqual(run_program(program), '303.0')
+
+	def test_nested_blocks(self): # Test an if/else nested inside a loop with break and continue
+		program = [
+			('CONSTI', 0),
+			('GLOBAL_SET', 'i'),
+			('LOOP',),
+			('GLOBAL_GET', 'i'),
+			('CONSTI', 1),
+			('ADDI',),
+			('GLOBAL_SET', 'i'),
+			('GLOBAL_GET', 'i'),
+			('CONSTI', 5),
+			('GTI',),
+			('CBREAK',),
+			('GLOBAL_GET', 'i'),
+			('CONSTI', 2),
+			('EQI',),
+			('IF',),
+			('CONTINUE',),
+			('ELSE',),
+			('GLOBAL_GET', 'i'),
+			('PRINTI',),
+			('ENDIF',),
+			('ENDLOOP',),
+			('CONSTI', 0),
+			('RET',),
+		]
+		vm = StackMachine(output='capture')
+		vm.global_types['i'] = 'I'
+		vm.load_program(program)
+		vm.run()
+
+		self.assertEqual(vm.getvalue(), b'1345')
+
+	def test_unknown_opcode(self): # Unknown opcodes are rejected when loading
+		with self.assertRaises(RuntimeError):
+			StackMachine().load_program([('FOO',), ('CONSTI', 0), ('RET',)])
+
+	def test_unbalanced_blocks(self): # A LOOP without ENDLOOP is rejected when loading
+		with self.assertRaises(RuntimeError):
+			StackMachine().load_program([('LOOP',), ('CONSTI', 0), ('RET',)])
+
+	def test_verifier_type_mismatch(self): # ADDI over a float is rejected when loading
+		with self.assertRaises(VerifyError):
+			StackMachine().load_program([('CONSTI', 1), ('CONSTF', 2.0), ('ADDI',), ('RET',)])
+
+	def test_verifier_stack_underflow(self): # Popping an empty stack is rejected when loading
+		with self.assertRaises(VerifyError):
+			StackMachine().load_program([('PRINTI',), ('CONSTI', 0), ('RET',)])
+
+	def test_verifier_unbalanced_loop(self): # A loop body that grows the stack is rejected when loading
+		program = [
+			('LOOP',),
+			('CONSTI', 1),
+			('CONSTI', 0),
+			('CBREAK',),
+			('ENDLOOP',),
+			('CONSTI', 0),
+			('RET',),
+		]
+		with self.assertRaises(VerifyError):
+			StackMachine().load_program(program)
+
+	def test_deep_recursion(self): # Guest recursion is not bounded by the Python stack
+		vm = StackMachine(output='capture')
+		vm.load_ir(countdown_module(sys.getrecursionlimit() * 10))
+		vm.run()
+
+		self.assertEqual(vm.getvalue().decode(), str(sys.getrecursionlimit() * 10))
+		self.assertEqual(vm.call_stack, [])
+
+	def test_max_depth(self): # The frame cap stops runaway recursion
+		vm = StackMachine(max_depth=100)
+		vm.load_ir(countdown_module(1000))
+		with self.assertRaises(RuntimeError):
+			vm.run()
+
+	def test_memoize(self): # Pure functions are memoized with a bounded cache, impure ones and the opt-out are not
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 20), ('CALL', 'fib'), ('PRINTI',),
+			('CONSTI', 1), ('CALL', 'show'), ('CONSTI', 1), ('CALL', 'show'), ('ADDI',), ('PRINTI',),
+			('CONSTI', 0), ('RET',),
+		])
+		fib = IRFunction(module, 'fib', ['n'], ['I'], 'I')
+		fib.extend([
+			('LOCAL_GET', 'n'), ('CONSTI', 2), ('LTI',), ('IF',), ('LOCAL_GET', 'n'), ('RET',), ('ELSE',), ('ENDIF',),
+			('LOCAL_GET', 'n'), ('CONSTI', 1), ('SUBI',), ('CALL', 'fib'),
+			('LOCAL_GET', 'n'), ('CONSTI', 2), ('SUBI',), ('CALL', 'fib'), ('ADDI',), ('RET',),
+		])
+		show = IRFunction(module, 'show', ['n'], ['I'], 'I')
+		show.extend([('LOCAL_GET', 'n'), ('PRINTI',), ('LOCAL_GET', 'n'), ('RET',)])
+
+		outputs = []
+		for memoize in (True, False):
+			vm = StackMachine(output='capture', memoize=memoize, memo_size=10)
+			vm.load_ir(module)
+			vm.run()
+			outputs.append(vm.getvalue())
+			if memoize:
+				self.assertEqual(list(vm.memo_stats()), ['fib'])
+				hits, misses, size = vm.memo_stats()['fib']
+				self.assertEqual((hits, misses, size), (18, 21, 10))
+			else:
+				self.assertEqual(vm.memo_stats(), {})
+		self.assertEqual(outputs[0], outputs[1])
+		self.assertEqual(outputs[0], b'6765112')
+
+	def test_memoize_tailcall(self): # A memoized call ending in a non-memoized tail callee leaves no stale entry behind
+		module = IRModule()
+		main = IRFunction(module, 'main', [], [], 'I')
+		main.extend([
+			('CONSTI', 1), ('CALL', 'f'), ('PRINTF',),
+			('CONSTI', 1), ('CALL', 'k'), ('PRINTF',),
+			('CONSTI', 1), ('CALL', 'f'), ('PRINTF',),
+			('CONSTI', 0), ('RET',),
+		])
+		f = IRFunction(module, 'f', ['n'], ['I'], 'F')
+		f.extend([('LOCAL_GET', 'n'), ('ITOF',), ('TAILCALL', 'g')])
+		g = IRFunction(module, 'g', ['x'], ['F'], 'F')
+		g.extend([('LOCAL_GET', 'x'), ('CONSTF', 2.0), ('MULF',), ('RET',)])
+		k = IRFunction(module, 'k', ['n'], ['I'], 'F')
+		k.extend([('LOCAL_GET', 'n'), ('PRINTI',), ('LOCAL_GET', 'n'), ('TAILCALL', 'h')])
+		h = IRFunction(module, 'h', ['n'], ['I'], 'F')
+		h.extend([('LOCAL_GET', 'n'), ('ITOF',), ('CONSTF', 100.0), ('ADDF',), ('RET',)])
+
+		vm = StackMachine(output='capture')
+		vm.load_ir(module)
+		vm.run()
+		self.assertEqual(vm.getvalue(), b'2.01101.02.0')
+		self.assertEqual(vm.memo_stats()['f'], (1, 1, 1))
+
+	def test_memory_grow_and_heap(self): # GROW keeps old contents and the heap is readable without copying
+		program = [
+			('CONSTI', 10),
+			('GROW',),
+			('GLOBAL_SET', 'base'),
+			('GLOBAL_GET', 'base'),
+			('CONSTI', 1234),
+			('POKEI',),
+			('CONSTI', 5000),
+			('GROW',),
+			('POP',),
+			('GLOBAL_GET', 'base'),
+			('CONSTI', 1),
+			('ADDI',),
+			('CONSTF', 2.5),
+			('POKEF',),
+			('CONSTI', 0),
+			('RET',),
+		]
+		vm = StackMachine()
+		vm.global_types['base'] = 'I'
+		vm.load_program(program)
+		vm.run()
+
+		base = vm.globals[vm.global_slots['base']]
+		self.assertEqual(base, 1024)
+		self.assertEqual(vm.memsize, 1024 + 10 + 5000)
+		self.assertEqual(vm.heap('q')[base], 1234)
+		self.assertEqual(vm.heap('d')[base + 1], 2.5)
+		self.assertEqual(len(vm.heap('q')), vm.memsize)
+
+	def test_memory_out_of_range(self): # Reading past the used memory fails
+		with self.assertRaises(TypeError):
+			run_program([('CONSTI', 1024), ('PEEKI',), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+
+	def test_memory_store_ranges(self): # POKEB keeps the low byte and POKEI rejects values beyond int64
+		vm = StackMachine()
+		vm.load_program([('CONSTI', 0), ('CONSTI', -1), ('POKEB',), ('CONSTI', 1), ('CONSTI', 300), ('POKEB',), ('CONSTI', 0), ('RET',)])
+		vm.run()
+		self.assertEqual(list(vm.heap('B')[:9:8]), [255, 44])
+
+		with self.assertRaises(RuntimeError):
+			run_program([('CONSTI', 0), ('CONSTI', 2 ** 63), ('POKEI',), ('CONSTI', 0), ('RET',)])
+
+	def test_output_sinks(self): # Output goes to stdout, a file object or a file descriptor
+		program = [('CONSTI', 72), ('PRINTB',), ('CONSTI', 1), ('PRINTB',), ('CONSTF', 0.5), ('PRINTF',), ('CONSTI', 0), ('RET',)]
+
+		out = io.StringIO()
+		with contextlib.redirect_stdout(out):
+			vm = StackMachine()
+			vm.load_program(program)
+			vm.run()
+		self.assertEqual(out.getvalue(), 'Htrue0.5')
+
+		out = io.BytesIO()
+		vm = StackMachine(output=out)
+		vm.load_program(program)
+		vm.run()
+		self.assertEqual(out.getvalue(), b'Htrue0.5')
+
+		read_fd, write_fd = os.pipe()
+		vm = StackMachine(output=write_fd)
+		vm.load_program(program)
+		vm.run()
+		os.close(write_fd)
+		self.assertEqual(os.read(read_fd, 100), b'Htrue0.5')
+		os.close(read_fd)
+
+	def test_output_threshold(self): # Output is written in chunks once the buffer reaches the threshold
+		class Chunks(list):
+			def write(self, text):
+				self.append(text)
+
+		out = Chunks()
+		vm = StackMachine(output=out, flush_threshold=2)
+		vm.load_program([('CONSTI', 7), ('PRINTI',), ('CONSTI', 8), ('PRINTI',), ('CONSTI', 9), ('PRINTI',), ('CONSTI', 0), ('RET',)])
+		vm.run()
+
+		self.assertEqual(out, ['78', '9'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,191 @@
+'''
+Verificador de código IR
+========================
+Antes de ejecutar, cada función se recorre una sola vez simulando la
+pila con los tipos 'I' y 'F' en lugar de los valores. El verificador
+comprueba que:
+
+1. Cada instrucción encuentra en la pila los operandos del tipo que
+   espera (p. ej., ADDF necesita dos 'F').
+2. Todos los caminos que llegan a una misma instrucción lo hacen con
+   la misma pila (misma profundidad y mismos tipos), en particular al
+   volver al inicio de un ciclo.
+3. Las variables, funciones y el valor de retorno coinciden con los
+   tipos declarados.
+4. Una función distinta de main no termina sin ejecutar RET.
+
+Como el código verificado ya no puede mezclar tipos, la máquina de pila
+trabaja con valores sin etiqueta y no revisa tipos en cada operación.
+
+Trabaja sobre el código codificado (opcodes.encode): los destinos de
+salto ya vienen como operando de cada instrucción.
+'''
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Codigo_Intermedio.opcodes import NAMES
+
+class VerifyError(Exception):
+    '''
+    Se genera cuando el código IR de una función no pasa la verificación.
+    '''
+    def __init__(self, func, pc, message):
+        super().__init__(f"Error en el verificador: función '{func}', instrucción {pc}: {message}")
+
+
+# Efecto sobre la pila de las instrucciones que no dependen de
+# sus operandos: opname -> (tipos que saca, tipos que deja)
+_effects = {
+    'CONSTI': ((), ('I',)),
+    'CONSTF': ((), ('F',)),
+
+    'ADDI': (('I', 'I'), ('I',)),
+    'SUBI': (('I', 'I'), ('I',)),
+    'MULI': (('I', 'I'), ('I',)),
+    'DIVI': (('I', 'I'), ('I',)),
+    'LTI':  (('I', 'I'), ('I',)),
+    'LEI':  (('I', 'I'), ('I',)),
+    'GTI':  (('I', 'I'), ('I',)),
+    'GEI':  (('I', 'I'), ('I',)),
+    'EQI':  (('I', 'I'), ('I',)),
+    'NEI':  (('I', 'I'), ('I',)),
+
+    'ADDF': (('F', 'F'), ('F',)),
+    'SUBF': (('F', 'F'), ('F',)),
+    'MULF': (('F', 'F'), ('F',)),
+    'DIVF': (('F', 'F'), ('F',)),
+    'LTF':  (('F', 'F'), ('I',)),
+    'LEF':  (('F', 'F'), ('I',)),
+    'GTF':  (('F', 'F'), ('I',)),
+    'GEF':  (('F', 'F'), ('I',)),
+    'EQF':  (('F', 'F'), ('I',)),
+    'NEF':  (('F', 'F'), ('I',)),
+
+    'ITOF': (('I',), ('F',)),
+    'FTOI': (('F',), ('I',)),
+    'NEGI': (('I',), ('I',)),
+    'NEGF': (('F',), ('F',)),
+
+    'PEEKI': (('I',), ('I',)),
+    'PEEKF': (('I',), ('F',)),
+    'PEEKB': (('I',), ('I',)),
+    'POKEI': (('I', 'I'), ()),
+    'POKEF': (('I', 'F'), ()),
+    'POKEB': (('I', 'I'), ()),
+    'GROW':  (('I',), ('I',)),
+
+    'PRINTI': (('I',), ()),
+    'PRINTF': (('F',), ()),
+    'PRINTB': (('I',), ()),
+
+    'LOOP':  ((), ()),
+    'ENDIF': ((), ()),
+}
+
+# Saltos condicionales: opname -> tipos que saca. Siguen en pc + 1 o
+# después de su destino (ELSE/ENDIF o ENDLOOP).
+_branches = {'IF': ('I',), 'CBREAK': ('I',), 'WHILE': ('I',)}
+for _compare in ('LT', 'LE', 'GT', 'GE', 'EQ', 'NE'):
+    for _type in ('I', 'F'):
+        _branches[f'IF_{_compare}{_type}'] = (_type, _type)
+        _branches[f'WHILE_{_compare}{_type}'] = (_type, _type)
+
+
+def verify(words, pool, name, rettype, variables, globals, functions):
+    '''
+    Verifica el código de una función.
+
+    words     : código codificado, array('i') de pares (opcode, operando)
+    pool      : constantes y nombres a los que apuntan los operandos
+    name      : nombre de la función (para los mensajes de error)
+    rettype   : tipo que debe quedar en la pila al ejecutar RET
+    variables : dict nombre -> tipo de los parámetros y variables locales
+    globals   : dict nombre -> tipo de las variables globales
+    functions : dict nombre -> (tipos de los parámetros, tipo de retorno)
+
+    Devuelve la profundidad máxima que alcanza la pila.
+    '''
+    values = pool.values
+    size = len(words) // 2
+    states = [None] * size                  # Pila (tupla de tipos) al llegar a cada pc
+    max_depth = 0
+
+    def flow(pc, source, stack):
+        if pc == size:
+            if name != 'main':
+                raise VerifyError(name, source, "la función puede terminar sin RET")
+            return
+        state = tuple(stack)
+        if states[pc] is None:
+            states[pc] = state
+            work.append(pc)
+        elif states[pc] != state:
+            raise VerifyError(name, pc, f"la pila llega con tipos distintos: {list(states[pc])} != {list(state)}")
+
+    def pop(pc, stack, expected):
+        if not stack:
+            raise VerifyError(name, pc, f"{NAMES[words[2 * pc]]} necesita un valor '{expected}' y la pila está vacía")
+        actual = stack.pop()
+        if expected is not None and actual != expected:
+            raise VerifyError(name, pc, f"{NAMES[words[2 * pc]]} necesita un valor '{expected}' y encontró '{actual}'")
+
+    def lookup(pc, table, var, kind):
+        if var not in table:
+            raise VerifyError(name, pc, f"{kind} '{var}' no existe")
+        return table[var]
+
+    work = []
+    flow(0, 0, [])
+
+    while work:
+        pc = work.pop()
+        stack = list(states[pc])
+        opname = NAMES[words[2 * pc]]
+        operand = words[2 * pc + 1]
+        successors = [pc + 1]
+
+        if opname in _effects:
+            pops, pushes = _effects[opname]
+            for expected in reversed(pops):
+                pop(pc, stack, expected)
+            stack.extend(pushes)
+        elif opname == 'POP':
+            pop(pc, stack, None)
+        elif opname == 'GLOBAL_GET':
+            stack.append(lookup(pc, globals, values[operand], 'La variable global'))
+        elif opname == 'GLOBAL_SET':
+            pop(pc, stack, lookup(pc, globals, values[operand], 'La variable global'))
+        elif opname == 'LOCAL_GET':
+            stack.append(lookup(pc, variables, values[operand], 'La variable local'))
+        elif opname == 'LOCAL_SET':
+            pop(pc, stack, lookup(pc, variables, values[operand], 'La variable local'))
+        elif opname == 'CALL':
+            parmtypes, ret = lookup(pc, functions, values[operand], 'La función')
+            for expected in reversed(parmtypes):
+                pop(pc, stack, expected)
+            stack.append(ret)
+        elif opname == 'RET':
+            pop(pc, stack, rettype)
+            successors = []
+        elif opname == 'TAILCALL':
+            parmtypes, ret = lookup(pc, functions, values[operand], 'La función')
+            for expected in reversed(parmtypes):
+                pop(pc, stack, expected)
+            if ret != rettype:
+                raise VerifyError(name, pc, f"TAILCALL devuelve '{ret}' y la función devuelve '{rettype}'")
+            successors = []
+        elif opname in _branches:
+            for expected in reversed(_branches[opname]):
+                pop(pc, stack, expected)
+            successors.append(operand + 1)
+        elif opname == 'CONTINUE' or opname == 'ENDLOOP' or opname == 'ELSE' or opname == 'BREAK':
+            successors = [operand + 1]
+        else:
+            raise VerifyError(name, pc, f"instrucción desconocida {opname}")
+
+        max_depth = max(max_depth, len(stack))
+        for succ in successors:
+            flow(succ, pc, stack)
+
+    return max_depth
@@ -0,0 +1,137 @@
+'''
+Benchmark del parser
+====================
+Genera un programa grande, lo guarda en un archivo temporal y mide el
+tiempo de Parser(archivo).parse() en sentencias por segundo. Hay dos
+cargas de trabajo:
+
+- expr: asignaciones con expresiones largas (operadores de todas las
+  precedencias, paréntesis, operadores unarios y llamadas).
+- stmt: muchas declaraciones cortas de todos los tipos (var, const,
+  asignaciones, print, if/else, while con break/continue, funciones,
+  return y llamadas usadas como declaración).
+
+    python Parser/benchmark.py [--workload expr|stmt] [--lines N] [-n repeticiones]
+'''
+import argparse
+import random
+import tempfile
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Parser.parser import Parser
+
+BINARY_OPS = ['||', '&&', '==', '!=', '<', '<=', '>', '>=', '+', '-', '*', '/']
+
+
+def generate_expression(rng, depth):
+    # Expresión aleatoria con 'depth' niveles de anidamiento como máximo
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(['x', 'y', 'total', '42', '7', '3.5', "'a'", 'true'])
+
+    kind = rng.random()
+    if kind < 0.6:
+        # Cadena de operadores sin paréntesis
+        terms = [generate_expression(rng, depth - 1) for _ in range(rng.randint(2, 6))]
+        expr = terms[0]
+        for term in terms[1:]:
+            expr = f'{expr} {rng.choice(BINARY_OPS)} {term}'
+        return expr
+    elif kind < 0.75:
+        return f'({generate_expression(rng, depth - 1)})'
+    elif kind < 0.85:
+        return f'-{generate_expression(rng, 0)}'
+    else:
+        return f'f({generate_expression(rng, depth - 1)}, {generate_expression(rng, depth - 1)})'
+
+
+def generate_expressions(lines, seed=0):
+    rng = random.Random(seed)
+    statements = []
+    for _ in range(lines):
+        terms = [generate_expression(rng, 3) for _ in range(3)]
+        statements.append(f'x = {terms[0]} {rng.choice(BINARY_OPS)} {terms[1]} {rng.choice(BINARY_OPS)} {terms[2]};\n')
+    return ''.join(statements)
+
+
+def generate_statements(lines, seed=0):
+    # Bloques de declaraciones cortas; cada bloque es una función de 20 líneas
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(max(1, lines // 20)):
+        a, b = rng.randint(0, 99), rng.randint(1, 9)
+        blocks.append(
+            f'const k{i} = {a};\n'
+            f'var v{i} int = k{i} * {b};\n'
+            f'func g{i}(n int, m float) int {{\n'
+            f'    var t int = n;\n'
+            f'    while t > 0 {{\n'
+            f'        t = t - {b};\n'
+            f'        if t == {a} {{\n'
+            f'            break;\n'
+            f'        }} else {{\n'
+            f'            continue;\n'
+            f'        }}\n'
+            f'    }}\n'
+            f'    `(t + 1) = t;\n'
+            f'    print t;\n'
+            f'    return t + n;\n'
+            f'}}\n'
+            f'v{i} = g{i}(v{i}, 1.5);\n'
+            f'g{i}(k{i}, 2.0);\n'
+            f'print v{i};\n'
+            f'print k{i} + v{i};\n'
+        )
+    return ''.join(blocks)
+
+
+WORKLOADS = {
+    'expr': generate_expressions,
+    'stmt': generate_statements,
+}
+
+
+def count_statements(stmts):
+    # Cuenta las declaraciones, incluidas las que están dentro de bloques
+    total = 0
+    for stmt in stmts:
+        total += 1
+        for block in ('statements', 'consequence', 'alternative', 'body'):
+            total += count_statements(getattr(stmt, block, None) or [])
+    return total
+
+
+def bench(path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        program = Parser(path).parse()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count_statements(program.stmts)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Benchmark del parser')
+    ap.add_argument('--workload', choices=WORKLOADS, default='expr', help='Tipo de código generado')
+    ap.add_argument('--lines', type=int, default=20000, help='Número de sentencias generadas')
+    ap.add_argument('-n', '--repeat', type=int, default=3, help='Repeticiones (se reporta la mejor)')
+    args = ap.parse_args(argv)
+
+    source = WORKLOADS[args.workload](args.lines)
+    with tempfile.NamedTemporaryFile('w', suffix='.gox', delete=False) as file:
+        file.write(source)
+    try:
+        elapsed, statements = bench(file.name, args.repeat)
+    finally:
+        os.remove(file.name)
+
+    mb = len(source) / (1024 * 1024)
+    print(f"{statements} sentencias, {mb:.1f} MB")
+    print(f"{elapsed:.2f} s  {statements / elapsed:,.0f} sentencias/s  {mb / elapsed:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
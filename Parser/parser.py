@@ -6,11 +6,24 @@ import os
 from rich import print
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from Analizador_lexico.analizador_lexico import Token, Tokenize
+from Analizador_lexico.analizador_lexico import Token, Tokenize, TokenStream
 from Parser.model import *
 
 
 
+# Precedencia de los operadores binarios por tipo de token, de menor a
+# mayor. Todos los operadores binarios son asociativos por la izquierda.
+BINARY_PRECEDENCE = {
+	'OR': 1,
+	'AND': 2,
+	'EQ': 3, 'NE': 3, 'LT': 3, 'LE': 3, 'GT': 3, 'GE': 3,
+	'PLUS': 4, 'MINUS': 4,
+	'TIMES': 5, 'DIVIDE': 5,
+}
+
+PRIMITIVE_TYPES = { 'INT', 'FLOAT', 'CHAR', 'BOOL' } # Literales o conversión de tipo: int(...)
+UNARY_OPERATORS = { 'PLUS', 'MINUS', 'GROW' }
+
 # -------------------------------
 # Implementación del Parser
 # -------------------------------
@@ -20,70 +33,92 @@ class Parser:
 	# 	self.current = 0
 
 	def __init__(self, name: str):
-		tokenize = Tokenize()
-
-		tokens = tokenize.main(name)
-		self.tokens = tokens
-		self.current = 0
+		# El archivo se tokeniza a medida que el parser pide tokens, sin cargar en
+		# memoria el código fuente ni la lista de tokens. Los tokens llegan en columnas
+		# (TokenTable) y el texto solo se extrae cuando el parser lo necesita
+		self.tokenize = Tokenize()
+		self.file = open(name)
+		self.tokens = TokenStream(self.tokenize.tables(self.file))
 		self.typenames = { 'int', 'float', 'char', 'bool' }
 
+		# Regla de cada declaración según el tipo de su primer token. La regla se
+		# llama con ese token ya consumido (disponible con self.prev_*())
+		self.rules = {
+			"ID": self.assignment,
+			"DEREF": self.assignment,
+			"VAR": self.vardecl,
+			"CONST": self.vardecl,
+			"FUNC": self.funcdecl,
+			"IMPORT": self.funcdecl,
+			"IF": self.if_stmt,
+			"WHILE": self.while_stmt,
+			"BREAK": self.break_stmt,
+			"CONTINUE": self.continue_stmt,
+			"RETURN": self.return_stmt,
+			"PRINT": self.print_stmt,
+		}
+
 	def parse(self) -> Program:
 		try:
 			statements = []
-			while self.peek() and self.peek().type != "EOF":
+			while self.peek_type() is not None:
 				statements.append(self.statement())
 		except Exception as e:
+			# Los errores léxicos tienen prioridad: se lee el resto del archivo para reportarlos todos
+			self.tokens.drain()
+			self.lexer_errors()
 			print("Ocurrió un error en el Parse:", e)
 			sys.exit(1)
+		finally:
+			self.file.close()
 
+		self.lexer_errors()
 		return Program(stmts = statements)
 
+	def lexer_errors(self):
+		if self.tokenize.errors:
+			raise Tokenize.LexerError(self.tokenize.errors) from None
+
 	# -------------------------------
 	# Análisis de declaraciones
 	# -------------------------------
 	def statement(self) -> Statement:
-		if self.match("ID"): #DEREF: '`'
-			if self.tokens[self.current].type == "ASSIGN":
-				return self.assignment()
-			else:
-				self.current -= 1
-				expr = self.expression()
-				self.consume("SEMI", "Se esperaba un punto y coma ';'")
-				return expr
-		elif self.match("DEREF"):
-			return self.assignment()
-		elif self.match("VAR") or self.match("CONST"):
-			return self.vardecl()
-		elif self.match("FUNC") or self.match("IMPORT"):
-			return self.funcdecl()
-		elif self.match("IF"):
-			return self.if_stmt()
-		elif self.match("WHILE"):
-			return self.while_stmt()
-		elif self.match("BREAK"):
-			lineno = self.previous().lineno
-			self.consume("SEMI", "Se esperaba un signo de punto y coma ';'") #Verificar si se debe consumir un punto y coma
-			return BreakStmt(lineno = lineno)
-		elif self.match("CONTINUE"):
-			lineno = self.previous().lineno
-			self.consume("SEMI", "Se esperaba un signo de punto y coma ';'") #Verificar si se debe consumir un punto y coma
-			return ContinueStmt(lineno = lineno)
-		elif self.match("RETURN"):
-			return self.return_stmt()
-		elif self.match("PRINT"):
-			return self.print_stmt()
-		else:
-			print(self.tokens[self.current])
-			raise SyntaxError(f"Línea {self.peek().lineno}: Declaración inesperada \n")
-			
+		# Un solo token decide la regla: el tipo del token actual se busca en
+		# self.rules y, para un ID, el siguiente token separa la asignación
+		# (x = ...) de una expresión usada como declaración (f(x);)
+		token_type = self.peek_type()
+		rule = self.rules.get(token_type)
+		if rule is None:
+			print(self.peek())
+			raise SyntaxError(f"Línea {self.peek_lineno()}: Declaración inesperada \n")
+		if token_type == "ID" and not self.check("ASSIGN", 1):
+			return self.expression_stmt()
+		self.advance()
+		return rule()
+
+	def expression_stmt(self) -> Expression:
+		expr = self.expression()
+		self.consume("SEMI", "Se esperaba un punto y coma ';'")
+		return expr
+
+	def break_stmt(self) -> BreakStmt:
+		lineno = self.prev_lineno()
+		self.consume("SEMI", "Se esperaba un signo de punto y coma ';'") #Verificar si se debe consumir un punto y coma
+		return BreakStmt(lineno = lineno)
+
+	def continue_stmt(self) -> ContinueStmt:
+		lineno = self.prev_lineno()
+		self.consume("SEMI", "Se esperaba un signo de punto y coma ';'") #Verificar si se debe consumir un punto y coma
+		return ContinueStmt(lineno = lineno)
+
 	def assignment(self) -> Assignment:
 		location = None
-		lineno = self.previous().lineno
+		lineno = self.prev_lineno()
 
-		if self.previous().type == "ID":
-			location = LocationPrimi(name = self.previous().value, lineno = self.previous().lineno)
-		elif self.previous().type == "DEREF":
-			location = LocationMem(expr= self.expression(), lineno = self.previous().lineno)
+		if self.prev_type() == "ID":
+			location = LocationPrimi(name = self.prev_value(), lineno = self.prev_lineno())
+		elif self.prev_type() == "DEREF":
+			location = LocationMem(expr= self.expression(), lineno = self.prev_lineno())
 		self.consume("ASSIGN", "Se esperaba un signo igual '='")
 
 		expr = self.expression()
@@ -95,25 +130,26 @@ class Parser:
 		
 	def vardecl(self) -> Vardecl:
 		
-		kind = self.previous().value
-		lineno = self.previous().lineno
+		kind = self.prev_value()
+		lineno = self.prev_lineno()
 		
-		if self.peek().value in self.typenames:
-			raise SyntaxError(f"Línea {self.peek().lineno}: No se puede usar la palabra reservada '{self.peek().value}' como nombre de variable \n")
+		if self.peek_value() in self.typenames:
+			raise SyntaxError(f"Línea {self.peek_lineno()}: No se puede usar la palabra reservada '{self.peek_value()}' como nombre de variable \n")
 
-		name = self.consume("ID", "Se esperaba un identificador").value
+		self.consume("ID", "Se esperaba un identificador")
+		name = self.prev_value()
 		type = None
 		expr = None
 		#Verificar que lo que sigue de un ID sea un tipo valido o un assign o punto y coma
 		if self.match("INT") or self.match("FLOAT") or self.match("CHAR") or self.match("BOOL"): # Para type
-			type = self.previous().value
+			type = self.prev_value()
 		
 		# Si la varible no esta tipada se arroja una excepción
 		if kind == 'var' and type is None:
-			raise SyntaxError(f"Línea {self.peek().lineno}: La varible debe ser tipada \n")
+			raise SyntaxError(f"Línea {self.peek_lineno()}: La varible debe ser tipada \n")
 		
 		if kind == 'const' and type != None:
-			raise SyntaxError(f"Línea {self.peek().lineno}: La varible constante no debe tener tipado \n")
+			raise SyntaxError(f"Línea {self.peek_lineno()}: La varible constante no debe tener tipado \n")
 			
 		if self.match("ASSIGN"):
 			expr = self.expression()
@@ -127,21 +163,22 @@ class Parser:
 	def funcdecl(self) -> Funcdecl:
 		
 		is_import = False
-		lineno = self.previous().lineno
-		if self.previous().type == "IMPORT":
+		lineno = self.prev_lineno()
+		if self.prev_type() == "IMPORT":
 			is_import = True
 			self.consume("FUNC", "Se esperaba la palabra clave 'func' ")
 
-		name = self.consume("ID", "Se esperaba un identificador").value
+		self.consume("ID", "Se esperaba un identificador")
+		name = self.prev_value()
 		self.consume("LPAREN", "Se esperaba un parentesis izquierdo '(' ")
 		param = self.parameters()
 		self.consume("RPAREN", "Se esperaba un parentesis derecho ')' ")
 
 		# Mejorar esta parte de validar tipos
-		token = self.advance()
-		if self.isLiteral(token):
-			raise SyntaxError(f"Línea {token.lineno}: Se esperaba un tipo de retorno válido para la función {token.value}\n")
-		return_type = token.value
+		self.advance()
+		if self.isLiteral(self.prev_type(), self.prev_value()):
+			raise SyntaxError(f"Línea {self.prev_lineno()}: Se esperaba un tipo de retorno válido para la función {self.prev_value()}\n")
+		return_type = self.prev_value()
 
 		if is_import:
 			self.consume("SEMI", "Se esperaba un punto y coma ';'")
@@ -150,7 +187,7 @@ class Parser:
 
 		self.consume("LBRACE", "Se esperaba una llave izquierda '{' ")
 		stat = []
-		while self.peek().type != "RBRACE":
+		while self.peek_type() != "RBRACE":
 			stat.append(self.statement())
 		# stat = self.parse()
 		self.consume("RBRACE", "Se esperaba una llave derecha '}' ")
@@ -159,18 +196,18 @@ class Parser:
 		
 	def if_stmt(self) -> IfStmt:
 		
-		lineno = self.previous().lineno
+		lineno = self.prev_lineno()
 		expr = self.expression()
 		self.consume("LBRACE", "Se esperaba una llave izquierda '{' ")
 		conseq = [] #Consecuencia
-		while self.peek().type != "RBRACE":
+		while self.peek_type() != "RBRACE":
 			conseq.append(self.statement())
 		self.match("RBRACE")
 
 		if self.match("ELSE"):
 			alter = [] #Alternativa
 			self.consume("LBRACE", "Se esperaba una llave izquierda '{' ")
-			while self.peek().type != "RBRACE":
+			while self.peek_type() != "RBRACE":
 				alter.append(self.statement())
 			self.match("RBRACE")
 
@@ -180,25 +217,25 @@ class Parser:
 
 	def while_stmt(self) -> WhileStmt:
 		
-		lineno = self.previous().lineno
+		lineno = self.prev_lineno()
 		expr = self.expression()
 		self.consume("LBRACE", "Se esperaba una llave izquierda '{' ")
 		stat = []
-		while self.peek().type != "RBRACE":
+		while self.peek_type() != "RBRACE":
 			stat.append(self.statement())
 		self.match("RBRACE")
 		return WhileStmt(condition = expr, body = stat, lineno = lineno)
 		
 	def return_stmt(self) -> ReturnStmt:
 		
-		lineno = self.previous().lineno
+		lineno = self.prev_lineno()
 		expr = self.expression()
 		self.consume("SEMI", "Se esperaba un punto y coma ';'")
 		return ReturnStmt(expr = expr, lineno = lineno)
 		
 	def print_stmt(self):
 		
-		lineno = self.previous().lineno
+		lineno = self.prev_lineno()
 		expr = self.expression()
 		self.consume("SEMI", "Se esperaba un punto y coma ';'")
 		return PrintStmt(expr = expr, lineno = lineno)
@@ -206,77 +243,50 @@ class Parser:
 	# -------------------------------
 	# Análisis de expresiones
 	# -------------------------------
-	def expression(self) -> Expression:
-		expre = self.orterm()
-		while self.match("OR"):
-			lineno = self.previous().lineno
-			right = self.orterm()
-			expre = Binary(op = "||", left = expre, right = right, lineno = lineno)
-		return expre
-		
-	def orterm(self) -> Expression:
-		
-		orterm = self.andterm()
-		while self.match("AND"):
-			lineno = self.previous().lineno
-			right = self.andterm()
-			orterm = Binary(op = "&&", left = orterm, right = right, lineno = lineno)
-		return orterm
-
-		
-	def andterm(self) -> Expression:
-		
-		andterm = self.relterm()
-		while self.match("NE") or self.match("EQ") or self.match("GE") or self.match("LE") or self.match("GT") or self.match("LT"):
-			op = self.previous().value
-			lineno = self.previous().lineno
-			right = self.relterm()
-			andterm = Binary(op = op, left = andterm, right = right, lineno = lineno)
-		return andterm
-		
-	def relterm(self) -> Expression:
-		
-		relterm = self.addterm()
-		while self.match("PLUS") or self.match("MINUS"):
-			op = self.previous().value
-			lineno = self.previous().lineno
-			right = self.addterm()
-			
-			relterm = Binary(op = op, left = relterm, right = right, lineno = lineno)
-		return relterm
-		
-	def addterm(self) -> Expression:
-		
-		addterm = self.factor()
-		while self.match("DIVIDE") or self.match("TIMES"):
-			op = self.previous().value
-			lineno = self.previous().lineno
-			right = self.factor()
-			addterm = Binary(op = op, left = addterm, right = right, lineno = lineno)
-		return addterm
+	def expression(self, precedence: int = 1) -> Expression:
+		# Precedence climbing: se lee un factor y luego los operadores binarios
+		# cuya precedencia sea al menos 'precedence'. El operando derecho se
+		# analiza con precedencia + 1, así las cadenas de operadores del mismo
+		# nivel (a + b + c ...) se resuelven en este ciclo, asociando por la izquierda
+		tokens = self.tokens
+		expre = self.factor()
+		while True:
+			op_precedence = BINARY_PRECEDENCE.get(tokens.type())
+			if op_precedence is None or op_precedence < precedence:
+				return expre
+			op = tokens.value()
+			lineno = tokens.lineno()
+			tokens.advance()
+			right = self.expression(op_precedence + 1)
+			expre = Binary(op = op, left = expre, right = right, lineno = lineno)
 		
 	# def binary_op(self, operators, next_rule):
 	# 	pass
 		
-	def isLiteral(self, token: Token) -> bool:
-		if token.type != token.value.upper():
+	def isLiteral(self, type: str, value: str) -> bool:
+		if type != value.upper():
 			return True
 		
 		return False
 
 	def factor(self) -> Expression:
-		
-		if self.match("INT") or self.match("FLOAT") or self.match("CHAR") or self.match("BOOL"):
-			if self.isLiteral(self.previous()):
-				return Literal(value = self.previous().value, type = self.previous().type.lower(), lineno = self.previous().lineno)
+		# El tipo del token actual decide la regla: se consulta una sola vez
+		token_type = self.peek_type()
+		if token_type in PRIMITIVE_TYPES:
+			value = self.peek_value()
+			lineno = self.peek_lineno()
+			self.advance()
+			if self.isLiteral(token_type, value):
+				return Literal(value = value, type = token_type.lower(), lineno = lineno)
 			else:
-				type = self.previous().value
+				type = value
 				self.consume("LPAREN", "Se esperaba un parentesis izquierdo '('")
 				expr = self.expression()
 				self.consume("RPAREN", "Se esperaba un parentesis derecho ')'")
-				return TypeConversion(type = type, expr = expr, lineno = self.previous().lineno)
-		elif self.match("PLUS") or self.match("MINUS") or self.match("GROW"):
-			op = self.previous().value
+				return TypeConversion(type = type, expr = expr, lineno = self.prev_lineno())
+		elif token_type in UNARY_OPERATORS:
+			self.advance()
+			op = self.prev_value()
 			expr = None
 			if self.match("LPAREN"):
 				expr = self.expression()
@@ -284,21 +294,23 @@ class Parser:
 			else:
 				expr = self.factor()
 
-			return Unary(op = op, expr = expr, lineno = self.previous().lineno)
-		elif self.match("LPAREN"):
+			return Unary(op = op, expr = expr, lineno = self.prev_lineno())
+		elif token_type == "LPAREN":
+			self.advance()
 			expr = self.expression()
 			self.consume("RPAREN", "Se esperaba un parentesis derecho ')'")
 			return expr
 		# elif self.match("INT") or self.match("FLOAT") or self.match("CHAR") or self.match("BOOL"): # Para type
-		# 	type = self.previous().value
+		# 	type = self.prev_value()
 		# 	self.consume("LPAREN", "Se esperaba un parentesis izquierdo '('")
 		# 	expr = self.expression()
 		# 	self.consume("RPAREN", "Se esperaba un parentesis derecho ')'")
 		# 	return TypeConversion(type, expr)
-		elif self.match("ID"):
-			id = self.previous().value
-			lineno = self.previous().lineno
-			if self.tokens[self.current].type == "LPAREN":
+		elif token_type == "ID":
+			id = self.peek_value()
+			lineno = self.peek_lineno()
+			self.advance()
+			if self.check("LPAREN"):
 				self.consume("LPAREN", "Se esperaba un perentesis izquierdo '('")
 				args = []
 
@@ -310,38 +322,43 @@ class Parser:
 				return FuncCall(name = id, arg = args, lineno = lineno)
 			else:
 				return LocationPrimi(name = id, lineno = lineno)
-		elif self.match("DEREF"):
-			lineno = self.previous().lineno
+		elif token_type == "DEREF":
+			self.advance()
+			lineno = self.prev_lineno()
 
 			return LocationMem(expr = self.factor(), lineno = lineno)
 		else:
-			raise SyntaxError(f"Línea {self.peek().lineno}: Factor inesperado \n")
+			raise SyntaxError(f"Línea {self.peek_lineno()}: Factor inesperado \n")
 
 			
 	def parameters(self) -> List[Parameter]:
 
 		params = []
-		lineno = self.previous().lineno
-		if self.peek() and self.peek().type == "ID":
+		lineno = self.prev_lineno()
+		if self.check("ID"):
             # Primer parámetro
-			name = self.consume("ID", "Se esperaba un identificador para el parámetro").value
+			self.consume("ID", "Se esperaba un identificador para el parámetro")
+			name = self.prev_value()
 
 			type_str = None
 			if self.match("INT") or self.match("FLOAT") or self.match("CHAR") or self.match("BOOL"):
-				type_str = self.previous().value
+				type_str = self.prev_value()
 			else:
-				type_str = self.consume("INT", "Se esperaba un tipo para el parámetro").value
+				self.consume("INT", "Se esperaba un tipo para el parámetro")
+				type_str = self.prev_value()
 
 			
 			params.append(Parameter(name = name, type = type_str, lineno = lineno))
             # Parámetros adicionales separados por coma
 			while self.match("COMMA"):
-				name = self.consume("ID", "Se esperaba un identificador para el parámetro").value
-				lineno = self.previous().lineno
+				self.consume("ID", "Se esperaba un identificador para el parámetro")
+				name = self.prev_value()
+				lineno = self.prev_lineno()
 				if self.match("INT") or self.match("FLOAT") or self.match("CHAR") or self.match("BOOL"):
-					type_str = self.previous().value
+					type_str = self.prev_value()
 				else:
-					type_str = self.consume("INT", "Se esperaba un tipo para el parámetro").value
+					self.consume("INT", "Se esperaba un tipo para el parámetro")
+					type_str = self.prev_value()
 				params.append(Parameter(name = name, type = type_str, lineno = lineno))
 		return params
 
@@ -361,34 +378,51 @@ class Parser:
 	# 	pass
 
 	def previous(self) -> Token:
-		return self.tokens[self.current - 1]
+		return self.tokens.token(-1)
+
+	def prev_type(self) -> str:
+		return self.tokens.type(-1)
+
+	def prev_value(self) -> str:
+		return self.tokens.value(-1)
+
+	def prev_lineno(self) -> int:
+		return self.tokens.lineno(-1)
 
 	# -------------------------------
 	# Trate de conservar este codigo
 	# -------------------------------
 
-	def peek(self) -> Token:
-		return self.tokens[self.current] if self.current < len(self.tokens) else None
+	def peek(self, k: int = 0) -> Token:
+		return self.tokens.token(k)
+
+	def peek_type(self, k: int = 0) -> str:
+		return self.tokens.type(k)
+
+	def peek_value(self) -> str:
+		return self.tokens.value()
+
+	def peek_lineno(self) -> int:
+		lineno = self.tokens.lineno()
+		return self.prev_lineno() if lineno is None else lineno # Al final del archivo se reporta la línea del último token
 		
-	def advance(self) -> Token:
-		token = self.peek()
-		self.current += 1
-		return token
+	def advance(self):
+		self.tokens.advance()
+
+	def check(self, token_type: str, k: int = 0) -> bool:
+		return self.tokens.type(k) == token_type
 		
 	def match(self, token_type: str) -> bool:
-		if self.peek() and self.peek().type == token_type:
+		if self.check(token_type):
 			self.advance()
 			return True
 		return False
 		
 	def consume(self, token_type: str, message: str):
 		if self.match(token_type):
-			return self.previous()
-		
-		if self.peek() is None:
-			self.current -= 1
+			return
 		
-		raise SyntaxError(f"Línea {self.peek().lineno}: {message} \n")
+		raise SyntaxError(f"Línea {self.peek_lineno()}: {message} \n")
 	
 
 
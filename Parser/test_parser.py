@@ -0,0 +1,63 @@
+import unittest
+import tempfile
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Parser.parser import Parser
+from Parser.model import *
+
+def parse(text): # Parses the text and returns the list of statements
+	with tempfile.NamedTemporaryFile('w', suffix='.gox', delete=False) as file:
+		file.write(text)
+	try:
+		return Parser(file.name).parse().stmts
+	finally:
+		os.remove(file.name)
+
+def parse_expression(text): # Parses 'print <text>;' and returns the expression
+	return parse(f'print {text};\n')[0].expr
+
+def show(expr): # Writes the expression with parentheses around every binary operation
+	if isinstance(expr, Binary):
+		return f'({show(expr.left)} {expr.op} {show(expr.right)})'
+	if isinstance(expr, Unary):
+		return f'{expr.op}{show(expr.expr)}'
+	if isinstance(expr, Literal):
+		return expr.value
+	return expr.name
+
+class TestParser(unittest.TestCase):
+	def test_precedence(self): # Test the precedence and the left associativity of the binary operators
+		cases = {
+			'1 + 2 * 3': '(1 + (2 * 3))',
+			'1 - 2 - 3': '((1 - 2) - 3)',
+			'8 / 4 * 2': '((8 / 4) * 2)',
+			'a || b && c': '(a || (b && c))',
+			'a < b == c': '((a < b) == c)',
+			'1 + 2 < 3 * 4 && x || y': '((((1 + 2) < (3 * 4)) && x) || y)',
+			'-1 * (2 + 3)': '(-1 * (2 + 3))',
+		}
+		for text, expected in cases.items():
+			with self.subTest(text=text):
+				self.assertEqual(show(parse_expression(text)), expected)
+
+	def test_long_chain(self): # A long chain of operators does not recurse once per operator
+		expr = parse_expression(' + '.join(['1'] * (sys.getrecursionlimit() * 2)))
+		depth = 0
+		while isinstance(expr, Binary):
+			self.assertIsInstance(expr.right, Literal)
+			expr = expr.left
+			depth += 1
+		self.assertEqual(depth, sys.getrecursionlimit() * 2 - 1)
+
+	def test_statements(self): # Test that the first token (and the next one for an ID) selects the statement
+		stmts = parse("x = 1;\nf(x);\n`x = 2;\nvar y int;\nwhile x { break; continue; }\nprint x;\n")
+
+		self.assertEqual([type(stmt) for stmt in stmts], [Assignment, FuncCall, Assignment, Vardecl, WhileStmt, PrintStmt])
+		self.assertEqual([type(stmt) for stmt in stmts[4].body], [BreakStmt, ContinueStmt])
+		self.assertEqual([stmt.lineno for stmt in stmts], [1, 2, 3, 4, 5, 6])
+
+
+if __name__ == '__main__':
+	unittest.main()
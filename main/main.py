@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 
@@ -9,32 +10,118 @@ from Parser.parser import Parser
 from Checker.check import Checker
 from Codigo_Intermedio.IR import *
 from Maquina_de_pila.StackMachine import StackMachine
+from Cache_de_compilacion.cache import BuildCache, DEFAULT_DIR, DEFAULT_MAX_BYTES
+from Codigo_Intermedio import goxc, ir_text, inline, specialize
+from Codigo_Intermedio.optimizer import optimize, print_report
 
-try:
 
-    nodes = Parser('prueba.gox')
+def compile_program(path, cache=None):
+    '''
+    Devuelve el IRModule del programa. Con caché, cada etapa que ya se
+    calculó para el mismo código fuente (y el mismo compilador) se toma
+    del disco en lugar de repetirse.
+    '''
+    key = None
+    ast = None
+    checked = False
+    if cache is not None:
+        with open(path, 'rb') as file:
+            key = cache.key(file.read())
 
-    ast = nodes.parse()
-    print('Analisis Lexico Correcto')
-    print('Analisis Sintactico Correcto')
+        module = cache.get(key, 'ir')
+        if module is not None:
+            print('Código Intermedio tomado de la caché')
+            return module
 
-    # print(ast)
-    # check = Checker()
+        ast = cache.get(key, 'checked')
+        checked = ast is not None
+        if ast is None:
+            ast = cache.get(key, 'ast')
+        if ast is not None:
+            print('Analisis Lexico y Sintactico tomados de la caché')
 
-    _, env = Checker.check(ast)
+    if ast is None:
+        ast = Parser(path).parse()
+        print('Analisis Lexico Correcto')
+        print('Analisis Sintactico Correcto')
+        if cache is not None:
+            cache.put(key, 'ast', ast)
 
-    # env.print()
-    # print(ast)
-    print('Analisis Semantico Correcto')
+    if checked:
+        print('Analisis Semantico tomado de la caché')
+    else:
+        _, env = Checker.check(ast)
+        # env.print()
+        print('Analisis Semantico Correcto')
+        if cache is not None:
+            cache.put(key, 'checked', ast)
 
     module = IRCode.gencode(ast)
     print('Generador de Codigo Intermedio Correcto')
-    module.dump()
+    if cache is not None:
+        cache.put(key, 'ir', module)
+    return module
 
-    vm = StackMachine()
-    vm.load_ir(module)
-    vm.run()
 
-except Exception as e:
-    print("Ocurrió un error:", e)
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Compilador de GoxLang')
+    ap.add_argument('archivo', nargs='?', default='prueba.gox', help='Programa .gox a compilar y ejecutar, o módulo ya compilado (.goxc, o IR en texto .ir/.ic)')
+    ap.add_argument('-O', dest='optimize', action='store_true', help='Optimiza el código intermedio antes de ejecutarlo')
+    ap.add_argument('--opt-report', action='store_true', help='Con -O, muestra lo que hizo cada pase del optimizador')
+    ap.add_argument('--inline-size', type=int, default=inline.THRESHOLD, help='Con -O, tamaño máximo (instrucciones) de una función que se expande en sus llamadas')
+    ap.add_argument('--clone-growth', type=float, default=specialize.GROWTH, help='Con -O, máximo de instrucciones nuevas en funciones especializadas, como fracción del tamaño del programa')
+    ap.add_argument('--no-memo', action='store_true', help='No guarda los resultados de las funciones puras')
+    ap.add_argument('--memo-stats', action='store_true', help='Al terminar, muestra los aciertos y fallos de las funciones memoizadas')
+    ap.add_argument('--emit', metavar='SALIDA', help='Guarda el módulo compilado: binario si termina en .goxc, IR en texto si no')
+    ap.add_argument('--no-cache', action='store_true', help='Compila sin usar la caché')
+    ap.add_argument('--cache-dir', default=DEFAULT_DIR, help='Directorio de la caché')
+    ap.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024), help='Tamaño máximo de la caché en MB')
+    ap.add_argument('--cache-stats', action='store_true', help='Muestra los aciertos y fallos de la caché y termina')
+    ap.add_argument('--cache-clear', action='store_true', help='Vacía la caché y termina')
+    args = ap.parse_args(argv)
 
+    cache = None
+    if not args.no_cache:
+        cache = BuildCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+        if args.cache_stats:
+            cache.print_stats()
+            return
+        if args.cache_clear:
+            cache.clear()
+            return
+
+    try:
+        if args.archivo.endswith('.goxc'):
+            # Módulo ya compilado: no pasa por el front end
+            module = goxc.load(args.archivo)
+        elif args.archivo.endswith(('.ir', '.ic')):
+            module = ir_text.load(args.archivo)
+        else:
+            module = compile_program(args.archivo, cache)
+            if args.optimize:
+                reports = optimize(module, options={'inline': {'threshold': args.inline_size}, 'specialize': {'growth': args.clone_growth}})
+                if args.opt_report:
+                    print_report(reports)
+            module.dump()
+
+        if args.emit:
+            if args.emit.endswith('.goxc'):
+                goxc.dump(module, args.emit)
+            else:
+                module.dump(args.emit)
+            print(f'Módulo guardado en {args.emit}')
+
+        vm = StackMachine(memoize=not args.no_memo)
+        vm.load_ir(module)
+        vm.run()
+        if args.memo_stats:
+            print()
+            for name, (hits, misses, size) in vm.memo_stats().items():
+                print(f'memo {name}: {hits} aciertos, {misses} fallos, {size} guardados')
+
+    except Exception as e:
+        print("Ocurrió un error:", e)
+
+
+if __name__ == '__main__':
+    main()